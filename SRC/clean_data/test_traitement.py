@@ -0,0 +1,208 @@
+"""
+Tests de traitement.py sur de petits fichiers sources écrits dans un dossier temporaire.
+
+    python -m pytest SRC/clean_data
+"""
+import csv
+
+import pandas as pd
+import pytest
+
+import traitement
+
+ENTETE_ETREPRO1 = "prix;type_de_bien;url_annonce;surface_terrain;surface_interieure;surface_jardin;" \
+                  "nombre_de_pieces;ville;code_postal"
+ENTETE_ETREPRO2 = "type_de_bien;departement;ville;code_postal;nombre_de_pieces;surface_interieure;" \
+                  "surface_exterieure;prix;url_annonce"
+ENTETE_SELOGER = "Page_Number,Type,Price,Price_Per_M2,Surface_m2,Rooms,Bedrooms,Floor,Address,City," \
+                 "PostalCode,Department,Energy_Class,Is_New,Agency,URL,Confidence_Score"
+
+ETREPRO1 = [
+    "235000.0;Maison;https://www.etreproprio.com/annonce/1;500;100;200;5.0;Lyon;69001",
+    "99000.5;Appartement;https://www.etreproprio.com/annonce/2;;45;;2.0;Lyon;69002",
+    "80000;Terrain;https://www.etreproprio.com/annonce/3;800;;;;Ain;1550",
+    "150000;Appartement;https://www.etreproprio.com/annonce/4;;5;;1;Lyon;69003",
+]
+ETREPRO2 = [
+    "appartement;Rhône;Lyon;69001;3.0;60;;300000.0;https://www.etreproprio.com/annonce/20",
+    "maison;Ain;Bourg;1000;4;90;;210000;https://www.etreproprio.com/annonce/21",
+]
+SELOGER = [
+    '1,Appartement,412 000 €,8 240 €/m²,50 m²,2 pièce(s),1 chambre(s),2,"12 rue X, Paris 11ème",'
+    'Paris 11ème,75011,75,D,Non,N/A,https://www.seloger.com/annonces/a1.htm,10',
+    '1,Maison,650 000 €,N/A,120 m²,5 pièce(s),3 chambre(s),N/A,Villeurbanne (69100),Villeurbanne,'
+    '69100,69,C,Non,N/A,https://www.seloger.com/annonces/a2.htm,10',
+]
+
+
+def ecrire(chemin, entete, lignes):
+    chemin.write_text("\n".join([entete] + lignes) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def sources(tmp_path):
+    """Dossier avec les trois sources ; renvoie le dossier."""
+    ecrire(tmp_path / "etrePro1.csv", ENTETE_ETREPRO1, ETREPRO1)
+    ecrire(tmp_path / "etrePro2.csv", ENTETE_ETREPRO2, ETREPRO2)
+    ecrire(tmp_path / "paris.csv", ENTETE_SELOGER, SELOGER)
+    return tmp_path
+
+
+def test_nettoyer_complet(sources):
+    df = traitement.nettoyer(str(sources), str(sources / "clean_data.csv"))
+
+    # L'appartement de 5 m² est hors bornes, tout le reste est gardé
+    assert sorted(df["url_annonce"].str.rsplit("/", n=1).str[-1]) == [
+        "1", "2", "20", "21", "3", "a1.htm", "a2.htm"]
+    assert list(df.columns) == traitement.COLONNES_FINALES
+    assert df.dtypes.astype(str).to_dict() == traitement.TYPES_PROPRES
+
+    par_url = df.set_index(df["url_annonce"].str.rsplit("/", n=1).str[-1])
+    # Prix lus en décimal puis tronqués
+    assert par_url.loc["2", "prix"] == 99000
+    assert par_url.loc["1", "nombre_de_pieces"] == 5
+    assert par_url.loc["3", "code_postal"] == "01550"
+    assert par_url.loc["3", "prix_m2"] == pytest.approx(100.0)
+    assert par_url.loc["a1.htm", "prix"] == 412000
+    assert par_url.loc["a1.htm", "departement"] == "Paris"
+
+    relu = traitement.lire_propre(str(sources / "clean_data.csv"))
+    pd.testing.assert_frame_equal(relu.reset_index(drop=True), df.reset_index(drop=True), check_categorical=False)
+
+
+def test_nettoyer_par_blocs_comme_complet(sources):
+    complet = traitement.nettoyer(str(sources), None)
+    ecrites = traitement.nettoyer_par_blocs(str(sources), str(sources / "blocs.csv"), taille_bloc=2)
+
+    blocs = traitement.lire_propre(str(sources / "blocs.csv"))
+    assert ecrites == len(complet) == len(blocs)
+    assert list(blocs.index) == list(range(len(blocs)))
+    assert sorted(blocs["url_annonce"]) == sorted(complet["url_annonce"])
+
+
+def test_nettoyer_par_blocs_reprise_avec_hachages(sources):
+    sortie = str(sources / "blocs.csv")
+    hachages = str(sources / "urls_vues.npy")
+    premiere = traitement.nettoyer_par_blocs(str(sources), sortie, taille_bloc=2, fichier_hachages=hachages)
+
+    # Deuxième exécution avec une annonce de plus : seule la nouvelle est ajoutée, rien n'est perdu
+    ecrire(sources / "etrePro2.csv", ENTETE_ETREPRO2,
+           ETREPRO2 + ["maison;Ain;Oyonnax;1100;4;95;;180000;https://www.etreproprio.com/annonce/22"])
+    seconde = traitement.nettoyer_par_blocs(str(sources), sortie, taille_bloc=2, fichier_hachages=hachages)
+
+    df = traitement.lire_propre(sortie)
+    assert seconde == 1
+    assert len(df) == premiere + 1
+    assert list(df.index) == list(range(len(df)))
+    assert df["url_annonce"].is_unique
+
+    # Sans la sortie, les hachages sont ignorés et tout est réécrit
+    (sources / "blocs.csv").unlink()
+    assert traitement.nettoyer_par_blocs(str(sources), sortie, taille_bloc=2, fichier_hachages=hachages) \
+        == premiere + 1
+
+
+def test_nettoyer_incremental(sources):
+    sortie = str(sources / "clean_data.csv")
+    premiere = traitement.nettoyer_incremental(str(sources), sortie)
+    assert premiere == len(traitement.nettoyer(str(sources), None))
+    assert traitement.nettoyer_incremental(str(sources), sortie) == 0
+
+    # Ajout en fin de fichier d'une seule source : seule la nouvelle ligne est lue et ajoutée
+    with open(sources / "paris.csv", "a", encoding="utf-8") as f:
+        f.write('2,Appartement,300 000 €,N/A,30 m²,1 pièce(s),N/A,N/A,"3 rue Y, Paris 18ème",Paris 18ème,'
+                '75018,75,E,Non,N/A,https://www.seloger.com/annonces/a3.htm,10\n')
+    assert traitement.nettoyer_incremental(str(sources), sortie) == 1
+    df = traitement.lire_propre(sortie)
+    assert len(df) == premiere + 1
+    assert df["code_postal"].iloc[-1] == "75018"
+
+    # Upsert : une annonce déjà présente revient avec un autre prix et remplace l'ancienne
+    with open(sources / "paris.csv", "a", encoding="utf-8") as f:
+        f.write('3,Appartement,290 000 €,N/A,30 m²,1 pièce(s),N/A,N/A,"3 rue Y, Paris 18ème",Paris 18ème,'
+                '75018,75,E,Non,N/A,https://www.seloger.com/annonces/a3.htm,10\n')
+    assert traitement.nettoyer_incremental(str(sources), sortie) == 1
+    df = traitement.lire_propre(sortie)
+    assert len(df) == premiere + 1
+    assert df.loc[df["url_annonce"].str.endswith("a3.htm"), "prix"].tolist() == [290000]
+
+    # Fichier réécrit (plus court) : retraité en entier, sans doublons
+    ecrire(sources / "etrePro2.csv", ENTETE_ETREPRO2, ETREPRO2[:1])
+    traitement.nettoyer_incremental(str(sources), sortie)
+    df = traitement.lire_propre(sortie)
+    assert df["url_annonce"].is_unique
+    assert len(df) == premiere + 1
+
+
+
+def test_nettoyer_incremental_garde_colonne_groupe_doublon(sources):
+    sortie = str(sources / "clean_data.csv")
+    marque = traitement.nettoyer(str(sources), sortie, doublons="marquer")
+    traitement.nettoyer_incremental(str(sources), sortie)
+
+    # Ajout simple puis upsert (réécriture) : les lignes gardent les colonnes du fichier
+    for ligne in ('2,Appartement,300 000 €,N/A,30 m²,1 pièce(s),N/A,N/A,"3 rue Y, Paris 18ème",Paris 18ème,'
+                  '75018,75,E,Non,N/A,https://www.seloger.com/annonces/a3.htm,10\n',
+                  '3,Appartement,290 000 €,N/A,30 m²,1 pièce(s),N/A,N/A,"3 rue Y, Paris 18ème",Paris 18ème,'
+                  '75018,75,E,Non,N/A,https://www.seloger.com/annonces/a3.htm,10\n'):
+        with open(sources / "paris.csv", "a", encoding="utf-8") as f:
+            f.write(ligne)
+        assert traitement.nettoyer_incremental(str(sources), sortie) == 1
+
+        # Même nombre de champs sur chaque ligne (pandas complèterait une ligne trop courte)
+        with open(sortie, newline="", encoding="utf-8") as f:
+            assert {len(champs) for champs in csv.reader(f)} == {len(marque.columns) + 1}
+        df = pd.read_csv(sortie, index_col=0, dtype="string")
+        assert list(df.columns) == list(marque.columns)
+        assert len(df) == len(marque) + 1
+        nouvelle = df[df["url_annonce"].str.endswith("a3.htm")]
+        assert nouvelle["code_postal"].tolist() == ["75018"]
+        assert nouvelle["groupe_doublon"].isna().all()
+    assert nouvelle["prix"].tolist() == ["290000"]
+
+
+def test_sorties_parquet_et_duckdb(sources):
+    parquet, base = str(sources / "clean_data.parquet"), str(sources / "clean_data.duckdb")
+    df = traitement.nettoyer(str(sources), None, parquet=parquet, base=base)
+
+    jeu = traitement.ds.dataset(parquet, format="parquet", partitioning=traitement.partitionnement())
+    assert jeu.count_rows() == len(df)
+    assert jeu.count_rows(filter=traitement.ds.field("code_departement") == "01") == 2
+
+    with traitement.duckdb.connect(base, read_only=True) as connexion:
+        assert connexion.execute("SELECT COUNT(*) FROM annonces").fetchone()[0] == len(df)
+
+    # Recréation de la base par renommage d'un fichier temporaire, puis upsert par URL
+    traitement.ecrire_duckdb(df.iloc[:2], base)
+    traitement.ecrire_duckdb(df.iloc[1:3], base, remplacer=False)
+    with traitement.duckdb.connect(base, read_only=True) as connexion:
+        assert connexion.execute("SELECT COUNT(*) FROM annonces").fetchone()[0] == 3
+    assert not (sources / "clean_data.duckdb.tmp").exists()
+
+
+def test_doublons_entre_sources(sources):
+    # La maison de Villeurbanne est aussi sur EtreProprio, à un prix et une surface très proches ;
+    # une seconde annonce EtreProprio identique est un autre lot, pas un doublon
+    ecrire(sources / "etrePro2.csv", ENTETE_ETREPRO2, ETREPRO2 + [
+        "maison;Rhône;villeurbanne;69100;5;121;;645000;https://www.etreproprio.com/annonce/30",
+        "maison;Rhône;villeurbanne;69100;5;121;;645000;https://www.etreproprio.com/annonce/31",
+        "maison;Rhône;Villeurbanne;69100;5;160;;900000;https://www.etreproprio.com/annonce/32",
+    ])
+
+    marque = traitement.nettoyer(str(sources), None, doublons="marquer")
+    groupes = marque.set_index(marque["url_annonce"].str.rsplit("/", n=1).str[-1])["groupe_doublon"]
+    assert groupes["a2.htm"] == groupes["30"] == groupes["31"] == 0
+    assert groupes.drop(["a2.htm", "30", "31"]).isna().all()
+
+    fusion = traitement.nettoyer(str(sources), None, doublons="fusionner")
+    assert len(fusion) == len(marque) - 2
+    gardee = fusion[fusion["code_postal"] == "69100"].sort_values("prix")
+    # La plus complète des trois (l'annonce SeLoger, avec adresse) est gardée
+    assert gardee["url_annonce"].tolist()[0].endswith("a2.htm")
+    assert fusion.dtypes.astype(str).to_dict() == traitement.TYPES_PROPRES
+
+
+def test_regrouper_union_find():
+    a = traitement.np.array([5, 1, 3, 7])
+    b = traitement.np.array([3, 2, 1, 8])
+    assert traitement.regrouper(9, a, b).tolist() == [0, 1, 1, 1, 4, 1, 6, 7, 7]
@@ -0,0 +1,1091 @@
+"""
+Nettoyage des annonces (SeLoger et EtreProprio), version module du notebook traitement.ipynb.
+
+Chaque source a un schéma (SOURCES) appliqué dès la lecture : types explicites, renommage des
+colonnes, codes postaux en texte sur 5 chiffres et extraction des valeurs sans unité, colonne par
+colonne en une passe vectorisée. Utilisation :
+
+    python traitement.py                       # fichiers du dossier courant -> clean_data.csv
+    python traitement.py --dossier data --sortie data/clean_data.csv
+    python traitement.py --blocs 200000       # lecture par blocs, mémoire bornée
+    python traitement.py --incremental        # seulement les lignes ajoutées depuis la dernière fois
+    python traitement.py --parquet            # en plus, jeu Parquet partitionné par département
+    python traitement.py --duckdb             # en plus, base DuckDB interrogée par le tableau de bord
+    python traitement.py --doublons fusionner # même bien publié sur SeLoger et EtreProprio : une ligne
+
+ou depuis un notebook :
+
+    from traitement import lire_source, nettoyer
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+try:
+    import pyarrow as pa  # moteur CSV de pandas et jeu Parquet
+    import pyarrow.dataset as ds
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Schéma par source : fichier, séparateur, types à la lecture (noms d'origine), renommage vers les
+# noms communs, puis colonnes texte dont on extrait la valeur sans unité (noms communs)
+SOURCES = {
+    "etrepro1": {
+        "fichier": "etrePro1.csv",
+        "sep": ";",
+        "types": {
+            "prix": "float64", "type_de_bien": "string", "url_annonce": "string",
+            "surface_terrain": "float64", "surface_interieure": "float64", "surface_jardin": "float64",
+            "nombre_de_pieces": "float64", "ville": "string", "code_postal": "string",
+        },
+        "renommage": {"surface_jardin": "surface_exterieure"},
+        "entiers": [],
+        "decimaux": [],
+    },
+    "etrepro2": {
+        "fichier": "etrePro2.csv",
+        "sep": ";",
+        "types": {
+            "type_de_bien": "string", "departement": "string", "ville": "string", "code_postal": "string",
+            "nombre_de_pieces": "float64", "surface_interieure": "float64", "surface_exterieure": "float64",
+            "prix": "float64", "url_annonce": "string",
+        },
+        "renommage": {},
+        "entiers": [],
+        "decimaux": [],
+    },
+    "seloger": {
+        "fichier": "paris.csv",
+        "sep": ",",
+        "types": {
+            "Type": "string", "Price": "string", "Price_Per_M2": "string", "Surface_m2": "string",
+            "Rooms": "string", "Address": "string", "City": "string", "PostalCode": "string",
+            "Department": "string", "URL": "string",
+        },
+        "renommage": {
+            "Type": "type_de_bien",
+            "Department": "code_departement",
+            "Surface_m2": "surface_interieure",
+            "Rooms": "nombre_de_pieces",
+            "Price": "prix",
+            "City": "ville",
+            "URL": "url_annonce",
+            "PostalCode": "code_postal",
+        },
+        "entiers": ["nombre_de_pieces", "prix", "Price_Per_M2"],
+        "decimaux": ["surface_interieure"],
+    },
+}
+
+# Mode par blocs : lignes lues à la fois par source, et fichier des hachages d'URL déjà écrites
+TAILLE_BLOC = 200_000
+FICHIER_HACHAGES = "urls_vues.npy"
+
+# Doublons entre sources (--doublons) : tolérances relatives de prix et de surface (largeur des
+# tranches de blocage), poids des champs dans le score et score minimal d'un doublon
+TOLERANCE_PRIX = 0.03
+TOLERANCE_SURFACE = 0.05
+POIDS_DOUBLONS = {"prix": 0.35, "surface": 0.35, "pieces": 0.15, "ville": 0.15}
+SEUIL_DOUBLON = 0.8
+
+# Valeurs manquantes écrites par les scrapers
+VALEURS_MANQUANTES = ["N/A", "NA", ""]
+
+COLONNES_FINALES = [
+    'type_de_bien', 'surface_terrain', 'surface_interieure', 'surface_exterieure', 'nombre_de_pieces',
+    'prix', 'prix_m2', 'Address', 'ville', 'code_postal', 'departement', 'code_departement', 'url_annonce',
+]
+
+# Types compacts du jeu nettoyé (compacter, lire_propre) : catégories pour les colonnes à peu de
+# valeurs distinctes, entiers et décimaux réduits. Seule l'URL, unique par annonce, reste en texte.
+TYPES_PROPRES = {
+    'type_de_bien': 'category', 'surface_terrain': 'float32', 'surface_interieure': 'float32',
+    'surface_exterieure': 'float32', 'nombre_de_pieces': 'Int8', 'prix': 'Int32', 'prix_m2': 'float32',
+    'Address': 'category', 'ville': 'category', 'code_postal': 'category', 'departement': 'category',
+    'code_departement': 'category', 'url_annonce': 'string',
+}
+
+# Jeu Parquet (--parquet) : dossier partitionné par code_departement, lignes par groupe
+DOSSIER_PARQUET = "clean_data.parquet"
+TAILLE_GROUPE_LIGNES = 64_000
+
+# Base DuckDB (--duckdb) : table `annonces` lue par le tableau de bord (clean_store.query)
+FICHIER_DUCKDB = "clean_data.duckdb"
+
+# Mode incrémental : octets hachés au début et avant la position traitée de chaque source
+TAILLE_EMPREINTE = 1 << 20
+
+TYPES_AVEC_SURFACE = ['maison', 'appartement', 'Duplex', 'Loft', 'Studio', 'Villa']
+
+DEPARTMENTS = {
+    '01': 'Ain', '02': 'Aisne', '03': 'Allier', '04': 'Alpes-de-Haute-Provence', '05': 'Hautes-Alpes',
+    '06': 'Alpes-Maritimes', '07': 'Ardèche', '08': 'Ardennes', '09': 'Ariège', '10': 'Aube', '11': 'Aude',
+    '12': 'Aveyron', '13': 'Bouches-du-Rhône', '14': 'Calvados', '15': 'Cantal', '16': 'Charente',
+    '17': 'Charente-Maritime', '18': 'Cher', '19': 'Corrèze', '2A': 'Corse-du-Sud', '2B': 'Haute-Corse',
+    '21': 'Côte-d\'Or', '22': 'Côtes-d\'Armor', '23': 'Creuse', '24': 'Dordogne', '25': 'Doubs', '26': 'Drôme',
+    '27': 'Eure', '28': 'Eure-et-Loir', '29': 'Finistère', '30': 'Gard', '31': 'Haute-Garonne', '32': 'Gers',
+    '33': 'Gironde', '34': 'Hérault', '35': 'Ille-et-Vilaine', '36': 'Indre', '37': 'Indre-et-Loire',
+    '38': 'Isère', '39': 'Jura', '40': 'Landes', '41': 'Loir-et-Cher', '42': 'Loire', '43': 'Haute-Loire',
+    '44': 'Loire-Atlantique', '45': 'Loiret', '46': 'Lot', '47': 'Lot-et-Garonne', '48': 'Lozère',
+    '49': 'Maine-et-Loire', '50': 'Manche', '51': 'Marne', '52': 'Haute-Marne', '53': 'Mayenne',
+    '54': 'Meurthe-et-Moselle', '55': 'Meuse', '56': 'Morbihan', '57': 'Moselle', '58': 'Nièvre', '59': 'Nord',
+    '60': 'Oise', '61': 'Orne', '62': 'Pas-de-Calais', '63': 'Puy-de-Dôme', '64': 'Pyrénées-Atlantiques',
+    '65': 'Hautes-Pyrénées', '66': 'Pyrénées-Orientales', '67': 'Bas-Rhin', '68': 'Haut-Rhin', '69': 'Rhône',
+    '70': 'Haute-Saône', '71': 'Saône-et-Loire', '72': 'Sarthe', '73': 'Savoie', '74': 'Haute-Savoie',
+    '75': 'Paris', '76': 'Seine-Maritime', '77': 'Seine-et-Marne', '78': 'Yvelines', '79': 'Deux-Sèvres',
+    '80': 'Somme', '81': 'Tarn', '82': 'Tarn-et-Garonne', '83': 'Var', '84': 'Vaucluse', '85': 'Vendée',
+    '86': 'Vienne', '87': 'Haute-Vienne', '88': 'Vosges', '89': 'Yonne', '90': 'Territoire de Belfort',
+    '91': 'Essonne', '92': 'Hauts-de-Seine', '93': 'Seine-Saint-Denis', '94': 'Val-de-Marne', '95': 'Val-d\'Oise',
+    '971': 'Guadeloupe', '972': 'Martinique', '973': 'Guyane', '974': 'La Réunion', '976': 'Mayotte',
+}
+
+
+def lire_csv(chemin: str, **options) -> pd.DataFrame:
+    """
+    pd.read_csv avec le moteur pyarrow (multi-thread) s'il est installé, sinon le moteur C.
+
+    Paramètres :
+        chemin : fichier CSV
+        options : arguments de pd.read_csv (sep, dtype, usecols, na_values...)
+    Retour :
+        DataFrame lu
+    """
+    if PYARROW_AVAILABLE:
+        return pd.read_csv(chemin, engine="pyarrow", **options)
+    return pd.read_csv(chemin, engine="c", **options)
+
+
+def extraire_entier(serie: pd.Series) -> pd.Series:
+    """
+    Valeur entière d'un texte avec unité, en une passe vectorisée ("220 000 €" -> 220000).
+
+    Paramètres :
+        serie : colonne texte (ou déjà numérique, renvoyée telle quelle en Int64)
+    Retour :
+        Series Int64
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype("Int64")
+    valeur = serie.str.extract(r"(\d[\d\s]*)", expand=False).str.replace(r"\s", "", regex=True)
+    return pd.to_numeric(valeur, errors="coerce").astype("Int64")
+
+
+def extraire_decimal(serie: pd.Series) -> pd.Series:
+    """
+    Valeur décimale d'un texte avec unité, en une passe vectorisée ("45,5 m²" -> 45.5).
+
+    Paramètres :
+        serie : colonne texte (ou déjà numérique, renvoyée telle quelle en float64)
+    Retour :
+        Series float64
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype("float64")
+    valeur = (serie.str.extract(r"(\d[\d\s]*(?:[.,]\d+)?)", expand=False)
+                   .str.replace(r"\s", "", regex=True)
+                   .str.replace(",", ".", regex=False))
+    return pd.to_numeric(valeur, errors="coerce").astype("float64")
+
+
+def normaliser_code(serie: pd.Series, longueur: int) -> pd.Series:
+    """
+    Code postal ou département en texte, complété par des zéros à gauche ("1550" -> "01550").
+    Un ".0" laissé par une colonne lue en float est retiré.
+
+    Paramètres :
+        serie : colonne texte
+        longueur : nombre de caractères attendu (5 pour un code postal, 2 pour un département)
+    Retour :
+        Series string (NA conservés)
+    """
+    return serie.astype("string").str.strip().str.replace(r"\.0+$", "", regex=True).str.zfill(longueur)
+
+
+def lire_source(nom: str, dossier: str = ".", chemin: Optional[str] = None) -> pd.DataFrame:
+    """
+    Lit une source avec son schéma : types explicites, noms de colonnes communs, codes postaux
+    en texte et valeurs numériques sans unité.
+
+    Paramètres :
+        nom : clé de SOURCES ("etrepro1", "etrepro2", "seloger")
+        dossier : dossier du fichier de la source
+        chemin : fichier à lire à la place de celui du schéma
+    Retour :
+        DataFrame typé
+    """
+    schema = SOURCES[nom]
+    df = lire_csv(
+        chemin or os.path.join(dossier, schema["fichier"]),
+        sep=schema["sep"],
+        usecols=list(schema["types"]),
+        dtype=schema["types"],
+        na_values=VALEURS_MANQUANTES,
+    )
+    return preparer_source(df, nom)
+
+
+def lire_source_par_blocs(nom: str, dossier: str = ".", chemin: Optional[str] = None,
+                          taille_bloc: int = TAILLE_BLOC) -> Iterator[pd.DataFrame]:
+    """
+    Comme lire_source, mais bloc par bloc de `taille_bloc` lignes (moteur C, le moteur pyarrow
+    ne lit pas par blocs).
+
+    Paramètres :
+        nom : clé de SOURCES
+        dossier : dossier du fichier de la source
+        chemin : fichier à lire à la place de celui du schéma
+        taille_bloc : nombre de lignes par bloc
+    Retour :
+        itérateur de DataFrames typés
+    """
+    schema = SOURCES[nom]
+    lecteur = pd.read_csv(
+        chemin or os.path.join(dossier, schema["fichier"]),
+        sep=schema["sep"],
+        usecols=list(schema["types"]),
+        dtype=schema["types"],
+        na_values=VALEURS_MANQUANTES,
+        chunksize=taille_bloc,
+    )
+    with lecteur:
+        for bloc in lecteur:
+            yield preparer_source(bloc, nom)
+
+
+def preparer_source(df: pd.DataFrame, nom: str) -> pd.DataFrame:
+    """
+    Applique le schéma d'une source à un DataFrame lu : renommage, valeurs sans unité, codes en texte.
+
+    Paramètres :
+        df : DataFrame lu avec les types du schéma
+        nom : clé de SOURCES
+    Retour :
+        DataFrame aux noms de colonnes communs
+    """
+    schema = SOURCES[nom]
+    df = df.rename(columns=schema["renommage"])
+
+    for colonne in schema["entiers"]:
+        df[colonne] = extraire_entier(df[colonne])
+    for colonne in schema["decimaux"]:
+        df[colonne] = extraire_decimal(df[colonne])
+
+    df["code_postal"] = normaliser_code(df["code_postal"], 5)
+    if "code_departement" in df:
+        df["code_departement"] = normaliser_code(df["code_departement"], 2)
+    else:
+        df["code_departement"] = df["code_postal"].str[:2]
+    if "departement" not in df:
+        df["departement"] = df["code_departement"].map(DEPARTMENTS).astype("string")
+    return df
+
+
+def assembler(sources: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Rassemble les sources et garde les colonnes utiles (prix_m2 est calculé plus tard).
+
+    Paramètres :
+        sources : DataFrames renvoyés par lire_source
+    Retour :
+        DataFrame unique avec COLONNES_FINALES
+    """
+    df = pd.concat(sources, ignore_index=True)
+    df["prix_m2"] = np.nan
+    for colonne in COLONNES_FINALES:
+        if colonne not in df:
+            # Colonne absente de toutes les sources assemblées (un bloc d'une seule source) : manquante
+            # mais typée, un pd.NA nu donnerait une colonne object que finaliser ne sait pas arrondir
+            texte = TYPES_PROPRES[colonne] in ("category", "string")
+            df[colonne] = pd.Series(pd.NA if texte else np.nan, index=df.index,
+                                    dtype="string" if texte else "float64")
+    return df[COLONNES_FINALES]
+
+
+def filtrer(df: pd.DataFrame, dedoublonner: bool = True) -> pd.DataFrame:
+    """
+    Supprime les annonces incomplètes ou incohérentes et les doublons d'URL.
+
+    Paramètres :
+        df : DataFrame assemblé
+        dedoublonner : False quand les doublons sont gérés à part (mode par blocs, UrlsVues)
+    Retour :
+        DataFrame filtré
+    """
+    taille = len(df)
+    df = df[df["prix"].notna() & df["type_de_bien"].notna()
+            & df["code_departement"].notna() & df["departement"].notna()]
+    logger.info(f"Annonces incomplètes supprimées : {taille - len(df)}")
+    taille = len(df)
+
+    df = df.assign(type_de_bien=df["type_de_bien"].replace(
+        {"Appartement": "appartement", "Maison": "maison", "Terrain": "terrain"}))
+    terrain = df["type_de_bien"] == "terrain"
+    invalide = (
+        (~terrain & df["surface_interieure"].isna())
+        | (terrain & df["surface_interieure"].notna())
+        | (terrain & df["surface_terrain"].isna())
+    )
+    df = df[~invalide]
+    logger.info(f"Annonces sans surface cohérente supprimées : {taille - len(df)}")
+    taille = len(df)
+
+    terrain = df["type_de_bien"] == "terrain"
+    hors_bornes = (
+        (df["type_de_bien"].isin(TYPES_AVEC_SURFACE)
+         & ((df["surface_interieure"] < 10) | (df["surface_interieure"] > 2000)))
+        | (terrain & ((df["surface_exterieure"] < 50) | (df["surface_exterieure"] > 50000)))
+    )
+    df = df[~hors_bornes.fillna(False)]
+    logger.info(f"Surfaces hors bornes supprimées : {taille - len(df)}")
+    taille = len(df)
+
+    if dedoublonner:
+        df = df.drop_duplicates(subset=["url_annonce"])
+        logger.info(f"Doublons supprimés : {taille - len(df)}")
+    return df
+
+
+def hacher_urls(urls: pd.Series) -> np.ndarray:
+    """
+    Hachage 64 bits de chaque URL (8 octets par annonce au lieu de la chaîne).
+
+    Paramètres :
+        urls : colonne url_annonce
+    Retour :
+        tableau numpy uint64
+    """
+    return pd.util.hash_pandas_object(urls.astype("string"), index=False).to_numpy()
+
+
+class UrlsVues:
+    """
+    Ensemble persistant des hachages d'URL déjà écrites (tableau uint64 trié, sauvegardé en .npy).
+    Remplace drop_duplicates sur le DataFrame complet : la première occurrence est gardée, comme
+    avant, mais seule la liste des hachages reste en mémoire.
+    """
+
+    def __init__(self, chemin: Optional[str] = None):
+        self.chemin = chemin
+        self.hachages = np.empty(0, dtype=np.uint64)
+        if chemin and os.path.exists(chemin):
+            self.hachages = np.load(chemin)
+
+    def __len__(self) -> int:
+        return len(self.hachages)
+
+    def nouvelles(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Garde les annonces dont l'URL n'a jamais été vue (ni avant, ni plus haut dans le bloc),
+        puis les ajoute à l'ensemble.
+
+        Paramètres :
+            df : bloc filtré
+        Retour :
+            bloc sans doublons
+        """
+        hachages = hacher_urls(df["url_annonce"])
+        # self.hachages est trié : recherche dichotomique plutôt qu'un np.isin qui le retrierait
+        positions = np.searchsorted(self.hachages, hachages)
+        deja_vues = np.zeros(len(hachages), dtype=bool)
+        if len(self.hachages):
+            dans_le_tableau = positions < len(self.hachages)
+            deja_vues[dans_le_tableau] = self.hachages[positions[dans_le_tableau]] == hachages[dans_le_tableau]
+        _, premieres = np.unique(hachages, return_index=True)
+        premiere = np.zeros(len(hachages), dtype=bool)
+        premiere[premieres] = True
+        garder = premiere & ~deja_vues
+        self.hachages = np.union1d(self.hachages, hachages[garder])
+        return df[garder]
+
+    def sauvegarder(self):
+        if self.chemin:
+            np.save(self.chemin, self.hachages)
+
+
+def finaliser(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcule le prix au m² (surface du terrain pour un terrain, surface intérieure sinon) et ne
+    garde que la première partie des adresses parisiennes.
+
+    Paramètres :
+        df : DataFrame filtré
+    Retour :
+        DataFrame final
+    """
+    surface = df["surface_terrain"].where(df["type_de_bien"] == "terrain", df["surface_interieure"])
+    df = df.assign(prix_m2=(df["prix"].astype("float64") / surface).round(2))
+    df["Address"] = df["Address"].str.replace(r"\s*,?\s*Paris.*$", "", regex=True)
+    return compacter(df)
+
+
+def compacter(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convertit le jeu nettoyé dans les types de TYPES_PROPRES. Les entiers lus en décimal
+    (prix "235000.0" d'EtreProprio) sont tronqués, comme le faisait le notebook. Un entier hors de
+    la plage de son type (nombre de pièces au-delà de 127, prix au-delà de 2^31) est une erreur de
+    saisie : il devient manquant au lieu de faire échouer la conversion.
+
+    Paramètres :
+        df : DataFrame finalisé
+    Retour :
+        DataFrame aux types compacts
+    """
+    df = df.copy()
+    for colonne, type_ in TYPES_PROPRES.items():
+        if type_ in ("Int8", "Int32"):
+            valeurs = np.trunc(df[colonne].astype("float64"))
+            bornes = np.iinfo(type_.lower())
+            hors_plage = (valeurs < bornes.min) | (valeurs > bornes.max)
+            if hors_plage.any():
+                logger.info(f"{colonne} : {int(hors_plage.sum())} valeurs hors plage mises à manquant")
+                valeurs = valeurs.mask(hors_plage)
+            df[colonne] = valeurs
+        df[colonne] = df[colonne].astype(type_)
+    return df
+
+
+def cles_de_blocage(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clés de blocage des annonces : code postal, type de bien, tranches logarithmiques de prix et
+    de surface. Deux annonces dont les prix (ou surfaces) diffèrent de moins de la tolérance sont
+    dans la même tranche ou dans deux tranches voisines.
+
+    Paramètres :
+        df : DataFrame finalisé
+    Retour :
+        DataFrame (ligne, code_postal, type_de_bien, tranche_prix, tranche_surface), sans les
+        annonces sans prix ou sans surface, qui ne peuvent pas être rapprochées
+    """
+    terrain = df["type_de_bien"] == "terrain"
+    surface = df["surface_terrain"].where(terrain, df["surface_interieure"]).astype("float64")
+    prix = df["prix"].astype("float64")
+    cles = pd.DataFrame({
+        "ligne": np.arange(len(df)),
+        "code_postal": df["code_postal"].astype("string").to_numpy(),
+        "type_de_bien": df["type_de_bien"].astype("string").str.lower().to_numpy(),
+        "tranche_prix": np.floor(np.log(prix.where(prix > 0)) / np.log1p(TOLERANCE_PRIX)).to_numpy(),
+        "tranche_surface": np.floor(np.log(surface.where(surface > 0)) / np.log1p(TOLERANCE_SURFACE)).to_numpy(),
+    })
+    return cles.dropna()
+
+
+def paires_candidates(cles: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Paires d'annonces de même bloc, tranches voisines comprises, par une jointure pandas : le coût
+    suit la taille des blocs et non le carré du nombre d'annonces.
+
+    Paramètres :
+        cles : résultat de cles_de_blocage
+    Retour :
+        (lignes a, lignes b) avec a < b, chaque paire une seule fois
+    """
+    # Copies décalées d'un côté seulement : prix de b dans la tranche de a ou la précédente, surface
+    # dans l'une des trois tranches autour ; l'autre ordre de la paire couvre le reste
+    voisins = pd.concat([
+        cles.assign(tranche_prix=cles["tranche_prix"] + decalage_prix,
+                    tranche_surface=cles["tranche_surface"] + decalage_surface)
+        for decalage_prix in (0, 1) for decalage_surface in (-1, 0, 1)
+    ], ignore_index=True)
+    paires = cles.merge(voisins, on=["code_postal", "type_de_bien", "tranche_prix", "tranche_surface"],
+                        suffixes=("_a", "_b"))
+    a = np.minimum(paires["ligne_a"].to_numpy(), paires["ligne_b"].to_numpy())
+    b = np.maximum(paires["ligne_a"].to_numpy(), paires["ligne_b"].to_numpy())
+    uniques = pd.DataFrame({"a": a[a != b], "b": b[a != b]}).drop_duplicates()
+    return uniques["a"].to_numpy(), uniques["b"].to_numpy()
+
+
+def scorer_paires(df: pd.DataFrame, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Score de similarité (0 à 1) de chaque paire, calculé sur des tableaux : écarts relatifs de prix
+    et de surface (nuls à 1, au double de la tolérance à 0), égalité du nombre de pièces et de la
+    ville (0,5 quand l'une des deux valeurs manque), pondérés par POIDS_DOUBLONS.
+
+    Paramètres :
+        df : DataFrame finalisé
+        a, b : positions des deux annonces de chaque paire
+    Retour :
+        scores des paires
+    """
+    def proximite(valeurs: np.ndarray, tolerance: float) -> np.ndarray:
+        ecart = np.abs(valeurs[a] - valeurs[b]) / np.maximum(valeurs[a], valeurs[b])
+        return np.clip(1 - ecart / (2 * tolerance), 0, 1)
+
+    def egalite(valeurs: np.ndarray, manquant: np.ndarray) -> np.ndarray:
+        return np.where(manquant[a] | manquant[b], 0.5, (valeurs[a] == valeurs[b]).astype("float64"))
+
+    terrain = (df["type_de_bien"] == "terrain").to_numpy()
+    surface = np.where(terrain, df["surface_terrain"].to_numpy("float64", na_value=np.nan),
+                       df["surface_interieure"].to_numpy("float64", na_value=np.nan))
+    pieces = df["nombre_de_pieces"].to_numpy("float64", na_value=np.nan)
+    ville = df["ville"].astype("string").str.lower().str.strip()
+
+    return (
+        POIDS_DOUBLONS["prix"] * proximite(df["prix"].to_numpy("float64", na_value=np.nan), TOLERANCE_PRIX)
+        + POIDS_DOUBLONS["surface"] * proximite(surface, TOLERANCE_SURFACE)
+        + POIDS_DOUBLONS["pieces"] * egalite(pieces, np.isnan(pieces))
+        + POIDS_DOUBLONS["ville"] * egalite(ville.fillna("").to_numpy(object), ville.isna().to_numpy())
+    )
+
+
+def regrouper(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Union-find sur des tableaux : chaque paire accroche la racine la plus grande à la plus petite,
+    puis les chemins sont compressés par sauts de pointeurs, jusqu'à ce que les deux annonces de
+    chaque paire aient la même racine.
+
+    Paramètres :
+        n : nombre d'annonces
+        a, b : paires retenues
+    Retour :
+        racine (plus petite position du groupe) de chaque annonce
+    """
+    parent = np.arange(n)
+    while True:
+        racine_a, racine_b = parent[a], parent[b]
+        if (racine_a == racine_b).all():
+            return parent
+        plus_petite = np.minimum(racine_a, racine_b)
+        np.minimum.at(parent, racine_a, plus_petite)
+        np.minimum.at(parent, racine_b, plus_petite)
+        while True:
+            suivant = parent[parent]
+            if (suivant == parent).all():
+                break
+            parent = suivant
+
+
+def detecter_doublons(df: pd.DataFrame, seuil: float = SEUIL_DOUBLON) -> pd.Series:
+    """
+    Repère la même annonce publiée sur plusieurs sites (SeLoger et EtreProprio), que le
+    dédoublonnage par URL ne voit pas : blocage, score des paires candidates de sources
+    différentes, puis regroupement des paires au-dessus du seuil.
+
+    Paramètres :
+        df : DataFrame finalisé
+        seuil : score minimal pour considérer deux annonces comme la même
+    Retour :
+        numéro de groupe de chaque annonce (Int32, manquant pour une annonce sans doublon)
+    """
+    debut = time.perf_counter()
+    a, b = paires_candidates(cles_de_blocage(df))
+    # Le site se lit dans l'URL : deux annonces d'un même site sont deux biens distincts
+    # (programmes neufs aux lots identiques)
+    site = df["url_annonce"].astype("string").str.extract(r"//(?:www\.)?([^/]+)", expand=False).to_numpy(object)
+    autre_site = site[a] != site[b]
+    a, b = a[autre_site], b[autre_site]
+    retenues = scorer_paires(df, a, b) >= seuil
+
+    racines = regrouper(len(df), a[retenues], b[retenues])
+    taille = np.bincount(racines, minlength=len(df))[racines]
+    # Groupes numérotés à partir de 0 ; factorize donne -1 aux annonces seules (NaN)
+    codes = pd.factorize(np.where(taille > 1, racines, np.nan))[0]
+    groupes = pd.Series(codes, index=df.index).where(codes >= 0).astype("Int32")
+    logger.info(f"Doublons entre sources : {len(a)} paires candidates, {int(retenues.sum())} retenues, "
+                f"{int((taille > 1).sum())} annonces en {groupes.nunique()} groupes "
+                f"({time.perf_counter() - debut:.1f}s)")
+    return groupes
+
+
+def fusionner_doublons(df: pd.DataFrame, groupes: pd.Series) -> pd.DataFrame:
+    """
+    Garde une annonce par groupe de doublons : la plus complète, dont les valeurs manquantes sont
+    prises dans les autres annonces du groupe.
+
+    Paramètres :
+        df : DataFrame finalisé
+        groupes : résultat de detecter_doublons
+    Retour :
+        DataFrame sans doublons entre sources
+    """
+    doublons = df[groupes.notna()]
+    ordre = np.lexsort((np.arange(len(doublons)), -doublons.notna().sum(axis=1).to_numpy()))
+    doublons = doublons.iloc[ordre]
+    cle = groupes[doublons.index].to_numpy("int64")
+    fusion = doublons.groupby(cle, sort=False).first()
+    fusion.index = doublons.index.to_series().groupby(cle, sort=False).first().to_numpy()
+    fusion = fusion.astype(df.dtypes.to_dict())
+    logger.info(f"Doublons entre sources fusionnés : {len(doublons) - len(fusion)} annonces supprimées")
+    return pd.concat([df[groupes.isna()], fusion]).sort_index()
+
+
+def nettoyer(dossier: str = ".", sortie: Optional[str] = "clean_data.csv",
+             fichiers: Optional[Dict[str, str]] = None, parquet: Optional[str] = None,
+             base: Optional[str] = None, doublons: Optional[str] = None) -> pd.DataFrame:
+    """
+    Chaîne complète : lecture typée des sources, assemblage, filtres, prix au m², export CSV.
+
+    Paramètres :
+        dossier : dossier des fichiers sources
+        sortie : CSV à écrire (None pour ne rien écrire)
+        fichiers : chemins remplaçant ceux des schémas, par nom de source
+        parquet : dossier du jeu Parquet partitionné à écrire en plus (remplacé)
+        base : base DuckDB à écrire en plus (table annonces remplacée)
+        doublons : "marquer" (colonne groupe_doublon) ou "fusionner" les annonces publiées sur
+            plusieurs sites (None : dédoublonnage par URL seulement)
+    Retour :
+        DataFrame nettoyé
+    """
+    debut = time.perf_counter()
+    fichiers = fichiers or {}
+    sources = []
+    for nom in SOURCES:
+        df = lire_source(nom, dossier, fichiers.get(nom))
+        logger.info(f"{nom} : {len(df)} annonces lues")
+        sources.append(df)
+
+    df = finaliser(filtrer(assembler(sources)))
+    if doublons:
+        groupes = detecter_doublons(df)
+        df = fusionner_doublons(df, groupes) if doublons == "fusionner" else df.assign(groupe_doublon=groupes)
+    logger.info(f"{len(df)} annonces nettoyées en {time.perf_counter() - debut:.1f}s "
+                f"(moteur {'pyarrow' if PYARROW_AVAILABLE else 'C'})")
+    if sortie:
+        df.to_csv(sortie)
+    if parquet:
+        shutil.rmtree(parquet, ignore_errors=True)
+        ecrire_parquet(df, parquet)
+    if base:
+        ecrire_duckdb(df, base)
+    return df
+
+
+def nettoyer_par_blocs(dossier: str = ".", sortie: str = "clean_data.csv", taille_bloc: int = TAILLE_BLOC,
+                      fichier_hachages: Optional[str] = None, fichiers: Optional[Dict[str, str]] = None,
+                      parquet: Optional[str] = None, base: Optional[str] = None) -> int:
+    """
+    Même nettoyage que nettoyer(), en mémoire bornée : chaque source est lue par blocs, chaque bloc
+    est filtré, dédoublonné avec UrlsVues puis ajouté au CSV de sortie. Seuls un bloc et les
+    hachages d'URL sont en mémoire.
+
+    Paramètres :
+        dossier : dossier des fichiers sources
+        sortie : CSV à écrire (remplacé, puis complété bloc par bloc)
+        taille_bloc : lignes lues à la fois par source
+        fichier_hachages : .npy des URL déjà écrites, conservé entre deux exécutions
+            (None : dédoublonnage limité à cette exécution). S'il contient des URL, la sortie
+            existante est complétée au lieu d'être remplacée : elle contient déjà ces annonces.
+        fichiers : chemins remplaçant ceux des schémas, par nom de source
+        parquet : dossier du jeu Parquet à écrire en plus (remplacé, un fichier par bloc et partition)
+        base : base DuckDB à écrire en plus (table annonces remplacée, complétée bloc par bloc)
+    Retour :
+        nombre d'annonces écrites
+    """
+    debut = time.perf_counter()
+    fichiers = fichiers or {}
+    urls = UrlsVues(fichier_hachages)
+    # Reprise : les URL vues sont déjà dans la sortie, qui est complétée (index continu) et non
+    # remplacée ; sans la sortie, les hachages n'ont plus de sens et tout est réécrit
+    reprise = len(urls) > 0 and os.path.exists(sortie)
+    if reprise:
+        logger.info(f"{len(urls)} URL déjà écrites par une exécution précédente seront ignorées")
+    elif len(urls):
+        logger.warning(f"{sortie} absent : les hachages de {fichier_hachages} sont ignorés, tout est réécrit")
+        urls.hachages = urls.hachages[:0]
+
+    if parquet and not reprise:
+        shutil.rmtree(parquet, ignore_errors=True)
+    if base and not (reprise and os.path.exists(base)):
+        ecrire_duckdb(pd.DataFrame(columns=COLONNES_FINALES).astype(TYPES_PROPRES), base)
+
+    deja_ecrites = len(lire_propre(sortie, usecols=[0])) if reprise else 0
+    ecrites = 0
+    lues = 0
+    numero = 0
+    execution = datetime.now().strftime("%Y%m%d%H%M%S")
+    for nom in SOURCES:
+        for bloc in lire_source_par_blocs(nom, dossier, fichiers.get(nom), taille_bloc):
+            lues += len(bloc)
+            df = finaliser(urls.nouvelles(filtrer(assembler([bloc]), dedoublonner=False)))
+            # Index continu, comme le CSV écrit d'un seul tenant par nettoyer()
+            df.index = pd.RangeIndex(deja_ecrites + ecrites, deja_ecrites + ecrites + len(df))
+            nouveau = ecrites == 0 and not reprise
+            df.to_csv(sortie, mode="w" if nouveau else "a", header=nouveau)
+            if parquet and len(df):
+                ecrire_parquet(df, parquet, f"bloc-{execution}-{numero:05d}-{{i}}.parquet", remplacer=False)
+                numero += 1
+            if base and len(df):
+                ecrire_duckdb(df, base, remplacer=False)
+            ecrites += len(df)
+        logger.info(f"{nom} : terminé ({lues} annonces lues, {ecrites} écrites au total)")
+        urls.sauvegarder()
+
+    if ecrites == 0 and not reprise:
+        # Aucune annonce retenue : CSV vide mais avec l'en-tête
+        pd.DataFrame(columns=COLONNES_FINALES).to_csv(sortie)
+    logger.info(f"{ecrites} annonces nettoyées en {time.perf_counter() - debut:.1f}s (blocs de {taille_bloc} lignes)")
+    return ecrites
+
+
+def en_texte(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Catégories converties en texte avant l'écriture en Parquet ou DuckDB : les deux encodent déjà
+    les chaînes en dictionnaire, et le schéma reste le même d'un bloc à l'autre (une catégorie vide
+    n'a pas de type, DuckDB ferait d'une catégorie un ENUM propre à chaque bloc).
+
+    Paramètres :
+        df : DataFrame aux types de TYPES_PROPRES
+    Retour :
+        DataFrame aux colonnes catégorielles en texte
+    """
+    return df.astype({colonne: "string" for colonne, type_ in TYPES_PROPRES.items() if type_ == "category"})
+
+
+def partitionnement():
+    """Partitionnement Hive par code_departement, lu en texte ('2A', '01' et '971' restent intacts)."""
+    return ds.partitioning(pa.schema([("code_departement", pa.string())]), flavor="hive")
+
+
+def ecrire_parquet(df: pd.DataFrame, dossier: str, modele: str = "partie-{i}.parquet",
+                   remplacer: bool = True):
+    """
+    Écrit des annonces nettoyées dans le jeu Parquet partitionné par code_departement
+    (<dossier>/code_departement=75/partie-0.parquet...). Les lignes sont triées par ville et prix
+    au m² dans chaque partition pour que les statistiques des groupes de lignes permettent d'en
+    sauter la plupart quand on filtre sur ces colonnes.
+
+    Paramètres :
+        df : DataFrame finalisé
+        dossier : racine du jeu Parquet
+        modele : nom des fichiers écrits ({i} numérote les fichiers d'une partition)
+        remplacer : vide d'abord les partitions écrites ; False pour ajouter des fichiers
+    """
+    df = en_texte(df).sort_values(["code_departement", "ville", "prix_m2"])
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        dossier,
+        format="parquet",
+        partitioning=partitionnement(),
+        basename_template=modele,
+        existing_data_behavior="delete_matching" if remplacer else "overwrite_or_ignore",
+        max_rows_per_group=TAILLE_GROUPE_LIGNES,
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+
+
+def mettre_a_jour_parquet(nouvelles: pd.DataFrame, dossier: str):
+    """
+    Upsert par URL dans le jeu Parquet : seules les partitions des départements touchés sont
+    relues, débarrassées des anciennes versions des annonces puis réécrites.
+
+    Paramètres :
+        nouvelles : annonces nettoyées (filtrées et finalisées)
+        dossier : racine du jeu Parquet existant
+    """
+    nouvelles = nouvelles.drop_duplicates(subset=["url_annonce"], keep="last")
+    codes = nouvelles["code_departement"].astype("string").unique().tolist()
+    anciennes = ds.dataset(dossier, format="parquet", partitioning=partitionnement()).to_table(
+        filter=ds.field("code_departement").isin(codes)).to_pandas()
+    anciennes = anciennes[~anciennes["url_annonce"].isin(nouvelles["url_annonce"])]
+    touchees = compacter(pd.concat([anciennes[COLONNES_FINALES], nouvelles], ignore_index=True))
+    ecrire_parquet(touchees, dossier)
+    logger.info(f"Parquet : {len(codes)} partition(s) réécrite(s) dans {dossier}")
+
+
+def ecrire_duckdb(df: pd.DataFrame, fichier: str, remplacer: bool = True):
+    """
+    Écrit des annonces nettoyées dans la table `annonces` de la base DuckDB lue par le tableau de
+    bord. La table est triée par département, ville et type de bien : les zones min/max que DuckDB
+    garde par groupe de lignes servent alors d'index pour les filtres sur ces colonnes.
+
+    Avec `remplacer`, la base est construite dans un fichier temporaire renommé ensuite sur
+    l'ancienne : le tableau de bord, qui l'ouvre requête par requête, n'empêche pas l'écriture et
+    ne voit jamais une table à moitié écrite. Sans `remplacer`, upsert par URL : les anciennes
+    versions des annonces sont supprimées avant l'insertion (mode par blocs et incrémental).
+
+    Paramètres :
+        df : DataFrame finalisé
+        fichier : base DuckDB (créée si besoin)
+        remplacer : recrée la table ; False pour compléter la table existante
+    """
+    nouvelles = en_texte(df).reset_index(drop=True)
+    if remplacer:
+        temporaire = fichier + ".tmp"
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        with duckdb.connect(temporaire) as connexion:
+            connexion.register("nouvelles", nouvelles)
+            connexion.execute("CREATE TABLE annonces AS SELECT * FROM nouvelles "
+                              "ORDER BY code_departement, departement, ville, type_de_bien")
+        os.replace(temporaire, fichier)
+        return
+
+    with duckdb.connect(fichier) as connexion:
+        connexion.register("nouvelles", nouvelles)
+        connexion.execute("CREATE TABLE IF NOT EXISTS annonces AS SELECT * FROM nouvelles LIMIT 0")
+        connexion.execute("BEGIN TRANSACTION")
+        connexion.execute("DELETE FROM annonces WHERE url_annonce IN (SELECT url_annonce FROM nouvelles)")
+        connexion.execute(f"INSERT INTO annonces ({', '.join(COLONNES_FINALES)}) "
+                          f"SELECT {', '.join(COLONNES_FINALES)} FROM nouvelles")
+        connexion.execute("COMMIT")
+
+
+def lire_propre(chemin: str, **options) -> pd.DataFrame:
+    """
+    Relit un CSV nettoyé dans les types compacts de TYPES_PROPRES. Lecture par le moteur C, les
+    catégories en texte puis converties : le moteur pyarrow infère le type des colonnes avant
+    d'appliquer `dtype`, et les codes postaux perdraient leurs zéros initiaux.
+
+    Paramètres :
+        chemin : CSV écrit par nettoyer(), nettoyer_par_blocs() ou nettoyer_incremental()
+        options : arguments supplémentaires de pd.read_csv (usecols, dtype...)
+    Retour :
+        DataFrame typé
+    """
+    types = options.pop("dtype", TYPES_PROPRES)
+    lecture = {colonne: "string" if type_ == "category" else type_ for colonne, type_ in types.items()}
+    df = pd.read_csv(chemin, engine="c", index_col=0, na_values=VALEURS_MANQUANTES, dtype=lecture, **options)
+    return df.astype({colonne: type_ for colonne, type_ in types.items()
+                      if type_ == "category" and colonne in df.columns})
+
+
+def fin_derniere_ligne(chemin: str) -> int:
+    """
+    Position juste après le dernier saut de ligne du fichier : une ligne en cours d'écriture par le
+    scraper n'est pas lue, elle le sera à l'exécution suivante.
+
+    Paramètres :
+        chemin : fichier source
+    Retour :
+        position en octets (0 si le fichier n'a aucune ligne complète)
+    """
+    with open(chemin, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            debut = max(0, position - 65536)
+            f.seek(debut)
+            fin = f.read(position - debut).rfind(b"\n")
+            if fin >= 0:
+                return debut + fin + 1
+            position = debut
+    return 0
+
+
+def empreinte(chemin: str, fin: int) -> str:
+    """
+    Empreinte des octets déjà traités (début du fichier et partie juste avant `fin`), pour
+    vérifier qu'un fichier a seulement grandi depuis la dernière exécution.
+
+    Paramètres :
+        chemin : fichier source
+        fin : position traitée
+    Retour :
+        empreinte hexadécimale
+    """
+    hachage = hashlib.blake2b(digest_size=16)
+    with open(chemin, "rb") as f:
+        hachage.update(f.read(min(fin, TAILLE_EMPREINTE)))
+        if fin > TAILLE_EMPREINTE:
+            f.seek(max(TAILLE_EMPREINTE, fin - TAILLE_EMPREINTE))
+            hachage.update(f.read(fin - f.tell()))
+    return hachage.hexdigest()
+
+
+def lire_lignes(nom: str, chemin: str, debut: int, fin: int) -> pd.DataFrame:
+    """
+    Lit les lignes d'une source comprises entre deux positions en octets, avec son schéma.
+
+    Paramètres :
+        nom : clé de SOURCES
+        chemin : fichier source
+        debut : position de départ (0 : juste après l'en-tête)
+        fin : position de fin (fin d'une ligne)
+    Retour :
+        DataFrame typé des nouvelles lignes
+    """
+    schema = SOURCES[nom]
+    with open(chemin, "rb") as f:
+        entete = f.readline()
+        debut = max(debut, len(entete))
+        f.seek(debut)
+        donnees = f.read(max(0, fin - debut))
+    colonnes = next(csv.reader([entete.decode("utf-8-sig")], delimiter=schema["sep"]))
+    # Moteur C : le moteur pyarrow applique usecols aux noms du fichier, pas à ceux de `names`
+    df = pd.read_csv(
+        io.BytesIO(donnees),
+        engine="c",
+        sep=schema["sep"],
+        header=None,
+        names=colonnes,
+        usecols=list(schema["types"]),
+        dtype=schema["types"],
+        na_values=VALEURS_MANQUANTES,
+    )
+    return preparer_source(df, nom)
+
+
+def fusionner(nouvelles: pd.DataFrame, sortie: str) -> Tuple[int, int]:
+    """
+    Upsert par URL dans le CSV nettoyé : une annonce déjà présente est remplacée par sa version
+    la plus récente, les autres sont ajoutées. Sans URL commune, les lignes sont simplement
+    ajoutées à la fin du fichier ; sinon le fichier est réécrit. Les nouvelles lignes prennent les
+    colonnes du fichier existant (groupe_doublon après --doublons marquer, vide pour elles).
+
+    Paramètres :
+        nouvelles : annonces nettoyées (filtrées et finalisées)
+        sortie : CSV nettoyé
+    Retour :
+        (annonces ajoutées, annonces remplacées)
+    """
+    nouvelles = nouvelles.drop_duplicates(subset=["url_annonce"], keep="last")
+    if not os.path.exists(sortie):
+        nouvelles.reset_index(drop=True).to_csv(sortie)
+        return len(nouvelles), 0
+
+    colonnes = pd.read_csv(sortie, engine="c", index_col=0, nrows=0).columns
+    nouvelles = nouvelles.reindex(columns=colonnes)
+    # Sans index_col : avec usecols, lire_propre prendrait url_annonce pour l'index
+    urls = pd.read_csv(sortie, engine="c", usecols=["url_annonce"], dtype="string")["url_annonce"]
+    communes = nouvelles["url_annonce"].isin(urls)
+    remplacees = int(communes.sum())
+    if remplacees == 0:
+        nouvelles = nouvelles.set_axis(pd.RangeIndex(len(urls), len(urls) + len(nouvelles)))
+        nouvelles.to_csv(sortie, mode="a", header=False)
+        return len(nouvelles), 0
+
+    propre = lire_propre(sortie)
+    propre = propre[~propre["url_annonce"].isin(nouvelles["url_annonce"])].reset_index(drop=True)
+    # Réécriture en deux temps plutôt qu'un concat : les catégories des deux parties diffèrent
+    propre.to_csv(sortie)
+    nouvelles = nouvelles.set_axis(pd.RangeIndex(len(propre), len(propre) + len(nouvelles)))
+    nouvelles.to_csv(sortie, mode="a", header=False)
+    return len(nouvelles) - remplacees, remplacees
+
+
+def nettoyer_incremental(dossier: str = ".", sortie: str = "clean_data.csv", fichier_etat: Optional[str] = None,
+                         fichiers: Optional[Dict[str, str]] = None, parquet: Optional[str] = None,
+                         base: Optional[str] = None) -> int:
+    """
+    Ne nettoie que les lignes ajoutées aux sources depuis la dernière exécution et les fusionne
+    (upsert par URL) dans le CSV nettoyé existant.
+
+    L'état (<sortie>.etat.json) garde pour chaque fichier source la position déjà traitée et une
+    empreinte des octets correspondants. Un fichier qui a seulement grandi est lu à partir de
+    cette position ; un fichier réécrit (plus court, empreinte différente) est retraité en entier,
+    l'upsert remplaçant ses anciennes annonces.
+
+    Paramètres :
+        dossier : dossier des fichiers sources
+        sortie : CSV nettoyé à compléter (créé s'il n'existe pas)
+        fichier_etat : état à utiliser à la place de <sortie>.etat.json
+        fichiers : chemins remplaçant ceux des schémas, par nom de source
+        parquet : jeu Parquet à tenir à jour aussi (seules les partitions touchées sont réécrites)
+        base : base DuckDB à tenir à jour aussi (upsert par URL dans la table annonces)
+    Retour :
+        nombre d'annonces ajoutées ou remplacées
+    """
+    debut_execution = time.perf_counter()
+    fichiers = fichiers or {}
+    fichier_etat = fichier_etat or os.path.splitext(sortie)[0] + ".etat.json"
+    etat = {}
+    if os.path.exists(fichier_etat) and os.path.exists(sortie):
+        with open(fichier_etat, encoding="utf-8") as f:
+            etat = json.load(f)
+    elif os.path.exists(fichier_etat):
+        logger.warning(f"{sortie} absent : l'état {fichier_etat} est ignoré, tout est retraité")
+
+    blocs = []
+    positions = {}
+    for nom, schema in SOURCES.items():
+        chemin = fichiers.get(nom) or os.path.join(dossier, schema["fichier"])
+        cle = os.path.abspath(chemin)
+        fin = fin_derniere_ligne(chemin)
+        deja = etat.get(cle)
+        debut = 0
+        if deja and deja["position"] <= fin and empreinte(chemin, deja["position"]) == deja["empreinte"]:
+            debut = deja["position"]
+        elif deja:
+            logger.info(f"{nom} : {chemin} a été réécrit, il est retraité en entier")
+
+        if fin > debut:
+            bloc = lire_lignes(nom, chemin, debut, fin)
+            logger.info(f"{nom} : {len(bloc)} nouvelles lignes ({fin - debut} octets)")
+            if len(bloc):
+                blocs.append(bloc)
+        else:
+            logger.info(f"{nom} : rien de nouveau")
+        positions[cle] = {"source": nom, "position": fin, "empreinte": empreinte(chemin, fin),
+                          "date": datetime.now().isoformat(timespec="seconds")}
+
+    ajoutees = remplacees = 0
+    if blocs:
+        nouvelles = finaliser(filtrer(assembler(blocs), dedoublonner=False))
+        ajoutees, remplacees = fusionner(nouvelles, sortie)
+        if parquet and os.path.isdir(parquet):
+            mettre_a_jour_parquet(nouvelles, parquet)
+        if base and os.path.exists(base):
+            ecrire_duckdb(nouvelles.drop_duplicates(subset=["url_annonce"], keep="last"), base, remplacer=False)
+    elif not os.path.exists(sortie):
+        pd.DataFrame(columns=COLONNES_FINALES).to_csv(sortie)
+    if parquet and not os.path.isdir(parquet):
+        # Premier passage avec --parquet : le jeu est créé à partir du CSV complet
+        ecrire_parquet(lire_propre(sortie), parquet)
+    if base and not os.path.exists(base):
+        ecrire_duckdb(lire_propre(sortie), base)
+
+    # L'état n'est écrit qu'une fois le CSV à jour : une exécution interrompue relit les mêmes lignes
+    etat.update(positions)
+    temporaire = fichier_etat + ".tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        json.dump(etat, f, ensure_ascii=False, indent=2)
+    os.replace(temporaire, fichier_etat)
+
+    logger.info(f"{ajoutees} annonces ajoutées, {remplacees} remplacées dans {sortie} "
+                f"en {time.perf_counter() - debut_execution:.1f}s")
+    return ajoutees + remplacees
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nettoyage des annonces SeLoger / EtreProprio")
+    parser.add_argument("--dossier", default=".", help="Dossier des CSV sources")
+    parser.add_argument("--sortie", default="clean_data.csv", help="CSV nettoyé à écrire")
+    parser.add_argument("--blocs", type=int, nargs="?", const=TAILLE_BLOC,
+                        help=f"Lecture par blocs de N lignes, mémoire bornée (défaut {TAILLE_BLOC})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ne nettoyer que les nouvelles lignes des sources et les fusionner dans --sortie")
+    parser.add_argument("--parquet", nargs="?", const=DOSSIER_PARQUET,
+                        help=f"Écrire aussi le jeu Parquet partitionné par département (défaut {DOSSIER_PARQUET})")
+    parser.add_argument("--duckdb", nargs="?", const=FICHIER_DUCKDB,
+                        help=f"Écrire aussi la base DuckDB du tableau de bord (défaut {FICHIER_DUCKDB})")
+    parser.add_argument("--doublons", choices=["marquer", "fusionner"],
+                        help="Repérer les annonces publiées sur plusieurs sites : colonne groupe_doublon ou fusion")
+    parser.add_argument("--hachages", default=None,
+                        help=f"Fichier .npy des URL déjà écrites, gardé entre deux exécutions (ex. {FICHIER_HACHAGES})")
+    args = parser.parse_args()
+    if args.parquet and not PYARROW_AVAILABLE:
+        parser.error("--parquet demande pyarrow : pip install pyarrow")
+    if args.duckdb and not DUCKDB_AVAILABLE:
+        parser.error("--duckdb demande duckdb : pip install duckdb")
+    if args.doublons and (args.incremental or args.blocs):
+        parser.error("--doublons compare toutes les annonces entre elles : pas avec --blocs ni --incremental")
+    if args.incremental:
+        nettoyer_incremental(args.dossier, args.sortie, parquet=args.parquet, base=args.duckdb)
+    elif args.blocs:
+        nettoyer_par_blocs(args.dossier, args.sortie, args.blocs, args.hachages, parquet=args.parquet,
+                           base=args.duckdb)
+    else:
+        nettoyer(args.dossier, args.sortie, parquet=args.parquet, base=args.duckdb, doublons=args.doublons)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Query layer for the cleaned listings, shared by the Streamlit app and the folium notebook.
+
+read_clean() loads rows from the Parquet dataset written by clean_data/traitement.py --parquet
+(partitioned by code_departement), opening only the requested department partitions and
+decoding only the requested columns:
+
+    read_clean(departements=['75'], colonnes=['code_postal', 'prix_m2'])
+
+Aggregations go through query_clean(): SQL on the `annonces` table of the DuckDB file written by
+clean_data/traitement.py --duckdb (or, without it, a view over the Parquet dataset written by
+--parquet or over clean_data.csv), run out of core and multi-threaded, so the caller only holds
+the result:
+
+    query_clean("SELECT departement, AVG(prix_m2) FROM annonces GROUP BY departement")
+    query_clean("SELECT prix_m2 FROM annonces WHERE ville = ?", ['Lyon'])
+
+Each query opens and closes its own connection: a long-lived one would keep the DuckDB file
+locked and the cleaning step could not rewrite it while the dashboard runs.
+"""
+import os
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CLEAN_STORE = "clean_data.parquet"
+CLEAN_CSV = "clean_data.csv"
+CLEAN_DB = "clean_data.duckdb"
+
+# Columns of the clean data (COLONNES_FINALES in clean_data/traitement.py)
+CLEAN_COLUMNS = [
+    'type_de_bien', 'surface_terrain', 'surface_interieure', 'surface_exterieure', 'nombre_de_pieces',
+    'prix', 'prix_m2', 'Address', 'ville', 'code_postal', 'departement', 'code_departement', 'url_annonce',
+]
+
+
+def _sql_string(text: str) -> str:
+    """SQL string literal (a view can't take prepared-statement parameters, so quotes are doubled)."""
+    return "'" + text.replace("'", "''") + "'"
+
+
+def connect(db=CLEAN_DB, store=CLEAN_STORE, csv=CLEAN_CSV):
+    """
+    DuckDB connection exposing the cleaned listings as `annonces`: the table of the database
+    written by the cleaning step, else a view over the Parquet dataset, else over the CSV.
+    """
+    if os.path.exists(db):
+        return duckdb.connect(db, read_only=True)
+    connection = duckdb.connect()
+    if os.path.isdir(store):
+        connection.execute(
+            f"CREATE VIEW annonces AS SELECT * FROM read_parquet({_sql_string(store + '/**/*.parquet')}, "
+            f"hive_partitioning = true, hive_types = {{'code_departement': VARCHAR}})"
+        )
+    elif os.path.exists(csv):
+        connection.execute(
+            f"CREATE VIEW annonces AS SELECT {', '.join(CLEAN_COLUMNS)} FROM read_csv({_sql_string(csv)}, header = true, "
+            f"nullstr = ['N/A', 'NA', ''], types = {{'code_postal': 'VARCHAR', 'code_departement': 'VARCHAR'}})"
+        )
+    else:
+        raise FileNotFoundError(f"no clean data: {db}, {store} or {csv}")
+    return connection
+
+
+def query_clean(sql: str, params=None, db=CLEAN_DB, store=CLEAN_STORE, csv=CLEAN_CSV) -> pd.DataFrame:
+    """Run a query on the cleaned listings (table `annonces`) and return its result."""
+    with connect(db, store, csv) as connection:
+        return connection.execute(sql, params or []).df()
+
+
+def read_clean(departements=None, colonnes=None, chemin=CLEAN_STORE) -> pd.DataFrame:
+    """
+    Cleaned listings of some departments from the Parquet dataset.
+
+    departements: department codes to load ('75', '2A'...), None for all; other partitions are not opened
+    colonnes: columns to load, None for all
+    """
+    # Partition values read as text, so '01' and '2A' keep their form
+    partitioning = ds.partitioning(pa.schema([("code_departement", pa.string())]), flavor="hive")
+    filters = [('code_departement', 'in', list(departements))] if departements is not None else None
+    table = pq.read_table(chemin, columns=colonnes, filters=filters, partitioning=partitioning)
+    return table.to_pandas()
@@ -10,6 +10,11 @@ from scipy import stats
 import numpy as np
 from textwrap import dedent
 
+from clean_store import query_clean
+
+# Cached query results expire after this many seconds, so a new cleaning run shows up
+QUERY_CACHE_TTL = 600
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # PAGE CONFIG & STYLING
@@ -233,23 +238,27 @@ def load_html_map(filepath):
         return f.read()
     
 
-def create_price_by_type_chart(df, selected_dept=None):
+@st.cache_data(ttl=QUERY_CACHE_TTL)
+def run_query(sql, params=()):
+    """Run an aggregation on the clean data (DuckDB, see clean_store) and cache its result."""
+    return query_clean(sql, list(params))
+
+
+def create_price_by_type_chart(selected_dept=None):
     """Create bar chart showing average price by property type."""
-    df_valid = df.dropna(subset=['type_de_bien', 'prix']).copy()
-    df_valid = df_valid[df_valid['prix'] > 0]
-    
     # Filter by department if selected
+    dept_filter, params = "", ()
     if selected_dept and selected_dept != "Tous les départements":
-        df_valid = df_valid[df_valid['departement'] == selected_dept]
-    
-    # Aggregate by type
-    type_data = df_valid.groupby('type_de_bien').agg(
-        prix_moyen=('prix', 'mean'),
-        nombre_annonces=('type_de_bien', 'count')
-    ).reset_index()
+        dept_filter, params = "AND departement = ?", (selected_dept,)
     
-    # Sort by price
-    type_data = type_data.sort_values('prix_moyen', ascending=True)
+    # Aggregate by type, sorted by price
+    type_data = run_query(f"""
+        SELECT type_de_bien, AVG(prix) AS prix_moyen, COUNT(*) AS nombre_annonces
+        FROM annonces
+        WHERE type_de_bien IS NOT NULL AND prix > 0 {dept_filter}
+        GROUP BY type_de_bien
+        ORDER BY prix_moyen
+    """, params)
     
     fig = go.Figure()
     
@@ -288,30 +297,34 @@ def create_price_by_type_chart(df, selected_dept=None):
     
     return fig
 
-def create_price_distribution_by_city(df, selected_city=None, selected_arrondissement=None):
+def create_price_distribution_by_city(selected_city=None, selected_arrondissement=None):
     """Create smooth distribution curve of price per m² for a selected city with percentage."""
     
-    df_valid = df.dropna(subset=['ville', 'prix_m2']).copy()
-    df_valid = df_valid[(df_valid['prix_m2'] > 0) & (df_valid['prix_m2'] < 30000)]
-    
     # Filter based on selection
     if selected_city == "Toutes les villes" or not selected_city:
-        df_city = df_valid
+        city_filter, params = "", ()
         title = 'Distribution du prix au m² - Toutes les villes'
     elif selected_city == "Paris":
         # Filter by Paris department
-        df_city = df_valid[df_valid['departement'] == 'Paris']
+        city_filter, params = "AND departement = 'Paris'", ()
         if selected_arrondissement and selected_arrondissement != "Tout Paris":
             # Filter by specific arrondissement
-            df_city = df_city[df_city['ville'] == selected_arrondissement]
+            city_filter, params = city_filter + " AND ville = ?", (selected_arrondissement,)
             title = f'Distribution du prix au m² - {selected_arrondissement}'
         else:
             title = 'Distribution du prix au m² - Paris (tous arrondissements)'
     else:
         # Regular city
-        df_city = df_valid[df_valid['ville'] == selected_city]
+        city_filter, params = "AND ville = ?", (selected_city,)
         title = f'Distribution du prix au m² - {selected_city}'
     
+    # Only the prices of the selection are fetched (the KDE needs the values)
+    df_city = run_query(f"""
+        SELECT prix_m2
+        FROM annonces
+        WHERE ville IS NOT NULL AND prix_m2 > 0 AND prix_m2 < 30000 {city_filter}
+    """, params)
+    
     if len(df_city) < 10:
         fig = go.Figure()
         fig.add_annotation(
@@ -368,23 +381,26 @@ def create_price_distribution_by_city(df, selected_city=None, selected_arrondiss
     
     return fig
 
-def get_city_options(df):
+def get_city_options():
     """Get list of cities, with Paris handled separately via department."""
-    df_valid = df.dropna(subset=['ville', 'prix_m2']).copy()
-    
     # Get non-Paris cities (top 30)
-    df_non_paris = df_valid[df_valid['departement'] != 'Paris']
-    city_counts = df_non_paris['ville'].value_counts()
-    top_cities = city_counts.head(30).index.tolist()
+    top_cities = run_query("""
+        SELECT ville
+        FROM annonces
+        WHERE ville IS NOT NULL AND prix_m2 IS NOT NULL AND departement IS DISTINCT FROM 'Paris'
+        GROUP BY ville
+        ORDER BY COUNT(*) DESC
+        LIMIT 30
+    """)['ville'].tolist()
     
     # Add Paris as special option (will use department filter)
     return ["Toutes les villes", "Paris"] + sorted(top_cities)
 
-def get_paris_arrondissements(df):
+def get_paris_arrondissements():
     """Get list of Paris arrondissements sorted logically."""
-    df_paris = df[(df['departement'] == 'Paris') & (df['ville'].notna())].copy()
-    
-    arrondissements = df_paris['ville'].unique().tolist()
+    arrondissements = run_query("""
+        SELECT DISTINCT ville FROM annonces WHERE departement = 'Paris' AND ville IS NOT NULL
+    """)['ville'].tolist()
     
     # Sort by arrondissement number
     paris_pattern = re.compile(r'(\d+)', re.IGNORECASE)
@@ -399,19 +415,20 @@ def get_paris_arrondissements(df):
     
     return ["Tout Paris"] + arrondissements_sorted
 
-def create_department_chart(df):
+def create_department_chart():
     """Create chart showing price per m² by department."""
-    df_valid = df.dropna(subset=['departement', 'prix_m2']).copy()
-    df_valid = df_valid[(df_valid['prix_m2'] > 0) & (df_valid['prix_m2'] < 20000)]
-    
-    # Aggregate by department
-    dept_data = df_valid.groupby('departement').agg(
-        prix_moyen_m2=('prix_m2', 'mean'),
-        nombre_annonces=('departement', 'count')
-    ).reset_index()
+    # Aggregate by department, top 15 by price
+    dept_data = run_query("""
+        SELECT departement, AVG(prix_m2) AS prix_moyen_m2, COUNT(*) AS nombre_annonces
+        FROM annonces
+        WHERE departement IS NOT NULL AND prix_m2 > 0 AND prix_m2 < 20000
+        GROUP BY departement
+        ORDER BY prix_moyen_m2 DESC
+        LIMIT 15
+    """)
     
-    # Sort by price and take top 15
-    dept_data = dept_data.sort_values('prix_moyen_m2', ascending=True).tail(15)
+    # Sort by price
+    dept_data = dept_data.sort_values('prix_moyen_m2', ascending=True)
     
     fig = go.Figure()
     
@@ -455,31 +472,41 @@ def create_department_chart(df):
 
 
 # Petit helper affichage
-def df_card(df: pd.DataFrame, title: str, filename: str, notes: str = ""):
+def df_card(df: pd.DataFrame, title: str, filename: str, notes: str = "", rows: int = None):
     st.markdown(f"**{title}** (`{filename}`)")
     if df.empty:
         st.warning(f"Fichier introuvable ou illisible : {filename}")
         return
     st.dataframe(df.head(3), use_container_width=True)
-    st.caption(f"📊 {len(df):,} lignes × {len(df.columns)} colonnes")
+    st.caption(f"📊 {len(df) if rows is None else rows:,} lignes × {len(df.columns)} colonnes")
     if notes:
         st.caption(notes)
 
 @st.cache_data
 def load_data():
-    """Load and cache the CSV data."""
-    df_clean = pd.read_csv('clean_data.csv', sep=',', low_memory=False)
+    """Load and cache the raw CSV data (the clean data is queried through DuckDB)."""
     df_etrePro1 = pd.read_csv('etrePro1.csv', sep=';', low_memory=False)
     df_etrePro2 = pd.read_csv('etrePro2.csv', sep=';', low_memory=False)
     df_paris = pd.read_csv('paris.csv', sep=',', low_memory=False)
-
-    # Convert numeric columns
-    numeric_cols = ['surface_terrain', 'surface_interieure', 'surface_exterieure', 
-                    'nombre_de_pieces', 'prix', 'prix_m2']
-    for col in numeric_cols:
-        if col in df_clean.columns:
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
-    return df_clean, df_etrePro1, df_etrePro2, df_paris
+    return df_etrePro1, df_etrePro2, df_paris
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL)
+def load_clean_summary():
+    """First rows and global statistics of the clean data, or None when it is missing."""
+    try:
+        head = run_query("SELECT * FROM annonces LIMIT 3")
+        summary = run_query("""
+            SELECT COUNT(*) AS annonces,
+                   AVG(prix) AS prix_moyen, MIN(prix) AS prix_min, MAX(prix) AS prix_max,
+                   AVG(prix_m2) AS prix_m2_moyen, MIN(prix_m2) AS prix_m2_min, MAX(prix_m2) AS prix_m2_max,
+                   AVG(surface_interieure) AS surface_moyenne,
+                   MIN(surface_interieure) AS surface_min, MAX(surface_interieure) AS surface_max
+            FROM annonces
+        """).iloc[0]
+    except FileNotFoundError:
+        return None, None
+    return head, summary
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -503,7 +530,8 @@ def main():
     # DATA LOADING
     # ─────────────────────────────────────────────────────────────────────────
     
-    df_clean, df_etrePro1, df_etrePro2, df_paris  = load_data()
+    df_etrePro1, df_etrePro2, df_paris  = load_data()
+    df_clean_head, clean_summary = load_clean_summary()
     
 
         # Bloc intro stylé comme le reste (mêmes couleurs/typo via CSS existante)
@@ -607,26 +635,20 @@ def main():
 
         with col1:
             df_card(
-                df_clean,
+                df_clean_head if df_clean_head is not None else pd.DataFrame(),
                 "🟢 Données TRANSFORMÉES (final)",
                 "clean_data.csv",
-                notes="✅ Typages homogènes | ✅ Outliers filtrés | ✅ Colonnes harmonisées | ✅ prix/m² calculé"
+                notes="✅ Typages homogènes | ✅ Outliers filtrés | ✅ Colonnes harmonisées | ✅ prix/m² calculé",
+                rows=clean_summary['annonces'] if clean_summary is not None else None
             )
 
         with col2:
-            if not df_clean.empty:
-                price_col = next((c for c in ["prix"] if c in df_clean.columns), None)
-                m2_col = next((c for c in ["prix_m2"] if c in df_clean.columns), None)
-                surf_col = next((c for c in ["surface_interieure"] if c in df_clean.columns), None)
-
+            if clean_summary is not None and clean_summary['annonces']:
                 st.markdown("**🧾 Contrôles rapides**")
 
-                if price_col:
-                    st.caption(f"Prix min/max : {df_clean[price_col].min()} / {df_clean[price_col].max()} €")
-                if m2_col:
-                    st.caption(f"Prix/m² min/max : {df_clean[m2_col].min()} / {df_clean[m2_col].max()} €")
-                if surf_col:
-                    st.caption(f"Surface min/max : {df_clean[surf_col].min()} / {df_clean[surf_col].max()} m²")
+                st.caption(f"Prix min/max : {clean_summary['prix_min']} / {clean_summary['prix_max']} €")
+                st.caption(f"Prix/m² min/max : {clean_summary['prix_m2_min']:.2f} / {clean_summary['prix_m2_max']:.2f} €")
+                st.caption(f"Surface min/max : {clean_summary['surface_min']} / {clean_summary['surface_max']} m²")
             else:
                 st.info("Ajoute `clean_data.csv` pour activer les contrôles qualité.")
 
@@ -646,20 +668,20 @@ def main():
     
     st.markdown("## 📊 Statistiques")
     
-    if df_clean is not None:
+    if clean_summary is not None:
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             st.markdown(f"""
             <div class="stat-card">
-                <div class="stat-value">{len(df_clean):,}</div>
+                <div class="stat-value">{clean_summary['annonces']:,}</div>
                 <div class="stat-label">Annonces</div>
             </div>
             """, unsafe_allow_html=True)
         
         with col2:
-            avg_price = df_clean['prix'].mean()
+            avg_price = clean_summary['prix_moyen']
             st.markdown(f"""
             <div class="stat-card">
                 <div class="stat-value">{avg_price/1000:,.0f}k€</div>
@@ -668,7 +690,7 @@ def main():
             """, unsafe_allow_html=True)
         
         with col3:
-            avg_price_m2 = df_clean['prix_m2'].mean()
+            avg_price_m2 = clean_summary['prix_m2_moyen']
             st.markdown(f"""
             <div class="stat-card">
                 <div class="stat-value">{avg_price_m2:,.0f}€</div>
@@ -677,7 +699,7 @@ def main():
             """, unsafe_allow_html=True)
         
         with col4:
-            avg_surface = df_clean['surface_interieure'].mean()
+            avg_surface = clean_summary['surface_moyenne']
             st.markdown(f"""
             <div class="stat-card">
                 <div class="stat-value">{avg_surface:,.0f}m²</div>
@@ -696,18 +718,20 @@ def main():
         
         with chart_tab1:
             # Department selector
-            dept_list = ["Tous les départements"] + sorted(df_clean['departement'].dropna().unique().tolist())
+            dept_list = ["Tous les départements"] + run_query(
+                "SELECT DISTINCT departement FROM annonces WHERE departement IS NOT NULL ORDER BY departement"
+            )['departement'].tolist()
             selected_dept = st.selectbox(
                 "Filtrer par département :",
                 dept_list,
                 key="dept_selector"
             )
-            fig_price_type = create_price_by_type_chart(df_clean, selected_dept)
+            fig_price_type = create_price_by_type_chart(selected_dept)
             st.plotly_chart(fig_price_type, use_container_width=True)
         
         with chart_tab2:
             # City selector
-            city_options = get_city_options(df_clean)
+            city_options = get_city_options()
             selected_city = st.selectbox(
                 "Sélectionner une ville :",
                 city_options,
@@ -717,18 +741,18 @@ def main():
             # If Paris is selected, show arrondissement dropdown
             selected_arrondissement = None
             if selected_city == "Paris":
-                paris_options = get_paris_arrondissements(df_clean)
+                paris_options = get_paris_arrondissements()
                 selected_arrondissement = st.selectbox(
                     "Sélectionner un arrondissement :",
                     paris_options,
                     key="arrondissement_selector"
                 )
             
-            fig_distribution = create_price_distribution_by_city(df_clean, selected_city, selected_arrondissement)
+            fig_distribution = create_price_distribution_by_city(selected_city, selected_arrondissement)
             st.plotly_chart(fig_distribution, use_container_width=True)
         
         with chart_tab3:
-            fig_dept = create_department_chart(df_clean)
+            fig_dept = create_department_chart()
             st.plotly_chart(fig_dept, use_container_width=True)
     
     else:
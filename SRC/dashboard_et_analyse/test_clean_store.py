@@ -0,0 +1,88 @@
+"""Tests of the clean data query layer (clean_store.py)."""
+import pathlib
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import clean_store
+
+ROWS = pd.DataFrame({
+    'type_de_bien': ['appartement', 'maison', 'appartement'],
+    'surface_terrain': [None, 400.0, None],
+    'surface_interieure': [50.0, 100.0, 40.0],
+    'surface_exterieure': [None, None, None],
+    'nombre_de_pieces': [2, 5, 1],
+    'prix': [500000, 300000, 200000],
+    'prix_m2': [10000.0, 3000.0, 5000.0],
+    'Address': ['1 rue A', None, None],
+    'ville': ['Paris 11ème', 'Bourg', 'Lyon'],
+    'code_postal': ['75011', '01000', '69001'],
+    'departement': ['Paris', 'Ain', 'Rhône'],
+    'code_departement': ['75', '01', '69'],
+    'url_annonce': ['https://a/1', 'https://a/2', 'https://a/3'],
+})
+
+DEPARTMENT_AVERAGES = "SELECT departement, AVG(prix_m2) AS prix_moyen FROM annonces GROUP BY 1 ORDER BY 1"
+
+
+@pytest.fixture(autouse=True)
+def in_tmp(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_query_database_and_rewrite_while_queried():
+    with duckdb.connect(clean_store.CLEAN_DB) as connection:
+        connection.register('rows', ROWS)
+        connection.execute("CREATE TABLE annonces AS SELECT * FROM rows")
+
+    result = clean_store.query_clean("SELECT prix_m2 FROM annonces WHERE ville = ?", ['Lyon'])
+    assert result['prix_m2'].tolist() == [5000.0]
+
+    # No connection is left open: the cleaning step can write the file again
+    with duckdb.connect(clean_store.CLEAN_DB) as connection:
+        connection.execute("DELETE FROM annonces WHERE ville = 'Lyon'")
+    assert clean_store.query_clean("SELECT COUNT(*) AS n FROM annonces")['n'].tolist() == [2]
+
+
+def test_query_csv_fallback_keeps_codes_as_text():
+    ROWS.to_csv(clean_store.CLEAN_CSV)
+    result = clean_store.query_clean(DEPARTMENT_AVERAGES)
+    assert result['departement'].tolist() == ['Ain', 'Paris', 'Rhône']
+    codes = clean_store.query_clean("SELECT code_postal FROM annonces ORDER BY 1")['code_postal'].tolist()
+    assert codes == ['01000', '69001', '75011']
+
+
+def test_query_without_data():
+    with pytest.raises(FileNotFoundError):
+        clean_store.query_clean("SELECT 1")
+
+
+def test_read_clean_opens_only_requested_partitions():
+    ROWS.to_parquet(clean_store.CLEAN_STORE, partition_cols=['code_departement'])
+    # An unreadable file in another department (not the first one, whose footer gives the schema):
+    # reading that partition would fail
+    other = next((pathlib.Path(clean_store.CLEAN_STORE) / "code_departement=69").iterdir())
+    other.write_bytes(b"not parquet")
+
+    paris = clean_store.read_clean(departements=['75'], colonnes=['code_postal', 'prix_m2'])
+    assert list(paris.columns) == ['code_postal', 'prix_m2']
+    assert paris['code_postal'].tolist() == ['75011']
+
+    ain = clean_store.read_clean(departements=['01'], colonnes=['code_departement', 'ville'])
+    assert ain['code_departement'].tolist() == ['01']
+
+    with pytest.raises(pa.ArrowInvalid):
+        clean_store.read_clean()
+
+
+def test_paths_with_quotes():
+    folder = pathlib.Path("l'immobilier")
+    folder.mkdir()
+    ROWS.to_csv(folder / clean_store.CLEAN_CSV)
+    ROWS.to_parquet(folder / clean_store.CLEAN_STORE, partition_cols=['code_departement'])
+
+    for store in (str(folder / clean_store.CLEAN_STORE), "absent"):
+        result = clean_store.query_clean(DEPARTMENT_AVERAGES, store=store, csv=str(folder / clean_store.CLEAN_CSV))
+        assert result['departement'].tolist() == ['Ain', 'Paris', 'Rhône']
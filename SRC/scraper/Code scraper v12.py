@@ -1,29 +1,44 @@
 
 import time
 import csv
+import json
+import gzip
+import base64
+import hashlib
+import sqlite3
 import random
 import logging
+import logging.handlers
 import argparse
 import os
 import sys
 import traceback
-from datetime import datetime
-from typing import Optional, List, Dict, Set, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
-from queue import Queue
+import shutil
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Set, Tuple, NamedTuple
+from urllib.parse import urlencode, urljoin, urlsplit, parse_qsl
+from email.utils import parsedate_to_datetime
+from http.cookies import SimpleCookie, CookieError
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Condition, Thread
+from queue import Queue, Empty
+import heapq
 import re
+import math
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import (
-    NoSuchElementException,
     StaleElementReferenceException,
     TimeoutException,
     WebDriverException,
-    ElementClickInterceptedException
+    InvalidSessionIdException,
+    NoSuchWindowException,
 )
 
 try:
@@ -32,11 +47,29 @@ try:
 except ImportError:
     UNDETECTED_AVAILABLE = False
 
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 import warnings
 warnings.filterwarnings('ignore', message='Connection pool is full')
 
+from seloger_cards import (
+    CSV_HEADER, SELECTORS, WebElementCard, confidence_score, empty_listing, extract_listing, listing_from_classified,
+    listing_to_row,
+)
+
 if sys.platform.startswith('win'):
     try:
         import io
@@ -49,24 +82,82 @@ if sys.platform.startswith('win'):
 # ---------------------------------------------------------
 BASE_URL = "https://www.seloger.com/classified-search?distributionTypes=Buy&estateTypes=House,Apartment&locations=AD09FR43,AD09FR44,AD09FR45"
 
+# Query sharding (--sharded) - the search is split into smaller queries that each paginate fully
+SHARDED_SEARCH = False
+SEARCH_URL = "https://www.seloger.com/classified-search"
+SEARCH_DISTRIBUTION = "Buy"
+SEARCH_LOCATIONS = ["AD09FR43", "AD09FR44", "AD09FR45"]
+SEARCH_ESTATE_TYPES = ["House", "Apartment"]
+SEARCH_PRICE_BANDS = [(None, 150000), (150000, 250000), (250000, 400000), (400000, 700000), (700000, None)]
+MAX_PAGES_PER_QUERY = 100  # Deepest page the site serves for one search, larger shards are split
+MIN_PRICE_BAND = 10000  # Price bands are not split below this width
+
 OUTPUT_DIR = "output"
 MAX_RETRIES = 3
 HEADLESS = False
 PARALLEL_WORKERS = 3
-MAX_WORKERS = 10
+MAX_WORKERS = 10  # Browsers per run, across all farm processes (--max-workers)
 DEBUG_MODE = False
-MISSING_DATA_INDICATOR = "N/A"
 
-# # Delays - balanced for speed + anti-bot
+# Read listings from the serialized page state when available (DOM parsing is the fallback)
+USE_EMBEDDED_JSON = True
+# Ignore small JSON blobs (JSON-LD, tracking config) when looking for the page state
+MIN_STATE_BLOB_SIZE = 2000
+# Capture the classified-search JSON responses from the Chrome performance log (CDP).
+# Tried before the page state; off by default as it keeps every network event in the log
+CAPTURE_API_RESPONSES = False
+API_URL_MARKERS = ("classified-search", "/search/", "serp", "classifieds")
+
+# # Readiness - condition-based waits, these are upper bounds and not fixed sleeps
+PAGE_READY_TIMEOUT = 15
+NETWORK_IDLE_FOR = 0.5  # No new resource requests for this long = network idle
+NETWORK_IDLE_TIMEOUT = 5
+CARDS_STABLE_FOR = 0.6  # Card count unchanged for this long = lazy loading done
+LAZY_SCROLL_WAIT = (0.8, 1.5)  # Upper bound per scroll step
+LAZY_LOAD_TIMEOUT = 20  # Upper bound for the whole in-page scroll routine
 
-DELAY_BETWEEN_LISTINGS = (0.05, 0.15)
-PAGE_LOAD_WAIT = (2, 4)
-SCROLL_DELAY = (0.2, 0.5)
-LAZY_SCROLL_WAIT = (0.8, 1.5)
-FINAL_WAIT_AFTER_SCROLL = (1.0, 1.8)
-# Retry delays
+# # Pacing - anti-bot, kept separate from readiness
+# Minimum time between two page loads of the same worker (only the remainder is slept)
+MIN_PAGE_INTERVAL = (3.0, 5.0)
+# Retry backoff - base delay before the 2nd attempt, doubled for each further attempt
 RETRY_DELAY = (5, 10)
-MAX_RETRY_ROUNDS = 2
+RETRY_BACKOFF_MAX = 60
+# WebDriver error messages meaning the browser itself is gone
+BROWSER_LOST_MARKERS = (
+    "invalid session id", "no such window", "chrome not reachable",
+    "disconnected", "target window already closed", "session deleted",
+)
+
+# Output writer - one thread owns the file, workers only enqueue page batches
+WRITER_QUEUE_SIZE = 64  # Page batches buffered before workers block
+WRITER_FLUSH_ROWS = 500
+WRITER_FLUSH_SECONDS = 5.0
+# Keep the raw card text/HTML (or page state object) in <name>.raw.jsonl.gz for offline re-parsing
+ARCHIVE_RAW = True
+
+# Cross-run dedup - listings already written by an earlier run are not written again
+SEEN_INDEX_FILE = "seloger_seen.sqlite"  # In OUTPUT_DIR, None disables the index
+SKIP_KNOWN_CARDS = False  # Also skip parsing DOM cards whose listing ID is already known
+
+# Browser recycling - long-lived Chrome instances grow in memory and slow down
+RECYCLE_EVERY_N_PAGES = 150
+RECYCLE_RSS_MB = 1500  # Whole process tree, needs psutil
+RECYCLE_AFTER_FAILURES = 3  # Failed pages in a row on the same browser
+BROWSER_TREND_EVERY = 10  # Log memory and page time every N pages
+
+# Hybrid mode: browsers only hold the session (consent, cookies), result pages are fetched over plain HTTP
+HYBRID_FETCH = False
+HTTP_FETCHERS_PER_BROWSER = 8
+HTTP_TIMEOUT = 15
+HTTP_MAX_REDIRECTS = 5  # Followed by the fetchers, keeping the cookies set on every hop
+HTTP_PAGE_INTERVAL = (1.0, 2.0)  # Per fetcher, replaces MIN_PAGE_INTERVAL
+HTTP_CHALLENGE_STATUSES = (401, 403, 429)
+HTTP_CHALLENGE_MARKERS = ("captcha-delivery.com", "/cdn-cgi/challenge-platform", "px-captcha")
+HTTP_MAX_CHALLENGES = 3  # Challenges in a row, even after session refreshes, before a browser stops feeding fetchers
+
+# Process farm: --processes N runs N worker processes (--workers browsers each) sharing an on-disk queue
+FARM_POLL_SECONDS = 0.5  # Idle processes re-check the queue this often
+FARM_LEASE_SECONDS = 600  # A page claimed longer ago than this is handed out again (its process died)
 
 # Quality thresholds
 MIN_LISTINGS_PER_PAGE = 15
@@ -77,13 +168,11 @@ BREAK_EVERY_N_PAGES = (8, 15)  # Take a break every 8-15 pages
 BREAK_DURATION = (5, 15)  # Break for 5-15 seconds
 
 # Thread-safe locks
-csv_lock = Lock()
-scraped_urls_lock = Lock()
-scraped_urls: Set[str] = set()
+scraped_ids_lock = Lock()
+scraped_ids: Set[int] = set()  # Listing IDs written in this run
+seen_index: Optional['SeenIndex'] = None  # Listing IDs written by previous runs
+farm_queue: Optional['FarmQueue'] = None  # Shared queue and dedup store when running as a farm process
 stats_lock = Lock()
-retry_queue_lock = Lock()
-# Retry queue for failed pages
-retry_queue: Queue = Queue()
 
 global_stats = {
     'total_listings': 0,
@@ -93,6 +182,19 @@ global_stats = {
     'pages_by_worker': {}
 }
 
+# Shards whose page 1 had no result count (paginated until a page comes back short)
+unsized_shards_lock = Lock()
+unsized_shards: Set[str] = set()
+
+# Consent localStorage entries captured after the first accepted banner (see capture_consent)
+consent_lock = Lock()
+consent_state: Dict[str, str] = {}
+consent_version = 0
+
+# Per-worker wait/work time accounting (see TimeAccount)
+time_accounts_lock = Lock()
+time_accounts: Dict[int, 'TimeAccount'] = {}
+
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
@@ -104,33 +206,103 @@ VIEWPORT_SIZES = [
     (1600, 900), (1280, 720), (1680, 1050),
 ]
 
-# Stable selectors
-SELECTORS = {
-    'card': "div[data-testid='serp-core-classified-card-testid']",
-    'url': "a[data-testid='card-mfe-covering-link-testid']",
-    'price_container': "div[data-testid='cardmfe-price-testid']",
-    'keyfacts': "div[data-testid='cardmfe-keyfacts-testid']",
-    'address': "div[data-testid='cardmfe-description-box-address']",
-    'tags': "div[data-testid='cardmfe-tag-testid']",
-    'energy': "span[data-testid='card-mfe-energy-performance-class']",
-}
+# Resource blocking - parsing only reads text and attributes, so skip what only matters for rendering
+BLOCK_RESOURCES = True
+BLOCK_IMAGES = True  # Chrome content setting, applied at startup
+BLOCKED_URL_PATTERNS = [  # CDP Network.setBlockedURLs wildcards
+    # Fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+    # Media
+    "*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.gif",
+    # Third-party analytics / ads
+    "*google-analytics.com*", "*googletagmanager.com*", "*googlesyndication.com*",
+    "*doubleclick.net*", "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*",
+    "*criteo.com*", "*criteo.net*", "*taboola.com*", "*outbrain.com*", "*adnxs.com*",
+    "*smartadserver.com*", "*tiktok.com*", "*bat.bing.com*", "*clarity.ms*",
+]
+# Overlay suppression - CSS injected into every document, the dismissal strategies only run when
+# a blocking overlay is still detected
+SUPPRESS_OVERLAYS = True
+SUPPRESSED_OVERLAY_SELECTORS = [
+    "#usercentrics-root", "#didomi-host", "[class*='newsletter'][class*='popin']",
+    "[class*='app-banner']", "[class*='smart-banner']",
+]
+CONSENT_STORAGE_PREFIXES = ("uc_", "ucData", "usercentrics", "didomi", "euconsent")
+
+# Selectors that must resolve on the first card for the DOM fallback to work
+REQUIRED_CARD_SELECTORS = ['url', 'price_container']
+
+# Card selectors (SELECTORS) live in seloger_cards.py with the card parser
 
 # ---------------------------------------------------------
 # Logging
 # ---------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - [Worker-%(thread)d] - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('seloger_scraper_v12.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+LOG_FILE = 'seloger_scraper_v12.log'
+LOG_FORMAT = '%(asctime)s - [Worker-%(thread)d] - %(levelname)s - %(message)s'
+
 logger = logging.getLogger(__name__)
 logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
 logging.getLogger("selenium").setLevel(logging.WARNING)
 
 
+def setup_logging(log_queue=None):
+    """
+    Log to LOG_FILE and the console (main() calls this once). Farm processes pass the farm's
+    queue instead: their records are written by the parent (see scrape_farm), the only process
+    holding the log file.
+    """
+    if log_queue is None:
+        handlers = [logging.FileHandler(LOG_FILE, encoding='utf-8'), logging.StreamHandler()]
+    else:
+        handler = logging.handlers.QueueHandler(log_queue)
+        handler.setFormatter(logging.Formatter('%(message)s'))  # The parent's handlers apply LOG_FORMAT
+        handlers = [handler]
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=handlers, force=True)
+
+
+class RunSettings(NamedTuple):
+    """
+    The settings main() takes from the command line. apply() sets them for this process; farm
+    processes get the same object (spawned processes re-import the module with the defaults).
+    """
+    debug_mode: bool = DEBUG_MODE
+    suppress_overlays: bool = SUPPRESS_OVERLAYS
+    sharded_search: bool = SHARDED_SEARCH
+    use_embedded_json: bool = USE_EMBEDDED_JSON
+    capture_api_responses: bool = CAPTURE_API_RESPONSES
+    block_resources: bool = BLOCK_RESOURCES
+    skip_known_cards: bool = SKIP_KNOWN_CARDS
+    seen_index_file: Optional[str] = SEEN_INDEX_FILE
+    hybrid_fetch: bool = HYBRID_FETCH
+    http_fetchers_per_browser: int = HTTP_FETCHERS_PER_BROWSER
+    max_workers: int = MAX_WORKERS
+
+    @classmethod
+    def current(cls) -> 'RunSettings':
+        """The settings in force in this process."""
+        return cls(
+            debug_mode=DEBUG_MODE, suppress_overlays=SUPPRESS_OVERLAYS, sharded_search=SHARDED_SEARCH,
+            use_embedded_json=USE_EMBEDDED_JSON, capture_api_responses=CAPTURE_API_RESPONSES,
+            block_resources=BLOCK_RESOURCES, skip_known_cards=SKIP_KNOWN_CARDS, seen_index_file=SEEN_INDEX_FILE,
+            hybrid_fetch=HYBRID_FETCH, http_fetchers_per_browser=HTTP_FETCHERS_PER_BROWSER, max_workers=MAX_WORKERS,
+        )
+
+    def apply(self):
+        global DEBUG_MODE, SUPPRESS_OVERLAYS, SHARDED_SEARCH, USE_EMBEDDED_JSON, CAPTURE_API_RESPONSES, \
+            BLOCK_RESOURCES, SKIP_KNOWN_CARDS, SEEN_INDEX_FILE, HYBRID_FETCH, HTTP_FETCHERS_PER_BROWSER, MAX_WORKERS
+        DEBUG_MODE = self.debug_mode
+        SUPPRESS_OVERLAYS = self.suppress_overlays
+        SHARDED_SEARCH = self.sharded_search
+        USE_EMBEDDED_JSON = self.use_embedded_json
+        CAPTURE_API_RESPONSES = self.capture_api_responses
+        BLOCK_RESOURCES = self.block_resources
+        SKIP_KNOWN_CARDS = self.skip_known_cards
+        SEEN_INDEX_FILE = self.seen_index_file
+        HYBRID_FETCH = self.hybrid_fetch
+        HTTP_FETCHERS_PER_BROWSER = self.http_fetchers_per_browser
+        MAX_WORKERS = self.max_workers
+
+
 # ---------------------------------------------------------
 # POPUP HANDLING -
 # ---------------------------------------------------------
@@ -276,26 +448,21 @@ def dismiss_all_popups(driver, worker_id: int) -> bool:
     return dismissed_any
 
 
-def ensure_popups_dismissed(driver, worker_id: int, max_attempts: int = 5):
+def ensure_popups_dismissed(driver, worker_id: int, max_attempts: int = 5) -> bool:
     """
-    Keep trying to dismiss popups until none are found.
+    Run the dismissal strategies only while a blocking overlay is detected.
+    When the page is clear this is a single script call. Returns True once nothing blocks the page.
     """
     for attempt in range(max_attempts):
+        blocker = detect_blocking_overlay(driver)
+        if not blocker:
+            return True
+        logger.debug(f"Worker {worker_id}: Blocking overlay: {blocker}")
         if not dismiss_all_popups(driver, worker_id):
-            # No popup was dismissed - we're clear
             break
         time.sleep(0.5)
-    
-    # Final check - can we see cards?
-    try:
-        cards = driver.find_elements(By.CSS_SELECTOR, SELECTORS['card'])
-        if cards and cards[0].is_displayed():
-            logger.debug(f"Worker {worker_id}: ✓ Cards are visible")
-            return True
-    except:
-        pass
-    
-    return False
+
+    return not detect_blocking_overlay(driver)
 
 
 def check_and_dismiss_popups_if_needed(driver, worker_id: int):
@@ -303,191 +470,142 @@ def check_and_dismiss_popups_if_needed(driver, worker_id: int):
     Quick check if popups exist and dismiss them.
     Called before scraping each page.
     """
-    # Quick check for blocking elements
-    blocking_selectors = [
-        "#usercentrics-root",
-        "[role='dialog']",
-        "[aria-modal='true']",
-    ]
-    
-    for selector in blocking_selectors:
-        try:
-            elems = driver.find_elements(By.CSS_SELECTOR, selector)
-            if any(e.is_displayed() for e in elems):
-                logger.debug(f"Worker {worker_id}: Found blocking element: {selector}")
-                dismiss_all_popups(driver, worker_id)
-                return
-        except:
-            pass
+    blocker = detect_blocking_overlay(driver)
+    if blocker:
+        logger.debug(f"Worker {worker_id}: Found blocking element: {blocker}")
+        dismiss_all_popups(driver, worker_id)
+
+
+# Returns what blocks the page (or null) in one round-trip: a visible consent banner, a visible
+# dialog, or an overlay sitting on the centre of the viewport.
+BLOCKING_OVERLAY_SCRIPT = """
+    const shown = el => {
+        if (!el) return false;
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0 && style.display !== 'none' && style.visibility !== 'hidden';
+    };
+    const uc = document.querySelector('#usercentrics-root');
+    if (uc && uc.shadowRoot && shown(uc)) {
+        const accept = uc.shadowRoot.querySelector('[data-testid="uc-accept-all-button"]');
+        if (accept && accept.offsetParent !== null) return '#usercentrics-root';
+    }
+    for (const selector of ["[role='dialog']", "[aria-modal='true']"]) {
+        for (const el of document.querySelectorAll(selector)) {
+            if (shown(el)) return selector;
+        }
+    }
+    const hit = document.elementFromPoint(window.innerWidth / 2, window.innerHeight / 2);
+    if (hit && hit.closest("[class*='popin'], [class*='popup'], [class*='modal'], [class*='overlay']")) {
+        return 'overlay at viewport centre';
+    }
+    return null;
+"""
+
+
+def detect_blocking_overlay(driver) -> Optional[str]:
+    try:
+        return driver.execute_script(BLOCKING_OVERLAY_SCRIPT)
+    except WebDriverException:
+        return None
+
+
+# Installed once per browser with Page.addScriptToEvaluateOnNewDocument: replays the consent
+# captured on the first accepted banner and hides the known overlays before they render.
+OVERLAY_SUPPRESSION_TEMPLATE = """
+    (() => {
+        if (!location.hostname.endsWith('seloger.com')) return;
+        const consent = %s;
+        try {
+            for (const [key, value] of Object.entries(consent)) {
+                if (localStorage.getItem(key) === null) localStorage.setItem(key, value);
+            }
+        } catch (e) {}
+        const css = %s;
+        const apply = () => {
+            if (document.getElementById('overlay-suppression')) return;
+            const style = document.createElement('style');
+            style.id = 'overlay-suppression';
+            style.textContent = css;
+            (document.head || document.documentElement).appendChild(style);
+        };
+        if (document.documentElement) apply();
+        else document.addEventListener('DOMContentLoaded', apply);
+    })();
+"""
+
+CONSENT_CAPTURE_SCRIPT = """
+    const prefixes = arguments[0];
+    const found = {};
+    for (let i = 0; i < localStorage.length; i++) {
+        const key = localStorage.key(i);
+        if (prefixes.some(prefix => key.startsWith(prefix))) found[key] = localStorage.getItem(key);
+    }
+    return found;
+"""
+
+
+def capture_consent(driver, worker_id: int):
+    """Keep the consent entries of the first browser that accepted the banner, for every later page load."""
+    global consent_version
+    with consent_lock:
+        if consent_state:
+            return
+    try:
+        found = driver.execute_script(CONSENT_CAPTURE_SCRIPT, list(CONSENT_STORAGE_PREFIXES)) or {}
+    except WebDriverException:
+        return
+    if not found:
+        return
+    with consent_lock:
+        if not consent_state:
+            consent_state.update(found)
+            consent_version += 1
+            logger.info(f"Worker {worker_id}: Captured consent state ({len(found)} localStorage entries)")
+
+
+def ensure_overlay_suppression(driver, worker_id: int):
+    """(Re)install the new-document suppression script when the captured consent changed. No-op otherwise."""
+    if not SUPPRESS_OVERLAYS:
+        return
+    with consent_lock:
+        version = consent_version
+        consent = dict(consent_state)
+    installed = getattr(driver, 'overlay_suppression', None)
+    if installed and installed[1] == version:
+        return
+
+    css = ", ".join(SUPPRESSED_OVERLAY_SELECTORS) + " { display: none !important; } " \
+          "html, body { overflow: auto !important; }"
+    source = OVERLAY_SUPPRESSION_TEMPLATE % (json.dumps(consent), json.dumps(css))
+    identifier = None
+    try:
+        if installed and installed[0]:
+            driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": installed[0]})
+        identifier = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})['identifier']
+        logger.debug(f"Worker {worker_id}: Overlay suppression installed (consent v{version})")
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: Overlay suppression unavailable: {e}")
+    driver.overlay_suppression = (identifier, version)
 
 
 # ---------------------------------------------------------
 # Parsing Functions
 # ---------------------------------------------------------
 def parse_listing(card, page_num: int, worker_id: int) -> Dict[str, Optional[str]]:
-    """Extract all data from a listing card."""
-    data = {
-        'page_num': page_num,
-        'type': None, 'price': None, 'price_per_m2': None,
-        'surface': None, 'rooms': None, 'bedrooms': None,
-        'floor': None, 'address': None, 'city': None,
-        'postal_code': None, 'department': None,
-        'url': None, 'energy_class': None, 'is_new': False,
-        'agency': None, 'raw_card_text': None, 'confidence_score': 10,
-    }
-    
+    """Extract all data from a listing card (field logic in seloger_cards.extract_listing)."""
+    data = empty_listing(page_num)
     try:
-        try:
-            raw_text = card.text
-            data['raw_card_text'] = raw_text
-        except StaleElementReferenceException:
+        extract_listing(WebElementCard(card), data, keep_html=ARCHIVE_RAW)
+    except StaleElementReferenceException:
+        if data['raw_card_text'] is None:
             return data
-        
-        # 1. URL
-        try:
-            url_elem = card.find_element(By.CSS_SELECTOR, SELECTORS['url'])
-            url = url_elem.get_attribute('href')
-            if url:
-                data['url'] = url if url.startswith('http') else f"https://www.seloger.com{url}"
-                title = url_elem.get_attribute('title')
-                if title:
-                    type_match = re.search(r'(Appartement|Maison|Studio|Villa|Duplex|Loft|Terrain)', title, re.IGNORECASE)
-                    if type_match:
-                        data['type'] = type_match.group(1)
-        except NoSuchElementException:
-            try:
-                links = card.find_elements(By.CSS_SELECTOR, "a[href*='/annonces/']")
-                for link in links:
-                    href = link.get_attribute('href')
-                    if href and '/annonces/' in href:
-                        data['url'] = href if href.startswith('http') else f"https://www.seloger.com{href}"
-                        break
-            except:
-                pass
-        
-        # 2. PRICE
-        try:
-            price_elem = card.find_element(By.CSS_SELECTOR, SELECTORS['price_container'])
-            price_text = price_elem.text
-            
-            price_m2_match = re.search(r'([\d\s\u00a0\u202f,\.]+\s*€\s*/\s*m[²2])', price_text)
-            if price_m2_match:
-                data['price_per_m2'] = price_m2_match.group(1).replace('\xa0', ' ').replace('\u202f', ' ')
-            
-            main_price_match = re.search(r'([\d\s\u00a0\u202f]+)\s*€(?!\s*/)', price_text)
-            if main_price_match:
-                price_val = main_price_match.group(1).replace('\xa0', ' ').replace('\u202f', ' ').strip()
-                data['price'] = f"{price_val} €"
-        except NoSuchElementException:
-            pass
-        
-        # 3. KEY FACTS
-        try:
-            keyfacts = card.find_element(By.CSS_SELECTOR, SELECTORS['keyfacts'])
-            facts_text = keyfacts.text
-            
-            surface_match = re.search(r'(\d+(?:[,\.]\d+)?)\s*m[²2]', facts_text)
-            if surface_match:
-                data['surface'] = f"{surface_match.group(1)} m²"
-            
-            rooms_match = re.search(r'(\d+)\s*pièces?', facts_text, re.IGNORECASE)
-            if rooms_match:
-                data['rooms'] = f"{rooms_match.group(1)} pièce(s)"
-            
-            bedrooms_match = re.search(r'(\d+)\s*chambres?', facts_text, re.IGNORECASE)
-            if bedrooms_match:
-                data['bedrooms'] = f"{bedrooms_match.group(1)} chambre(s)"
-            
-            floor_match = re.search(r'(?:[ÉE]tage\s*)?(\d+(?:[eè]me)?(?:\s*étage)?|RDC)', facts_text, re.IGNORECASE)
-            if floor_match:
-                data['floor'] = floor_match.group(1)
-        except NoSuchElementException:
-            pass
-        
-        # 4. ADDRESS
-        try:
-            addr_elem = card.find_element(By.CSS_SELECTOR, SELECTORS['address'])
-            address_text = addr_elem.text.strip()
-            data['address'] = address_text
-            
-            postal_match = re.search(r'\((\d{5})\)', address_text)
-            if postal_match:
-                data['postal_code'] = postal_match.group(1)
-                data['department'] = postal_match.group(1)[:2]
-            
-            city_match = re.search(r',\s*([^,\(]+?)\s*\(\d{5}\)', address_text)
-            if city_match:
-                data['city'] = city_match.group(1).strip()
-            else:
-                city_match = re.search(r'^([^,\(]+?)\s*\(\d{5}\)', address_text)
-                if city_match:
-                    data['city'] = city_match.group(1).strip()
-        except NoSuchElementException:
-            pass
-        
-        # 5. PROPERTY TYPE (fallback)
-        if not data['type'] and raw_text:
-            type_match = re.search(r'(Appartement|Maison|Studio|Villa|Duplex|Loft|Terrain)\s+à\s+vendre', raw_text, re.IGNORECASE)
-            if type_match:
-                data['type'] = type_match.group(1)
-        
-        # 6. ENERGY CLASS
-        try:
-            energy_elem = card.find_element(By.CSS_SELECTOR, SELECTORS['energy'])
-            energy_html = energy_elem.get_attribute('innerHTML')
-            energy_match = re.search(r'>([A-G])<', energy_html)
-            if energy_match:
-                data['energy_class'] = energy_match.group(1)
-        except NoSuchElementException:
-            pass
-        
-        # 7. TAGS
-        try:
-            tags_elem = card.find_element(By.CSS_SELECTOR, SELECTORS['tags'])
-            if 'nouveau' in tags_elem.text.lower():
-                data['is_new'] = True
-        except NoSuchElementException:
-            pass
-        
-        # FALLBACKS from raw text
-        if not data['price'] and raw_text:
-            price_match = re.search(r'([\d\s\u00a0\u202f]{4,})\s*€(?!\s*/)', raw_text)
-            if price_match:
-                data['price'] = price_match.group(1).replace('\xa0', ' ').replace('\u202f', ' ').strip() + ' €'
-        
-        if not data['surface'] and raw_text:
-            surface_match = re.search(r'(\d+(?:[,\.]\d+)?)\s*m[²2]', raw_text)
-            if surface_match:
-                data['surface'] = f"{surface_match.group(1)} m²"
-        
-        if not data['rooms'] and raw_text:
-            rooms_match = re.search(r'(\d+)\s*pièces?', raw_text, re.IGNORECASE)
-            if rooms_match:
-                data['rooms'] = f"{rooms_match.group(1)} pièce(s)"
-        
-        if not data['postal_code'] and raw_text:
-            postal_match = re.search(r'\((\d{5})\)', raw_text)
-            if postal_match:
-                data['postal_code'] = postal_match.group(1)
-                data['department'] = postal_match.group(1)[:2]
-        
-        # CONFIDENCE SCORE
-        critical_fields = {'url', 'price', 'surface'}
-        found_critical = sum(1 for f in critical_fields if data.get(f))
-        
-        if found_critical == 3:
-            data['confidence_score'] = 10
-        elif found_critical == 2:
-            data['confidence_score'] = 7
-        elif found_critical == 1:
-            data['confidence_score'] = 4
-        else:
-            data['confidence_score'] = 1
-            
+        logger.error(f"Worker {worker_id}: Card went stale while parsing")
+        data['confidence_score'] = 0
     except Exception as e:
         logger.error(f"Worker {worker_id}: Error parsing listing: {e}")
         data['confidence_score'] = 0
-    
+
     return data
 
 
@@ -499,12 +617,147 @@ def validate_listing(data: Dict) -> bool:
     return has_url and (has_price or has_surface or has_type)
 
 
-def format_for_csv(value) -> str:
-    if value is None or (isinstance(value, str) and value.strip() == ''):
-        return MISSING_DATA_INDICATOR
-    if isinstance(value, bool):
-        return 'Oui' if value else 'Non'
-    return str(value)
+# ---------------------------------------------------------
+# Embedded Page State (JSON)
+# ---------------------------------------------------------
+# Collects every serialized state candidate in one WebDriver round-trip:
+# JSON script tags plus the globals the SeLoger front-end hydrates from.
+PAGE_STATE_SCRIPT = """
+    const blobs = [];
+    for (const s of document.querySelectorAll('script')) {
+        const type = (s.type || '').toLowerCase();
+        if (s.id === '__NEXT_DATA__' || type === 'application/json') {
+            blobs.push(s.textContent || '');
+        }
+    }
+    for (const name of ['__UFRN_LIFECYCLE_SERVERREQUEST__', '__INITIAL_STATE__',
+                        '__PRELOADED_STATE__', '__NEXT_DATA__']) {
+        try {
+            if (window[name]) blobs.push(JSON.stringify(window[name]));
+        } catch (e) {}
+    }
+    return blobs;
+"""
+
+def _looks_like_classified(item) -> bool:
+    if not isinstance(item, dict):
+        return False
+    has_id = any(k in item for k in ('id', 'classifiedId', 'legacyId'))
+    has_payload = any(k in item for k in ('url', 'classifiedURL', 'hardFacts', 'rawData', 'pricing', 'price'))
+    return has_id and has_payload
+
+
+def find_classifieds(state) -> List[Dict]:
+    """Return the largest list of classified-like objects found anywhere in a decoded state tree."""
+    best: List[Dict] = []
+    stack = [state]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            matches = [x for x in node if _looks_like_classified(x)]
+            if matches and len(matches) * 2 >= len(node) and len(matches) > len(best):
+                best = matches
+            stack.extend(x for x in node if isinstance(x, (dict, list)))
+    return best
+
+
+def extract_listings_from_page_state(driver, page_num: int, worker_id: int) -> List[Dict]:
+    """
+    Decode the serialized page state once and map every classified it holds.
+    Returns an empty list when no usable state is found, so callers fall back to the DOM.
+    """
+    try:
+        blobs = driver.execute_script(PAGE_STATE_SCRIPT) or []
+    except WebDriverException as e:
+        logger.debug(f"Worker {worker_id}: Page state unavailable on page {page_num}: {e}")
+        return []
+
+    listings = listings_from_state_blobs(blobs, page_num)
+    if listings:
+        logger.debug(f"Worker {worker_id}: Page {page_num} decoded {len(listings)} listings from page state")
+    return listings
+
+
+def listings_from_state_blobs(blobs: List[str], page_num: int) -> List[Dict]:
+    """Map the classifieds of the richest serialized state blob (from the browser or raw HTML)."""
+    classifieds: List[Dict] = []
+    for blob in blobs:
+        if not blob or len(blob) < MIN_STATE_BLOB_SIZE:
+            continue
+        try:
+            state = json.loads(blob)
+        except ValueError:
+            continue
+        found = find_classifieds(state)
+        if len(found) > len(classifieds):
+            classifieds = found
+
+    listings = [listing_from_classified(item, page_num, keep_json=ARCHIVE_RAW) for item in classifieds]
+    return [l for l in listings if l['url']]
+
+
+# ---------------------------------------------------------
+# Search API Capture (CDP)
+# ---------------------------------------------------------
+def drain_performance_log(driver) -> List[Dict]:
+    """Read (and clear) the Chrome performance log, returning the decoded DevTools events."""
+    try:
+        entries = driver.get_log('performance')
+    except WebDriverException:
+        return []
+
+    events = []
+    for entry in entries:
+        try:
+            events.append(json.loads(entry['message'])['message'])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return events
+
+
+def is_search_api_response(response: Dict) -> bool:
+    url = response.get('url', '')
+    mime = (response.get('mimeType') or '').lower()
+    return 'json' in mime and any(marker in url for marker in API_URL_MARKERS)
+
+
+def extract_listings_from_api(driver, page_num: int, worker_id: int) -> List[Dict]:
+    """
+    Parse the classified-search JSON responses the page fetched since the last navigation.
+    Bodies are read back through CDP (Network.getResponseBody); returns an empty list when none
+    of them holds classifieds, so callers fall back to the page state and then the DOM.
+    """
+    request_ids = []
+    for event in drain_performance_log(driver):
+        if event.get('method') != 'Network.responseReceived':
+            continue
+        params = event.get('params', {})
+        if is_search_api_response(params.get('response', {})):
+            request_ids.append(params.get('requestId'))
+
+    classifieds: List[Dict] = []
+    for request_id in request_ids:
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            text = body.get('body', '')
+            if body.get('base64Encoded'):
+                text = base64.b64decode(text).decode('utf-8')
+            payload = json.loads(text)
+        except (WebDriverException, ValueError) as e:
+            logger.debug(f"Worker {worker_id}: API response {request_id} unreadable on page {page_num}: {e}")
+            continue
+        found = find_classifieds(payload)
+        if len(found) > len(classifieds):
+            classifieds = found
+
+    listings = [listing_from_classified(item, page_num, keep_json=ARCHIVE_RAW) for item in classifieds]
+    listings = [l for l in listings if l['url']]
+    if listings:
+        logger.debug(f"Worker {worker_id}: Page {page_num} decoded {len(listings)} listings from "
+                     f"{len(request_ids)} API responses")
+    return listings
 
 
 # ---------------------------------------------------------
@@ -512,12 +765,20 @@ def format_for_csv(value) -> str:
 # ---------------------------------------------------------
 def setup_chrome_driver(worker_id: int, headless: bool = False) -> webdriver:
     user_agent = USER_AGENTS[worker_id % len(USER_AGENTS)]
-    
+    prefs = {}
+    if BLOCK_RESOURCES and BLOCK_IMAGES:
+        prefs["profile.managed_default_content_settings.images"] = 2
+    logging_prefs = {'performance': 'ALL'} if CAPTURE_API_RESPONSES else None
+
     if UNDETECTED_AVAILABLE:
         options = uc.ChromeOptions()
         options.add_argument(f"--user-agent={user_agent}")
         if headless:
             options.add_argument("--headless=new")
+        if prefs:
+            options.add_experimental_option("prefs", prefs)
+        if logging_prefs:
+            options.set_capability("goog:loggingPrefs", logging_prefs)
         driver = uc.Chrome(options=options)
     else:
         options = ChromeOptions()
@@ -529,9 +790,24 @@ def setup_chrome_driver(worker_id: int, headless: bool = False) -> webdriver:
         options.add_argument("--no-sandbox")
         if headless:
             options.add_argument("--headless=new")
+        if prefs:
+            options.add_experimental_option("prefs", prefs)
+        if logging_prefs:
+            options.set_capability("goog:loggingPrefs", logging_prefs)
         driver = webdriver.Chrome(options=options)
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-    
+
+    if BLOCK_RESOURCES:
+        set_blocked_urls(driver, worker_id, BLOCKED_URL_PATTERNS)
+    if CAPTURE_API_RESPONSES:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+        except Exception as e:
+            logger.warning(f"Worker {worker_id}: CDP network capture unavailable: {e}")
+
+    # execute_async_script must outlive the in-page lazy-load routine
+    driver.set_script_timeout(LAZY_LOAD_TIMEOUT + 5)
+
     width, height = random.choice(VIEWPORT_SIZES)
     driver.set_window_size(width, height)
     
@@ -547,54 +823,348 @@ def randomize_viewport(driver, worker_id: int):
     driver.set_window_size(width, height)
 
 
+def set_blocked_urls(driver, worker_id: int, patterns: List[str]) -> bool:
+    """Block requests matching the wildcard patterns through CDP (an empty list lifts the blocking)."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        return True
+    except Exception as e:
+        logger.warning(f"Worker {worker_id}: CDP URL blocking unavailable: {e}")
+        return False
+
+
+SELECTOR_CHECK_SCRIPT = """
+    const selectors = arguments[0];
+    const cards = document.querySelectorAll(selectors.card);
+    const found = {card: cards.length};
+    for (const [name, sel] of Object.entries(selectors)) {
+        if (name !== 'card') found[name] = !!(cards[0] && cards[0].querySelector(sel));
+    }
+    return found;
+"""
+
+
+def verify_card_selectors(driver, worker_id: int) -> bool:
+    """
+    Check on the loaded results page that the card selectors still resolve with blocking on.
+    If they don't, URL blocking is lifted for this browser and the page reloaded.
+    """
+    wait_for_cards_stable(driver)
+    try:
+        found = driver.execute_script(SELECTOR_CHECK_SCRIPT, SELECTORS)
+    except WebDriverException as e:
+        logger.warning(f"Worker {worker_id}: Selector check failed: {e}")
+        return False
+
+    missing = [name for name in REQUIRED_CARD_SELECTORS if not found.get(name)]
+    if found.get('card') and not missing:
+        logger.info(f"Worker {worker_id}: ✓ Card selectors resolve ({found['card']} cards, blocking={BLOCK_RESOURCES})")
+        return True
+
+    logger.warning(f"Worker {worker_id}: Card selectors missing with blocking on: "
+                   f"cards={found.get('card', 0)} missing={missing}")
+    if BLOCK_RESOURCES and set_blocked_urls(driver, worker_id, []):
+        logger.warning(f"Worker {worker_id}: URL blocking lifted for this browser (image blocking stays on)")
+        driver.refresh()
+        wait_for_page_ready(driver, worker_id)
+    return False
+
+
+# ---------------------------------------------------------
+# Waits & Timing
+# ---------------------------------------------------------
+class TimeAccount:
+    """Splits one worker's wall time into waiting (pacing, readiness) and working, per label."""
+
+    def __init__(self):
+        self.waiting: Dict[str, float] = {}
+        self.working: Dict[str, float] = {}
+        self.last_navigation: Optional[float] = None
+
+    @contextmanager
+    def wait(self, label: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.waiting[label] = self.waiting.get(label, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def work(self, label: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.working[label] = self.working.get(label, 0.0) + time.perf_counter() - start
+
+    def sleep(self, seconds: float, label: str):
+        with self.wait(label):
+            time.sleep(seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Cumulative seconds per label, waits and work together (diff two snapshots for one page)."""
+        totals = dict(self.working)
+        for label, seconds in self.waiting.items():
+            totals[label] = totals.get(label, 0.0) + seconds
+        return totals
+
+    def pace(self, interval: Tuple[float, float]):
+        """Sleep only for what is left of the minimum interval since the previous navigation."""
+        target = random.uniform(*interval)
+        if self.last_navigation is not None:
+            remaining = target - (time.monotonic() - self.last_navigation)
+            if remaining > 0:
+                self.sleep(remaining, 'pacing')
+        self.last_navigation = time.monotonic()
+
+
+def get_time_account(worker_id: int) -> TimeAccount:
+    with time_accounts_lock:
+        if worker_id not in time_accounts:
+            time_accounts[worker_id] = TimeAccount()
+        return time_accounts[worker_id]
+
+
+def wait_for_document_ready(driver, timeout: float = PAGE_READY_TIMEOUT) -> bool:
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+def _wait_until_stable(driver, probe: str, stable_for: float, timeout: float,
+                       args: tuple = (), require_positive: bool = False) -> Optional[int]:
+    """Poll a JS counter until it stops changing for `stable_for` seconds. Returns the last value, None on timeout."""
+    state = {'value': None, 'since': time.monotonic()}
+
+    def is_stable(d):
+        value = d.execute_script(probe, *args)
+        now = time.monotonic()
+        if value != state['value']:
+            state['value'], state['since'] = value, now
+            return False
+        if require_positive and not value:
+            return False
+        return now - state['since'] >= stable_for
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(is_stable)
+        return state['value']
+    except TimeoutException:
+        return None
+
+
+# Resources loaded by the page so far. The Resource Timing buffer stops at 250 entries (then the
+# length freezes and the page would look idle), so entries are counted by a PerformanceObserver,
+# which sees them all; installed on the first poll of each document.
+NETWORK_IDLE_PROBE = """
+if (window.__selogerResources === undefined) {
+    window.__selogerResources = performance.getEntriesByType('resource').length;
+    new PerformanceObserver(function (list) {
+        window.__selogerResources += list.getEntries().length;
+    }).observe({type: 'resource'});
+}
+return window.__selogerResources;
+"""
+
+
+def wait_for_network_idle(driver, idle_for: float = NETWORK_IDLE_FOR, timeout: float = NETWORK_IDLE_TIMEOUT) -> bool:
+    """Network idle = no new resource loaded for `idle_for` seconds."""
+    return _wait_until_stable(driver, NETWORK_IDLE_PROBE, idle_for, timeout) is not None
+
+
+def wait_for_cards_stable(driver, stable_for: float = CARDS_STABLE_FOR, timeout: float = PAGE_READY_TIMEOUT) -> int:
+    """Wait until at least one card is rendered and the card count stops changing."""
+    probe = "return document.querySelectorAll(arguments[0]).length"
+    count = _wait_until_stable(driver, probe, stable_for, timeout, args=(SELECTORS['card'],), require_positive=True)
+    if count is None:
+        try:
+            return len(driver.find_elements(By.CSS_SELECTOR, SELECTORS['card']))
+        except WebDriverException:
+            return 0
+    return count
+
+
+def wait_for_page_ready(driver, worker_id: int):
+    """Document loaded and network quiet. Timeouts are logged, not raised: the parsers decide if the page is usable."""
+    account = get_time_account(worker_id)
+    with account.wait('readiness'):
+        if not wait_for_document_ready(driver):
+            logger.debug(f"Worker {worker_id}: document.readyState not complete after {PAGE_READY_TIMEOUT}s")
+        wait_for_network_idle(driver)
+
+
+def log_time_report():
+    """Log time spent waiting versus working, per worker and overall."""
+    with time_accounts_lock:
+        accounts = dict(time_accounts)
+    if not accounts:
+        return
+
+    total_wait = total_work = 0.0
+    logger.info("Time report (waiting vs working):")
+    for worker_id in sorted(accounts):
+        account = accounts[worker_id]
+        waited = sum(account.waiting.values())
+        worked = sum(account.working.values())
+        total_wait += waited
+        total_work += worked
+        details = ", ".join(f"{k}={v:.1f}s" for k, v in sorted({**account.waiting, **account.working}.items()))
+        share = 100 * waited / (waited + worked) if waited + worked else 0
+        logger.info(f"   Worker {worker_id}: waiting {waited:.1f}s ({share:.0f}%) / working {worked:.1f}s [{details}]")
+
+    if total_wait + total_work:
+        logger.info(f"   Waiting: {total_wait:.1f}s ({100*total_wait/(total_wait+total_work):.0f}%)"
+                    f" | Working: {total_work:.1f}s (all workers)")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (values need not be sorted)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class PageTimings:
+    """
+    One JSONL record per page attempt (<name>.timings.jsonl): time per phase from the worker's
+    TimeAccount, card counts, attempt and outcome. Kept in memory too for the end-of-run report.
+    """
+
+    def __init__(self, output_file: str, append: bool = False):
+        self.filepath = os.path.join(OUTPUT_DIR, os.path.splitext(output_file)[0] + '.timings.jsonl')
+        self.records: List[Dict] = []
+        self._lock = Lock()
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        self._file = open(self.filepath, "a" if append else "w", encoding="utf-8", buffering=1)
+
+    def record(self, worker_id: int, task: 'PageTask', attempt: int, status: str,
+               before: Dict[str, float], after: Dict[str, float], seconds: float, page: Optional[Dict] = None):
+        phases = {label: round(after[label] - before.get(label, 0.0), 3) for label in after}
+        entry = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'worker': worker_id,
+            'shard': query_label(task.query) if task.query != BASE_URL else None,
+            'page': task.page,
+            'attempt': attempt,
+            'status': status,
+            'seconds': round(seconds, 3),
+            'phases': {label: value for label, value in phases.items() if value > 0},
+            'cards': page.get('cards') if page else None,
+            'listings': page.get('listings') if page else None,
+            'duplicates': page.get('duplicates') if page else None,
+        }
+        with self._lock:
+            self.records.append(entry)
+            self._file.write(json.dumps(entry) + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def report(self):
+        """Log p50/p90/p99/max per phase over all page attempts, then page time per worker."""
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return
+
+        by_phase: Dict[str, List[float]] = {}
+        for entry in records:
+            for label, seconds in entry['phases'].items():
+                by_phase.setdefault(label, []).append(seconds)
+        by_phase['(page total)'] = [entry['seconds'] for entry in records]
+
+        logger.info(f"Page timing report ({len(records)} page attempts, {self.filepath}):")
+        logger.info(f"   {'phase':<14}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}{'total':>10}")
+        for label, values in sorted(by_phase.items(), key=lambda item: -sum(item[1])):
+            logger.info(f"   {label:<14}{percentile(values, 50):>8.2f}{percentile(values, 90):>8.2f}"
+                        f"{percentile(values, 99):>8.2f}{max(values):>8.2f}{sum(values):>10.1f}")
+
+        workers = sorted({entry['worker'] for entry in records})
+        for worker_id in workers:
+            entries = [entry for entry in records if entry['worker'] == worker_id]
+            totals: Dict[str, float] = {}
+            for entry in entries:
+                for label, seconds in entry['phases'].items():
+                    totals[label] = totals.get(label, 0.0) + seconds
+            top = ", ".join(f"{label}={seconds:.0f}s" for label, seconds in
+                            sorted(totals.items(), key=lambda item: -item[1])[:3])
+            times = [entry['seconds'] for entry in entries]
+            failed = sum(1 for entry in entries if entry['status'] != 'ok')
+            logger.info(f"   Worker {worker_id}: {len(entries)} pages ({failed} failed), page time "
+                        f"p50 {percentile(times, 50):.1f}s / p90 {percentile(times, 90):.1f}s - top: {top}")
+
+
 # ---------------------------------------------------------
 # Scrolling
 # ---------------------------------------------------------
+# Runs the whole lazy-loading phase in the page: scroll one viewport, wait until the card count
+# has not changed for stableMs (MutationObserver), repeat until the bottom adds nothing new.
+LAZY_LOAD_SCRIPT = """
+    const [selector, stableMs, stepMaxMs, timeoutMs, done] = arguments;
+    const scroller = document.scrollingElement || document.documentElement;
+    const count = () => document.querySelectorAll(selector).length;
+    const atBottom = () => scroller.scrollTop + window.innerHeight >= scroller.scrollHeight - 2;
+    const deadline = performance.now() + timeoutMs;
+    let steps = 0;
+
+    const settle = () => new Promise(resolve => {
+        let last = count();
+        let timer;
+        const finish = () => { observer.disconnect(); clearTimeout(timer); clearTimeout(cap); resolve(); };
+        const observer = new MutationObserver(() => {
+            const now = count();
+            if (now !== last) {
+                last = now;
+                clearTimeout(timer);
+                timer = setTimeout(finish, stableMs);
+            }
+        });
+        observer.observe(document.body, {childList: true, subtree: true});
+        timer = setTimeout(finish, stableMs);
+        const cap = setTimeout(finish, Math.max(0, Math.min(stepMaxMs, deadline - performance.now())));
+    });
+
+    (async () => {
+        while (performance.now() < deadline) {
+            const before = count();
+            window.scrollBy(0, Math.round(window.innerHeight * (0.7 + Math.random() * 0.3)));
+            steps++;
+            await settle();
+            if (atBottom() && count() === before) break;
+        }
+        window.scrollTo(0, 0);
+        done({cards: count(), steps: steps, timedOut: performance.now() >= deadline});
+    })().catch(e => done({cards: count(), steps: steps, error: String(e)}));
+"""
+
+
 def scroll_to_load_all_cards(driver, worker_id: int, page_num: int) -> int:
+    """Trigger lazy loading with a single async script call; returns the number of cards rendered."""
     logger.debug(f"Worker {worker_id}: Scrolling page {page_num}...")
-    
-    scroll_steps = 5
-    last_card_count = 0
-    stable_count = 0
-    
-    for step in range(scroll_steps):
-        scroll_position = (step + 1) * (1.0 / scroll_steps)
-        target_y = int(driver.execute_script("return document.body.scrollHeight") * scroll_position)
-        current_y = driver.execute_script("return window.pageYOffset")
-        
-        distance = target_y - current_y
-        num_increments = random.randint(8, 15)
-        
-        for i in range(num_increments):
-            progress = (i + 1) / num_increments
-            eased_progress = 1 - pow(1 - progress, 3)
-            next_y = int(current_y + (distance * eased_progress))
-            driver.execute_script(f"window.scrollTo({{top: {next_y}, behavior: 'smooth'}});")
-            time.sleep(random.uniform(0.03, 0.1))
-        
-        time.sleep(random.uniform(*LAZY_SCROLL_WAIT))
-        
-        # Check for popups that might appear during scroll
-        check_and_dismiss_popups_if_needed(driver, worker_id)
-        
+    account = get_time_account(worker_id)
+
+    with account.wait('lazy_load'):
         try:
-            cards = driver.find_elements(By.CSS_SELECTOR, SELECTORS['card'])
-            current_count = len(cards)
-            
-            if current_count == last_card_count:
-                stable_count += 1
-                if stable_count >= 2:
-                    break
-            else:
-                stable_count = 0
-            last_card_count = current_count
-        except:
-            pass
-    
-    # Scroll back to top
-    driver.execute_script("window.scrollTo({top: 0, behavior: 'smooth'});")
-    time.sleep(random.uniform(*FINAL_WAIT_AFTER_SCROLL))
-    
+            result = driver.execute_async_script(
+                LAZY_LOAD_SCRIPT, SELECTORS['card'],
+                int(CARDS_STABLE_FOR * 1000), int(LAZY_SCROLL_WAIT[1] * 1000), int(LAZY_LOAD_TIMEOUT * 1000),
+            )
+        except WebDriverException as e:
+            logger.warning(f"Worker {worker_id}: Lazy-load script failed on page {page_num}: {e}")
+            result = None
+
+    if result:
+        if result.get('timedOut') or result.get('error'):
+            logger.debug(f"Worker {worker_id}: Page {page_num} lazy loading incomplete after "
+                         f"{result.get('steps')} steps: {result.get('error') or 'timeout'}")
+        return result.get('cards', 0)
+
     try:
         cards = driver.find_elements(By.CSS_SELECTOR, SELECTORS['card'])
         return len(cards)
@@ -623,246 +1193,1486 @@ def save_debug_info(driver, worker_id: int, page_num: int, reason: str):
 
 
 # ---------------------------------------------------------
-# CSV Handling
+# Query Planning
 # ---------------------------------------------------------
-def initialize_csv(filename: str):
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    filepath = os.path.join(OUTPUT_DIR, filename)
-    
-    with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "Page_Number", "Type", "Price", "Price_Per_M2", "Surface_m2",
-            "Rooms", "Bedrooms", "Floor", "Address", "City",
-            "PostalCode", "Department", "Energy_Class", "Is_New",
-            "Agency", "URL", "Confidence_Score"
-        ])
-    logger.info(f"Initialized CSV: {filepath}")
+class PageTask(NamedTuple):
+    """One results page of one search query - the unit of work handed out by the scheduler."""
+    query: str
+    page: int
 
+    @property
+    def url(self) -> str:
+        return f"{self.query}&page={self.page}"
 
-def write_listings_to_csv(listings: List[Dict], output_file: str):
-    with csv_lock:
-        filepath = os.path.join(OUTPUT_DIR, output_file)
-        with open(filepath, "a", newline="", encoding="utf-8-sig") as f:
-            writer = csv.writer(f)
-            for listing in listings:
-                writer.writerow([
-                    format_for_csv(str(listing['page_num'])),
-                    format_for_csv(listing['type']),
-                    format_for_csv(listing['price']),
-                    format_for_csv(listing['price_per_m2']),
-                    format_for_csv(listing['surface']),
-                    format_for_csv(listing['rooms']),
-                    format_for_csv(listing['bedrooms']),
-                    format_for_csv(listing['floor']),
-                    format_for_csv(listing['address']),
-                    format_for_csv(listing['city']),
-                    format_for_csv(listing['postal_code']),
-                    format_for_csv(listing['department']),
-                    format_for_csv(listing['energy_class']),
-                    format_for_csv(listing['is_new']),
-                    format_for_csv(listing['agency']),
-                    format_for_csv(listing['url']),
-                    listing['confidence_score'],
-                ])
-
-
-def is_duplicate_url(url: Optional[str]) -> bool:
-    if not url:
-        return False
-    with scraped_urls_lock:
-        if url in scraped_urls:
-            return True
-        scraped_urls.add(url)
-        return False
+    def __str__(self) -> str:
+        if self.query == BASE_URL:
+            return str(self.page)
+        return f"{query_label(self.query)} p{self.page}"
 
 
-# ---------------------------------------------------------
+def build_search_url(location: str, estate_type: str, price_min: Optional[int] = None,
+                     price_max: Optional[int] = None) -> str:
+    params = {'distributionTypes': SEARCH_DISTRIBUTION, 'estateTypes': estate_type, 'locations': location}
+    if price_min:
+        params['priceMin'] = price_min
+    if price_max:
+        params['priceMax'] = price_max
+    return f"{SEARCH_URL}?{urlencode(params, safe=',')}"
+
+
+def query_params(query: str) -> Dict[str, str]:
+    return dict(parse_qsl(urlsplit(query).query))
+
+
+def query_label(query: str) -> str:
+    """Short shard name for logs, e.g. AD09FR43/House/150000-250000€."""
+    params = query_params(query)
+    price = ""
+    if 'priceMin' in params or 'priceMax' in params:
+        price = f"{params.get('priceMin', 0)}-{params.get('priceMax', '')}€"
+    return "/".join(p for p in (params.get('locations'), params.get('estateTypes'), price) if p)
+
+
+def plan_queries() -> List[str]:
+    """Initial shards: every location x estate type x price band."""
+    return [
+        build_search_url(location, estate_type, price_min, price_max)
+        for location in SEARCH_LOCATIONS
+        for estate_type in SEARCH_ESTATE_TYPES
+        for price_min, price_max in SEARCH_PRICE_BANDS
+    ]
+
+
+def split_query(query: str) -> List[str]:
+    """Halve the price band of a shard with too many results. Empty when the band can't be narrowed."""
+    params = query_params(query)
+    if 'locations' not in params or 'estateTypes' not in params:
+        return []
+    low = int(params.get('priceMin', 0))
+    high = int(params['priceMax']) if 'priceMax' in params else None
+
+    if high is None:
+        middle = max(low * 2, MIN_PRICE_BAND)  # Open-ended top band
+    elif high - low < 2 * MIN_PRICE_BAND:
+        return []
+    else:
+        middle = low + (high - low) // 2 // 1000 * 1000
+
+    return [
+        build_search_url(params['locations'], params['estateTypes'], low, middle),
+        build_search_url(params['locations'], params['estateTypes'], middle, high),
+    ]
+
+
+RESULT_COUNT_KEYS = ('totalCount', 'totalResults', 'resultsCount', 'nbResults', 'total')
+RESULT_COUNT_TEXT_SCRIPT = """
+    const h1 = document.querySelector('h1');
+    return [document.title, h1 ? h1.innerText : ''].join(' | ');
+"""
+
+
+def read_result_count(driver) -> Optional[int]:
+    """Number of results of the loaded search, from the page state or else the heading text."""
+    try:
+        blobs = driver.execute_script(PAGE_STATE_SCRIPT) or []
+    except WebDriverException:
+        blobs = []
+
+    total = result_count_from_blobs(blobs)
+    if total is not None:
+        return total
+
+    try:
+        text = driver.execute_script(RESULT_COUNT_TEXT_SCRIPT) or ""
+    except WebDriverException:
+        return None
+    return result_count_from_text(text)
+
+
+def result_count_from_blobs(blobs: List[str]) -> Optional[int]:
+    for blob in blobs:
+        if not blob or len(blob) < MIN_STATE_BLOB_SIZE:
+            continue
+        try:
+            stack = [json.loads(blob)]
+        except ValueError:
+            continue
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                for key in RESULT_COUNT_KEYS:
+                    value = node.get(key)
+                    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+                        return value
+                stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+            elif isinstance(node, list):
+                stack.extend(v for v in node if isinstance(v, (dict, list)))
+    return None
+
+
+def result_count_from_text(text: str) -> Optional[int]:
+    """Result count from the title/heading text ("1 234 annonces")."""
+    match = re.search(r'(\d[\d\s]*)\s+(?:annonces?|résultats?|biens?)', text, re.IGNORECASE)
+    if match:
+        return int(re.sub(r'\D', '', match.group(1)))
+    return None
+
+
+def follow_up_tasks(task: PageTask, page: Dict) -> List[PageTask]:
+    """
+    Pages to schedule after a sharded page succeeded.
+    Page 1 reads the result count: the shard is either paginated in full or, when it would run
+    past MAX_PAGES_PER_QUERY, split into two narrower price bands. Without a count the shard is
+    walked one page at a time while pages come back full. page['cards'] is the number of cards on
+    the page, known listings skipped by --skip-known included.
+    """
+    total = page.get('total_results')
+    if task.page == 1 and total is not None:
+        per_page = max(page['cards'], 1)
+        pages = math.ceil(total / per_page)
+        if pages > MAX_PAGES_PER_QUERY:
+            children = split_query(task.query)
+            if children:
+                logger.info(f"Shard {query_label(task.query)}: {total} results, splitting the price band")
+                return [PageTask(child, 1) for child in children]
+            logger.warning(f"Shard {query_label(task.query)}: {total} results, only the first "
+                           f"{MAX_PAGES_PER_QUERY} pages are reachable")
+            pages = MAX_PAGES_PER_QUERY
+        logger.info(f"Shard {query_label(task.query)}: {total} results on {pages} pages")
+        return [PageTask(task.query, p) for p in range(2, pages + 1)]
+
+    if task.page == 1:
+        logger.info(f"Shard {query_label(task.query)}: result count not found, walking pages one by one")
+        if farm_queue is not None:
+            farm_queue.mark_unsized(task.query)
+        else:
+            with unsized_shards_lock:
+                unsized_shards.add(task.query)
+    if farm_queue is not None:
+        walking = farm_queue.is_unsized(task.query)
+    else:
+        with unsized_shards_lock:
+            walking = task.query in unsized_shards
+    if walking and page['cards'] >= MIN_LISTINGS_PER_PAGE and task.page < MAX_PAGES_PER_QUERY:
+        return [PageTask(task.query, task.page + 1)]
+    return []
+
+
+def resume_tasks(planned: List[PageTask], done: Set[PageTask], sizes: Dict[PageTask, Dict]) -> List[PageTask]:
+    """
+    Pages left to scrape when resuming: the planned pages not done yet, plus the follow-ups of the
+    done pages (rebuilt from the sizes the manifest recorded) that are not done yet. Without
+    this, the pages 2..N of a shard whose page 1 was done, or of a split or walked shard, were lost.
+    """
+    tasks = [task for task in planned if task not in done]
+    if SHARDED_SEARCH:
+        # Page 1 first: it decides whether the later pages of its shard are walked
+        for task in sorted(done, key=lambda t: (t.query, t.page)):
+            if task in sizes:
+                tasks.extend(t for t in follow_up_tasks(task, sizes[task]) if t not in done)
+            elif task.page == 1:
+                # Recorded without its size (older manifest): reload it to learn the shard size again
+                tasks.append(task)
+    return list(dict.fromkeys(tasks))
+
+
+# ---------------------------------------------------------
+# Dedup Index
+# ---------------------------------------------------------
+LISTING_ID_PATTERN = re.compile(r'(\d{6,})\.htm')
+
+
+def listing_id(url: Optional[str]) -> Optional[int]:
+    """Numeric SeLoger ID from the listing URL (a stable negative 63-bit hash for URLs without one)."""
+    if not url:
+        return None
+    match = LISTING_ID_PATTERN.search(url)
+    if match:
+        return int(match.group(1))
+    digest = hashlib.blake2b(url.split('?')[0].encode('utf-8'), digest_size=8).digest()
+    return -(int.from_bytes(digest, 'big') >> 1) - 1
+
+
+class SeenIndex:
+    """
+    Listing IDs written by previous runs, persisted in a SQLite table and loaded once as a frozenset.
+    Workers only read the in-memory snapshot, so lookups take no lock; the writer thread appends
+    the IDs of every flushed batch to the table for the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.known: frozenset = frozenset()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def load(self) -> int:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)  # Shared by farm processes
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS seen (id INTEGER PRIMARY KEY, first_seen TEXT)")
+        self.known = frozenset(row[0] for row in self._conn.execute("SELECT id FROM seen"))
+        return len(self.known)
+
+    def __contains__(self, listing_id: Optional[int]) -> bool:
+        return listing_id in self.known
+
+    def add(self, ids: List[int]):
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO seen VALUES (?, ?)", ((i, now) for i in ids))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def is_known(url: Optional[str]) -> bool:
+    """True when a previous run already wrote this listing."""
+    return seen_index is not None and listing_id(url) in seen_index
+
+
+# ---------------------------------------------------------
+# CSV Handling (CSV_HEADER and listing_to_row live in seloger_cards.py, shared with the re-parser)
+# ---------------------------------------------------------
+def raw_archive_path(output_file: str) -> str:
+    return os.path.join(OUTPUT_DIR, os.path.splitext(output_file)[0] + '.raw.jsonl.gz')
+
+
+def raw_record(listing: Dict) -> Optional[Dict]:
+    """Archive line for one listing: what the parser saw, so fields can be rebuilt without a new crawl."""
+    if not (listing.get('raw_card_text') or listing.get('raw_card_html') or listing.get('raw_json')):
+        return None
+    return {
+        'page_num': listing['page_num'],
+        'url': listing.get('url'),
+        'source': 'page_state' if listing.get('raw_json') else 'dom',
+        'text': listing.get('raw_card_text'),
+        'html': listing.get('raw_card_html'),
+        'json': listing.get('raw_json'),
+    }
+
+
+def initialize_csv(filename: str):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    filepath = os.path.join(OUTPUT_DIR, filename)
+    if filename.endswith('.parquet'):
+        # ParquetWriter creates the file (and its schema) on first open
+        return
+
+    with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+    logger.info(f"Initialized CSV: {filepath}")
+
+
+class RunManifest:
+    """
+    Append-only JSONL checkpoint next to the output (<name>.manifest.jsonl).
+    One line per completed page with the URLs it wrote and its size (cards, result count), from
+    which a resume rebuilds the page's follow-ups; lines are only appended once the page's rows
+    have been flushed to the output, so a crash never records unwritten pages.
+    """
+
+    def __init__(self, output_file: str):
+        self.filepath = os.path.join(OUTPUT_DIR, os.path.splitext(output_file)[0] + '.manifest.jsonl')
+        self.sizes: Dict[PageTask, Dict] = {}  # Filled by load()
+
+    def reset(self):
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        open(self.filepath, "w", encoding="utf-8").close()
+
+    def load(self) -> Tuple[Set[int], Set[str]]:
+        """Return (completed pages, seen URLs). A truncated last line (crash mid-write) is ignored."""
+        pages: Set[PageTask] = set()
+        urls: Set[str] = set()
+        if not os.path.exists(self.filepath):
+            return pages, urls
+
+        line = ""
+        with open(self.filepath, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Manifest: skipping unreadable line in {self.filepath}")
+                    continue
+                task = PageTask(entry.get('query', BASE_URL), entry['page'])
+                pages.add(task)
+                urls.update(entry.get('urls', []))
+                if 'cards' in entry:
+                    self.sizes[task] = {'cards': entry['cards'], 'total_results': entry.get('total_results')}
+
+        if line and not line.endswith("\n"):
+            # Terminate the partial line so the next record starts on its own line
+            with open(self.filepath, "a", encoding="utf-8") as f:
+                f.write("\n")
+        return pages, urls
+
+    def record(self, pages: List[Tuple[PageTask, List[str], Dict]]):
+        with open(self.filepath, "a", encoding="utf-8") as f:
+            for task, urls, size in pages:
+                entry = {'query': task.query, 'page': task.page, 'urls': urls, **size,
+                         'at': datetime.now().isoformat(timespec='seconds')}
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ListingWriter:
+    """
+    Single writer thread for the scraper output.
+    Workers submit one batch of listings per page to a bounded queue; the thread keeps one
+    buffered handle open (CSV, or Parquet when the file name ends in .parquet) and flushes
+    every WRITER_FLUSH_ROWS rows or WRITER_FLUSH_SECONDS seconds. close() drains the queue.
+    Raw card payloads go to the gzip archive in the same flush, before the pages are
+    checkpointed in the manifest.
+    """
+
+    _STOP = object()
+
+    def __init__(self, output_file: str, manifest: Optional[RunManifest] = None):
+        self.filepath = os.path.join(OUTPUT_DIR, output_file)
+        self.manifest = manifest
+        self.archive_path = raw_archive_path(output_file) if ARCHIVE_RAW else None
+        self.parquet = output_file.endswith('.parquet')
+        if self.parquet and not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.queue: Queue = Queue(maxsize=WRITER_QUEUE_SIZE)
+        self.rows_written = 0
+        self.flushes = 0
+        self.error: Optional[Exception] = None
+        self._thread = Thread(target=self._run, name="listing-writer", daemon=True)
+
+    def start(self) -> 'ListingWriter':
+        self._thread.start()
+        return self
+
+    def submit(self, task: PageTask, listings: List[Dict], size: Optional[Dict] = None):
+        """
+        Hand a page worth of listings to the writer, with the page size recorded in the manifest.
+        Only blocks if the writer is WRITER_QUEUE_SIZE batches behind.
+        """
+        self.queue.put((task, listings, size or {}))
+
+    def close(self):
+        self.queue.put(self._STOP)
+        self._thread.join()
+        logger.info(f"Writer closed: {self.rows_written} rows in {self.flushes} flushes -> {self.filepath}")
+        if self.error:
+            raise self.error
+
+    def _open(self):
+        if self.parquet:
+            schema = pa.schema([(name, pa.string()) for name in CSV_HEADER[:-1]] + [(CSV_HEADER[-1], pa.int32())])
+            return pq.ParquetWriter(self.filepath, schema, compression='snappy')
+        handle = open(self.filepath, "a", newline="", encoding="utf-8-sig", buffering=1 << 20)
+        return handle
+
+    def _flush(self, sink, rows: List[list], raw: List[Dict], pages: List[Tuple[PageTask, List[str], Dict]]):
+        if rows and self.parquet:
+            columns = list(zip(*rows))
+            sink.write_table(pa.table(
+                {name: list(values) for name, values in zip(CSV_HEADER, columns)},
+                schema=sink.schema,
+            ))
+        elif rows:
+            csv.writer(sink).writerows(rows)
+            sink.flush()
+        if self.archive_path and raw:
+            # Each flush appends a complete gzip member; readers see one continuous stream
+            with gzip.open(self.archive_path, "at", encoding="utf-8") as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in raw)
+        if self.manifest and pages:
+            self.manifest.record(pages)
+        if seen_index is not None and pages:
+            seen_index.add([listing_id(url) for _, urls, _ in pages for url in urls])
+        self.rows_written += len(rows)
+        self.flushes += 1
+
+    def _run(self):
+        sink = None
+        pending: List[list] = []
+        pending_raw: List[Dict] = []
+        pending_pages: List[Tuple[PageTask, List[str], Dict]] = []
+        last_flush = time.monotonic()
+        try:
+            sink = self._open()
+            while True:
+                timeout = max(0.0, WRITER_FLUSH_SECONDS - (time.monotonic() - last_flush))
+                try:
+                    batch = self.queue.get(timeout=timeout)
+                except Empty:
+                    batch = None
+                if batch is self._STOP:
+                    break
+                if batch:
+                    task, listings, size = batch
+                    pending.extend(listing_to_row(listing) for listing in listings)
+                    if self.archive_path:
+                        pending_raw.extend(r for r in map(raw_record, listings) if r)
+                    pending_pages.append((task, [listing['url'] for listing in listings if listing.get('url')], size))
+
+                if len(pending) >= WRITER_FLUSH_ROWS or time.monotonic() - last_flush >= WRITER_FLUSH_SECONDS:
+                    if pending_pages:
+                        self._flush(sink, pending, pending_raw, pending_pages)
+                        pending, pending_raw, pending_pages = [], [], []
+                    last_flush = time.monotonic()
+
+            if pending_pages:
+                self._flush(sink, pending, pending_raw, pending_pages)
+        except Exception as e:
+            logger.error(f"Writer failed on {self.filepath}: {e}")
+            self.error = e
+            # Keep draining so workers never block on a dead writer
+            while self.queue.get() is not self._STOP:
+                pass
+        finally:
+            if sink is not None:
+                sink.close()
+
+
+def duplicate_urls(urls: List[Optional[str]]) -> List[bool]:
+    """
+    For each URL of a page, True when the listing was already written (by a previous run, or
+    earlier in this run). The page's listings are claimed together: one lock, or one farm transaction.
+    """
+    keys = [listing_id(url) for url in urls]
+    fresh = [key for key in keys if key is not None and not (seen_index is not None and key in seen_index)]
+    if farm_queue is not None:
+        claimed = farm_queue.claim_listings(fresh)
+    else:
+        with scraped_ids_lock:
+            claimed = {key for key in fresh if key not in scraped_ids}
+            scraped_ids.update(claimed)
+
+    duplicates = []
+    for key in keys:
+        # The first card of the page with a claimed ID keeps it, a repeat on the same page is a duplicate
+        duplicates.append(key is not None and key not in claimed)
+        claimed.discard(key)
+    return duplicates
+
+
+def collect_page_listings(driver, worker_id: int, page_num: int) -> Tuple[Optional[List[Dict]], int]:
+    """
+    Return (every listing on the loaded page or None when it has no cards, number of cards).
+    With SKIP_KNOWN_CARDS, DOM cards already in the seen index are not parsed but still counted.
+    Captured search API responses are tried first, then the embedded page state; scrolling and
+    per-card DOM parsing only run as a fallback.
+    """
+    account = get_time_account(worker_id)
+
+    if CAPTURE_API_RESPONSES:
+        with account.work('parse'):
+            listings = extract_listings_from_api(driver, page_num, worker_id)
+        if listings:
+            logger.info(f"Worker {worker_id}: Page {page_num} has {len(listings)} cards (search API)")
+            return listings, len(listings)
+
+    if USE_EMBEDDED_JSON:
+        with account.work('parse'):
+            listings = extract_listings_from_page_state(driver, page_num, worker_id)
+        if listings:
+            logger.info(f"Worker {worker_id}: Page {page_num} has {len(listings)} cards (page state)")
+            return listings, len(listings)
+
+    card_count = scroll_to_load_all_cards(driver, worker_id, page_num)
+
+    # Check popups again after scrolling
+    with account.work('popups'):
+        check_and_dismiss_popups_if_needed(driver, worker_id)
+
+    if card_count == 0:
+        return None, 0
+
+    with account.work('parse'):
+        cards = driver.find_elements(By.CSS_SELECTOR, SELECTORS['card'])
+        logger.info(f"Worker {worker_id}: Page {page_num} has {len(cards)} cards")
+        card_count = len(cards)
+        if SKIP_KNOWN_CARDS and seen_index is not None:
+            cards = skip_known_cards(driver, worker_id, page_num, cards)
+        return [parse_listing(card, page_num, worker_id) for card in cards], card_count
+
+
+CARD_URLS_SCRIPT = """
+    return Array.from(document.querySelectorAll(arguments[0]), card => {
+        const link = card.querySelector(arguments[1]) || card.querySelector("a[href*='/annonces/']");
+        return link ? link.href : null;
+    });
+"""
+
+
+def skip_known_cards(driver, worker_id: int, page_num: int, cards: list) -> list:
+    """Drop the cards whose URL is in the seen index, reading every card URL in one script call."""
+    try:
+        urls = driver.execute_script(CARD_URLS_SCRIPT, SELECTORS['card'], SELECTORS['url'])
+    except WebDriverException:
+        return cards
+    if len(urls) != len(cards):
+        # The list changed between the two reads, parse everything rather than misalign
+        return cards
+
+    fresh = [card for card, url in zip(cards, urls) if not is_known(url)]
+    if len(fresh) < len(cards):
+        logger.debug(f"Worker {worker_id}: Page {page_num} skipped {len(cards) - len(fresh)} known cards")
+    return fresh
+
+
+def load_page(driver, worker_id: int, task: PageTask):
+    """Navigate to a results page: pacing first, then wait for readiness and clear popups."""
+    account = get_time_account(worker_id)
+    account.pace(MIN_PAGE_INTERVAL)
+
+    if CAPTURE_API_RESPONSES:
+        # Drop events from the previous page so its responses are not attributed to this one
+        drain_performance_log(driver)
+    ensure_overlay_suppression(driver, worker_id)
+
+    with account.work('navigation'):
+        driver.get(task.url)
+    wait_for_page_ready(driver, worker_id)
+
+    # CRITICAL: Dismiss any popups before scraping
+    with account.work('popups'):
+        ensure_popups_dismissed(driver, worker_id)
+
+
+# ---------------------------------------------------------
+# Page Scheduling
+# ---------------------------------------------------------
+def is_browser_lost(error: Exception) -> bool:
+    """True when the exception means the browser session is gone, not just that the page failed."""
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException)):
+        return True
+    message = str(error).lower()
+    return isinstance(error, WebDriverException) and any(
+        marker in message for marker in BROWSER_LOST_MARKERS
+    )
+
+
+def retry_backoff(attempt: int) -> float:
+    """Delay before the next attempt of a page that failed `attempt` times (exponential, with jitter)."""
+    return min(RETRY_BACKOFF_MAX, random.uniform(*RETRY_DELAY) * 2 ** (attempt - 1))
+
+
+class PageScheduler:
+    """
+    Shared page queue with per-page backoff state.
+    get() blocks while pages are cooling down or still in flight on another worker (a failed page
+    or a follow-up page may come back), and returns None once every page is done or out of attempts.
+    """
+
+    def __init__(self, tasks=(), skip: Optional[Set[PageTask]] = None):
+        self._cond = Condition()
+        self._heap: List[Tuple[float, int, PageTask, int]] = []  # (ready_at, seq, task, attempt)
+        self._seq = 0
+        self._in_flight = 0
+        self._skip = skip or set()  # Done in a previous run, never re-added by add()
+        self.scheduled = 0
+        for task in tasks:
+            self._push(task, 1, 0.0)
+            self.scheduled += 1
+
+    def _push(self, task: PageTask, attempt: int, delay: float):
+        self._seq += 1
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, task, attempt))
+
+    def get(self) -> Optional[Tuple[PageTask, int]]:
+        with self._cond:
+            while True:
+                if self._heap:
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        _, _, task, attempt = heapq.heappop(self._heap)
+                        self._in_flight += 1
+                        return task, attempt
+                    self._cond.wait(wait)
+                elif self._in_flight == 0:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def add(self, tasks: List[PageTask]) -> int:
+        """Schedule follow-up pages (call before done() so the queue can't look finished in between)."""
+        with self._cond:
+            added = 0
+            for task in tasks:
+                if task not in self._skip:
+                    self._push(task, 1, 0.0)
+                    added += 1
+            self.scheduled += added
+            self._cond.notify_all()
+            return added
+
+    def done(self, task: PageTask):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def retry(self, task: PageTask, attempt: int) -> bool:
+        """Schedule the next attempt after a backoff. Returns False when the page is out of attempts."""
+        with self._cond:
+            self._in_flight -= 1
+            scheduled = attempt < MAX_RETRIES
+            if scheduled:
+                delay = retry_backoff(attempt)
+                self._push(task, attempt + 1, delay)
+                logger.info(f"Page {task}: retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+            self._cond.notify_all()
+            return scheduled
+
+    def release(self, task: PageTask, attempt: int):
+        """Hand a page back untouched (its browser was lost, the page itself did not fail)."""
+        with self._cond:
+            self._in_flight -= 1
+            self._push(task, attempt, 0.0)
+            self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def drain(self) -> List[Tuple[PageTask, int]]:
+        with self._cond:
+            remaining = [(task, attempt) for _, _, task, attempt in sorted(self._heap)]
+            self._heap.clear()
+            self._cond.notify_all()
+            return remaining
+
+
+class FarmQueue:
+    """
+    On-disk PageScheduler for the process farm (<name>.farm.sqlite), shared by every worker process.
+    Pages are claimed with a lease: a page claimed more than FARM_LEASE_SECONDS ago (its process
+    died) is handed out again. The same database is the run's dedup store (listing IDs claimed by
+    the first process that writes them) and remembers the shards walked without a result count.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+            query TEXT, page INTEGER, attempt INTEGER, ready_at REAL, state TEXT, claimed_at REAL, owner INTEGER,
+            PRIMARY KEY (query, page))""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, ready_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS listings (id INTEGER PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS unsized_shards (query TEXT PRIMARY KEY)")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def seed(self, tasks: List[PageTask], done: Set[PageTask] = frozenset(), seen_ids: Set[int] = frozenset(),
+             unsized: Set[str] = frozenset()):
+        """
+        Fill a new farm: pages done in a previous run are stored as done so add() skips them, and
+        the shards a resume found walked (unsized) keep being walked.
+        """
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO tasks VALUES (?, ?, 1, 0, 'done', NULL, NULL)",
+                             ((t.query, t.page) for t in done))
+            conn.executemany("INSERT INTO tasks VALUES (?, ?, 1, 0, 'pending', NULL, NULL) "
+                             "ON CONFLICT (query, page) DO UPDATE SET state = 'pending'",
+                             ((t.query, t.page) for t in tasks))
+            conn.executemany("INSERT OR IGNORE INTO listings VALUES (?)", ((i,) for i in seen_ids if i is not None))
+            conn.executemany("INSERT OR IGNORE INTO unsized_shards VALUES (?)", ((q,) for q in unsized))
+
+    def get(self) -> Optional[Tuple[PageTask, int]]:
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                row = conn.execute(
+                    "SELECT query, page, attempt FROM tasks WHERE (state = 'pending' AND ready_at <= ?) "
+                    "OR (state = 'running' AND claimed_at < ?) ORDER BY ready_at LIMIT 1",
+                    (now, now - FARM_LEASE_SECONDS)).fetchone()
+                if row:
+                    conn.execute("UPDATE tasks SET state = 'running', claimed_at = ?, owner = ? "
+                                 "WHERE query = ? AND page = ?", (now, os.getpid(), row[0], row[1]))
+                    return PageTask(row[0], row[1]), row[2]
+                open_tasks = conn.execute(
+                    "SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'running')").fetchone()[0]
+            if open_tasks == 0:
+                return None
+            time.sleep(FARM_POLL_SECONDS)
+
+    def add(self, tasks: List[PageTask]) -> int:
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tasks VALUES (?, ?, 1, 0, 'pending', NULL, NULL)",
+                             ((t.query, t.page) for t in tasks))
+            return conn.total_changes - before
+
+    def _set(self, task: PageTask, state: str, attempt: Optional[int] = None, delay: float = 0.0):
+        with self._transaction() as conn:
+            conn.execute("UPDATE tasks SET state = ?, attempt = COALESCE(?, attempt), ready_at = ? "
+                         "WHERE query = ? AND page = ?", (state, attempt, time.time() + delay, task.query, task.page))
+
+    def done(self, task: PageTask):
+        self._set(task, 'done')
+
+    def retry(self, task: PageTask, attempt: int) -> bool:
+        if attempt >= MAX_RETRIES:
+            self._set(task, 'failed')
+            return False
+        delay = retry_backoff(attempt)
+        self._set(task, 'pending', attempt + 1, delay)
+        logger.info(f"Page {task}: retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+        return True
+
+    def release(self, task: PageTask, attempt: int):
+        self._set(task, 'pending', attempt)
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE state = 'pending'").fetchone()[0]
+
+    def drain(self) -> List[Tuple[PageTask, int]]:
+        """Pages left open once every process has exited; they are marked failed."""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT query, page, attempt FROM tasks WHERE state IN ('pending', 'running') "
+                                "ORDER BY ready_at").fetchall()
+            conn.execute("UPDATE tasks SET state = 'failed' WHERE state IN ('pending', 'running')")
+        return [(PageTask(query, page), attempt) for query, page, attempt in rows]
+
+    def pages(self, state: str, this_run: bool = False) -> List[PageTask]:
+        """Pages in `state`; with this_run, only those claimed in this run (not seeded as done by a resume)."""
+        sql = "SELECT query, page FROM tasks WHERE state = ?" + (" AND claimed_at IS NOT NULL" if this_run else "")
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY query, page", (state,)).fetchall()
+        return [PageTask(query, page) for query, page in rows]
+
+    def claim_listings(self, keys: List[int]) -> Set[int]:
+        """The listing IDs of a page this process is the first to claim in the run (one transaction per page)."""
+        with self._transaction() as conn:
+            return {key for key in keys
+                    if conn.execute("INSERT OR IGNORE INTO listings VALUES (?)", (key,)).rowcount == 1}
+
+    def mark_unsized(self, query: str):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO unsized_shards VALUES (?)", (query,))
+
+    def is_unsized(self, query: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM unsized_shards WHERE query = ?", (query,)).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def scrape_page(driver, worker_id: int, task: PageTask, writer: ListingWriter) -> Optional[Dict]:
+    """
+    Load one results page, then parse and dedup its listings and hand them to the writer.
+    Returns None when the page had no cards; WebDriver errors are raised to the caller.
+    """
+    account = get_time_account(worker_id)
+    load_page(driver, worker_id, task)
+
+    parsed, card_count = collect_page_listings(driver, worker_id, task.page)
+
+    total_results = None
+    if SHARDED_SEARCH and task.page == 1:
+        with account.work('parse'):
+            total_results = read_result_count(driver)
+        if parsed is None and total_results == 0:
+            # Narrow shards can be legitimately empty, that is not a failed page
+            parsed = []
+
+    if parsed is None:
+        logger.warning(f"Worker {worker_id}: No cards on page {task}")
+        save_debug_info(driver, worker_id, task.page, "no_cards")
+        return None
+
+    return store_page(worker_id, task, parsed, writer, total_results, card_count)
+
+
+def store_page(worker_id: int, task: PageTask, parsed: List[Dict], writer: ListingWriter,
+               total_results: Optional[int] = None, card_count: Optional[int] = None) -> Dict:
+    """
+    Dedup and validate the parsed listings of a page, hand them to the writer and update the stats.
+    card_count is the number of cards on the page when some were not parsed (default: len(parsed)).
+    """
+    if card_count is None:
+        card_count = len(parsed)
+    account = get_time_account(worker_id)
+    listings = []
+    complete_count = 0
+    duplicate_count = 0
+
+    with account.work('dedup'):
+        duplicates = duplicate_urls([data.get('url') for data in parsed])
+        for data, duplicate in zip(parsed, duplicates):
+            if duplicate:
+                duplicate_count += 1
+                continue
+
+            if validate_listing(data):
+                complete_count += 1
+
+            listings.append(data)
+
+    with account.work('write'):
+        writer.submit(task, listings, {'cards': card_count, 'total_results': total_results})
+
+    with stats_lock:
+        global_stats['total_listings'] += len(listings)
+        global_stats['complete_listings'] += complete_count
+        global_stats['successful_pages'].add(task)
+        if worker_id not in global_stats['pages_by_worker']:
+            global_stats['pages_by_worker'][worker_id] = []
+        global_stats['pages_by_worker'][worker_id].append(task)
+
+    status = "✓" if len(listings) >= MIN_LISTINGS_PER_PAGE else "⚠"
+    logger.info(f"Worker {worker_id}: Page {task} {status} - {len(listings)} listings ({complete_count} complete)")
+
+    return {'listings': len(listings), 'complete': complete_count, 'duplicates': duplicate_count,
+            'cards': card_count, 'total_results': total_results}
+
+
+# ---------------------------------------------------------
+# Browser Recycling
+# ---------------------------------------------------------
+def browser_rss_mb(driver) -> Optional[float]:
+    """Resident memory of the chromedriver process tree (browser, renderers, GPU), or None without psutil."""
+    if not PSUTIL_AVAILABLE:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return None
+
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+def open_worker_browser(worker_id: int) -> webdriver:
+    """
+    Start a browser and run the warm-up: first results page, popup dismissal, selector check.
+    Once a consent has been captured, later browsers get the suppression script before their first page.
+    """
+    driver = setup_chrome_driver(worker_id)
+    try:
+        with consent_lock:
+            consent_known = bool(consent_state)
+        if consent_known:
+            ensure_overlay_suppression(driver, worker_id)
+        driver.get(BASE_URL)
+        wait_for_page_ready(driver, worker_id)
+        ensure_popups_dismissed(driver, worker_id)
+        capture_consent(driver, worker_id)
+        ensure_overlay_suppression(driver, worker_id)
+        verify_card_selectors(driver, worker_id)
+    except Exception:
+        try:
+            driver.quit()
+        except:
+            pass
+        raise
+    return driver
+
+
+class BrowserHealth:
+    """
+    Per-driver counters behind the recycling policy.
+    A browser is restarted after RECYCLE_EVERY_N_PAGES pages, once its process tree passes
+    RECYCLE_RSS_MB, or after RECYCLE_AFTER_FAILURES failed pages in a row.
+    """
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        self.generation += 1
+        self.pages = 0
+        self.consecutive_failures = 0
+        self.page_times: List[float] = []
+        self.rss_samples: List[float] = []
+
+    def record(self, driver, seconds: float, ok: bool):
+        self.pages += 1
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        if ok:
+            self.page_times.append(seconds)
+        if self.pages % BROWSER_TREND_EVERY == 0:
+            rss = browser_rss_mb(driver)
+            if rss is not None:
+                self.rss_samples.append(rss)
+            self.log_trend()
+
+    def recycle_reason(self) -> Optional[str]:
+        if self.consecutive_failures >= RECYCLE_AFTER_FAILURES:
+            return f"{self.consecutive_failures} failed pages in a row"
+        if self.pages >= RECYCLE_EVERY_N_PAGES:
+            return f"{self.pages} pages"
+        if self.rss_samples and self.rss_samples[-1] >= RECYCLE_RSS_MB:
+            return f"RSS {self.rss_samples[-1]:.0f} MB"
+        return None
+
+    def log_trend(self):
+        window = BROWSER_TREND_EVERY
+        recent = self.page_times[-window:]
+        first = self.page_times[:window]
+        parts = [f"{self.pages} pages"]
+        if self.rss_samples:
+            parts.append(f"RSS {self.rss_samples[-1]:.0f} MB ({self.rss_samples[-1] - self.rss_samples[0]:+.0f} since first sample)")
+        if recent:
+            parts.append(f"page time {sum(recent) / len(recent):.1f}s over the last {len(recent)} "
+                         f"(first {len(first)}: {sum(first) / len(first):.1f}s)")
+        logger.info(f"Worker {self.worker_id}: browser #{self.generation} - " + ", ".join(parts))
+
+
+def recycle_browser(driver, worker_id: int, reason: str):
+    """Quit the driver and open a fresh one with the warm-up replayed. Returns None if no browser could be started."""
+    logger.info(f"Worker {worker_id}: Recycling browser ({reason})")
+    try:
+        driver.quit()
+    except:
+        pass
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return open_worker_browser(worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id}: Browser restart {attempt}/{MAX_RETRIES} failed: {e}")
+            time.sleep(retry_backoff(attempt))
+    return None
+
+
+# ---------------------------------------------------------
+# Session Handoff (hybrid mode)
+# ---------------------------------------------------------
+SCRIPT_TAG_PATTERN = re.compile(r'<script\b([^>]*)>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+STATE_ASSIGNMENT_PATTERN = re.compile(
+    r'window\[?["\']?(?:__UFRN_LIFECYCLE_SERVERREQUEST__|__INITIAL_STATE__|__PRELOADED_STATE__)["\']?\]?'
+    r'\s*=\s*JSON\.parse\(("(?:[^"\\]|\\.)*")\)', re.DOTALL)
+HTML_TITLE_PATTERN = re.compile(r'<(title|h1)\b[^>]*>(.*?)</\1>', re.IGNORECASE | re.DOTALL)
+
+SESSION_INFO_SCRIPT = "return [navigator.userAgent, (navigator.languages || []).join(',')];"
+
+
+def state_blobs_from_html(html: str) -> List[str]:
+    """Serialized page state found in raw HTML: the same blobs PAGE_STATE_SCRIPT reads in the browser."""
+    blobs = []
+    for attributes, body in SCRIPT_TAG_PATTERN.findall(html):
+        attributes = attributes.lower()
+        if '__next_data__' in attributes or 'application/json' in attributes:
+            blobs.append(body)
+            continue
+        for literal in STATE_ASSIGNMENT_PATTERN.findall(body):
+            try:
+                blobs.append(json.loads(literal))
+            except ValueError:
+                continue
+    return blobs
+
+
+def is_challenge(status: int, html: str) -> bool:
+    """Bot protection answered instead of the results page."""
+    if status in HTTP_CHALLENGE_STATUSES:
+        return True
+    return any(marker in html for marker in HTTP_CHALLENGE_MARKERS)
+
+
+class SessionBroker:
+    """
+    One browser shared by a group of HTTP fetchers (hybrid mode).
+    The browser clears consent and collects the cookies and headers; fetchers reuse them through a
+    pooled urllib3 client and keep the cookies the site sets, sending each one only to the domain and
+    path it was set for. Challenged pages are loaded in the
+    browser instead (one at a time, the driver is not thread-safe), which also refreshes the session.
+    After HTTP_MAX_CHALLENGES challenges in a row the group stops using HTTP and stays on the browser.
+    """
+
+    def __init__(self, worker_id: int, driver, fetchers: int):
+        self.worker_id = worker_id
+        self.driver = driver
+        self.browser_lock = Lock()  # Held for every driver call
+        self._lock = Lock()
+        self._headers: Dict[str, str] = {}
+        self._cookies: Dict[Tuple[str, str, str], str] = {}  # (name, domain, path) -> value, domain '.x' = x and subdomains
+        self.version = 0
+        self.challenges_in_row = 0
+        self.http_enabled = True
+        self.stats = {'http_pages': 0, 'browser_pages': 0, 'challenges': 0, 'refreshes': 0}
+        self.pool = urllib3.PoolManager(num_pools=2, maxsize=max(1, fetchers), retries=False,
+                                        timeout=urllib3.Timeout(total=HTTP_TIMEOUT))
+        with self.browser_lock:
+            self._export_session()
+
+    def _export_session(self):
+        """Copy cookies and identity headers out of the browser (caller holds browser_lock)."""
+        try:
+            user_agent, languages = self.driver.execute_script(SESSION_INFO_SCRIPT)
+            host = urlsplit(SEARCH_URL).hostname
+            cookies = {(c['name'], c.get('domain') or host, c.get('path') or '/'): c['value']
+                       for c in self.driver.get_cookies()}
+        except WebDriverException as e:
+            logger.warning(f"Worker {self.worker_id}: Could not export the browser session: {e}")
+            return
+        headers = {
+            'User-Agent': user_agent,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': languages or 'fr-FR,fr;q=0.9',
+            'Accept-Encoding': 'gzip, deflate',
+            'Referer': SEARCH_URL,
+        }
+        with self._lock:
+            self._headers = headers
+            # Browser values win, cookies only ever set on HTTP responses are kept
+            self._cookies.update(cookies)
+            self.version += 1
+            self.stats['refreshes'] += 1
+        logger.info(f"Worker {self.worker_id}: Session #{self.version} handed to fetchers ({len(cookies)} cookies)")
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Session headers for a request to `url`, with the cookies whose domain and path match it."""
+        parts = urlsplit(url)
+        host, path = parts.hostname or '', parts.path or '/'
+        with self._lock:
+            headers = dict(self._headers)
+            cookies = [f"{name}={value}" for (name, domain, cookie_path), value in self._cookies.items()
+                       if domain_matches(host, domain) and path_matches(path, cookie_path)]
+        if cookies:
+            headers['Cookie'] = "; ".join(cookies)
+        return headers
+
+    def keep_cookies(self, url: str, response):
+        """
+        Apply the Set-Cookie headers of a response to `url` to the shared jar: a Domain the host
+        does not belong to is rejected, no Domain means this host only, an expired cookie is deleted.
+        """
+        parts = urlsplit(url)
+        host = parts.hostname or ''
+        default_path = parts.path[:parts.path.rfind('/')] or '/'
+        for header in response.headers.getlist('Set-Cookie'):
+            jar = SimpleCookie()
+            try:
+                jar.load(header)
+            except CookieError:
+                continue
+            for name, morsel in jar.items():
+                domain = host
+                if morsel['domain']:
+                    domain = '.' + morsel['domain'].lstrip('.').lower()
+                    if not domain_matches(host, domain):
+                        continue
+                path = morsel['path'] if morsel['path'].startswith('/') else default_path
+                with self._lock:
+                    if cookie_expired(morsel):
+                        self._cookies.pop((name, domain, path), None)
+                    else:
+                        self._cookies[(name, domain, path)] = morsel.value
+
+    def fetch(self, url: str) -> Tuple[int, str]:
+        """GET a page, following up to HTTP_MAX_REDIRECTS redirects (cookies set on each hop are kept)."""
+        for _ in range(HTTP_MAX_REDIRECTS + 1):
+            response = self.pool.request('GET', url, headers=self.request_headers(url), redirect=False)
+            self.keep_cookies(url, response)
+            location = response.headers.get('Location')
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                break
+            url = urljoin(url, location)
+        return response.status, response.data.decode('utf-8', errors='replace')
+
+    def record_challenge(self) -> bool:
+        """Count a challenged fetch. Returns False once HTTP is given up for this browser."""
+        with self._lock:
+            self.stats['challenges'] += 1
+            self.challenges_in_row += 1
+            if self.http_enabled and self.challenges_in_row >= HTTP_MAX_CHALLENGES:
+                self.http_enabled = False
+                logger.warning(f"Worker {self.worker_id}: {self.challenges_in_row} challenges in a row, "
+                               f"fetchers now go through the browser")
+            return self.http_enabled
+
+    def record_http_page(self):
+        with self._lock:
+            self.stats['http_pages'] += 1
+            self.challenges_in_row = 0
+
+    def scrape_in_browser(self, task: PageTask, writer: ListingWriter) -> Optional[Dict]:
+        """
+        Load the page in the browser (the fallback path) and re-export the session afterwards.
+        Returns None when the page failed or the browser had to be replaced.
+        """
+        with self.browser_lock:
+            if self.driver is None:
+                return None
+            try:
+                page = scrape_page(self.driver, self.worker_id, task, writer)
+            except Exception as e:
+                if not is_browser_lost(e):
+                    raise
+                logger.error(f"Worker {self.worker_id}: Browser lost on page {task}: {e}")
+                self.driver = recycle_browser(self.driver, self.worker_id, "browser lost")
+                if self.driver is not None:
+                    self._export_session()
+                return None
+            with self._lock:
+                self.stats['browser_pages'] += 1
+            self._export_session()
+            return page
+
+    def close(self):
+        self.pool.clear()
+
+
+def domain_matches(host: str, domain: str) -> bool:
+    """Cookie domain matching: '.seloger.com' covers seloger.com and its subdomains, 'www.seloger.com' only itself."""
+    if domain.startswith('.'):
+        return host == domain[1:] or host.endswith(domain)
+    return host == domain
+
+
+def path_matches(path: str, cookie_path: str) -> bool:
+    return path == cookie_path or path.startswith(cookie_path.rstrip('/') + '/')
+
+
+def cookie_expired(morsel) -> bool:
+    """True for a Set-Cookie that deletes the cookie (Max-Age <= 0 or Expires in the past)."""
+    if morsel['max-age']:
+        try:
+            return int(morsel['max-age']) <= 0
+        except ValueError:
+            return False
+    if morsel['expires']:
+        try:
+            return parsedate_to_datetime(morsel['expires']) <= datetime.now(timezone.utc)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def fetch_page_http(broker: SessionBroker, fetcher_id: int, task: PageTask) -> Tuple[Optional[List[Dict]], Optional[int], bool]:
+    """
+    Fetch a results page with the broker's session and decode its embedded state.
+    Returns (listings, result count, challenged); listings is None when the page has to go to the browser.
+    """
+    account = get_time_account(fetcher_id)
+    account.pace(HTTP_PAGE_INTERVAL)
+    with account.work('http'):
+        status, html = broker.fetch(task.url)
+
+    if is_challenge(status, html):
+        logger.info(f"Worker {fetcher_id}: Challenged on page {task} (HTTP {status})")
+        return None, None, True
+    if status != 200:
+        logger.warning(f"Worker {fetcher_id}: HTTP {status} on page {task}")
+        return None, None, False
+
+    with account.work('parse'):
+        blobs = state_blobs_from_html(html)
+        listings = listings_from_state_blobs(blobs, task.page)
+        total_results = None
+        if SHARDED_SEARCH and task.page == 1:
+            total_results = result_count_from_blobs(blobs)
+            if total_results is None:
+                titles = " | ".join(re.sub(r'<[^>]+>', ' ', text) for _, text in HTML_TITLE_PATTERN.findall(html))
+                total_results = result_count_from_text(titles)
+
+    if not listings:
+        if total_results == 0:
+            return [], 0, False
+        logger.info(f"Worker {fetcher_id}: No page state in the HTML of page {task}")
+        return None, total_results, False
+    logger.info(f"Worker {fetcher_id}: Page {task} has {len(listings)} cards (HTTP)")
+    return listings, total_results, False
+
+
+# ---------------------------------------------------------
 # Worker Function
 # ---------------------------------------------------------
-def worker_scrape_pages(worker_id: int, driver: webdriver, pages: List[int], output_file: str) -> Dict:
+def worker_scrape_pages(worker_id: int, driver: webdriver, scheduler: PageScheduler, writer: ListingWriter,
+                        timings: PageTimings) -> Dict:
+    """
+    Pull pages from the shared scheduler until every page is done.
+    A failed page goes back to the scheduler with a backoff, so retries run on all live workers.
+    The browser is recycled according to BrowserHealth; the returned 'driver' is the one still open.
+    Every page attempt is recorded in `timings`, from the queue wait to the end of its handling.
+    """
     results = {
         'listings': 0, 'complete': 0,
         'failed_pages': [], 'successful_pages': [],
-        'pages_scraped': 0
+        'pages_scraped': 0, 'driver_alive': True, 'recycles': 0, 'driver': driver,
     }
-    
+
+    account = get_time_account(worker_id)
+    health = BrowserHealth(worker_id)
     pages_since_break = 0
     next_break_at = random.randint(*BREAK_EVERY_N_PAGES)
-    
-    for page_idx, page_num in enumerate(pages):
+
+    while True:
+        before = account.snapshot()
+        queued_at = time.monotonic()
+        with account.wait('queue'):
+            item = scheduler.get()
+        if item is None:
+            break
+        task, attempt = item
+        page_start = time.monotonic()
+
         try:
             pages_since_break += 1
             if pages_since_break >= next_break_at:
                 break_time = random.uniform(*BREAK_DURATION)
                 logger.info(f"Worker {worker_id}: Taking a {break_time:.1f}s break...")
-                time.sleep(break_time)
+                account.sleep(break_time, 'break')
                 pages_since_break = 0
                 next_break_at = random.randint(*BREAK_EVERY_N_PAGES)
                 if random.random() < 0.3:
                     randomize_viewport(driver, worker_id)
-            
-            url = f"{BASE_URL}&page={page_num}"
-            logger.info(f"Worker {worker_id}: Loading page {page_num} ({page_idx+1}/{len(pages)})")
-            
-            driver.get(url)
-            time.sleep(random.uniform(*PAGE_LOAD_WAIT))
-            
-            # CRITICAL: Dismiss any popups before scraping
-            ensure_popups_dismissed(driver, worker_id)
-            
-            card_count = scroll_to_load_all_cards(driver, worker_id, page_num)
-            
-            # Check popups again after scrolling
-            check_and_dismiss_popups_if_needed(driver, worker_id)
-            
-            if card_count == 0:
-                logger.warning(f"Worker {worker_id}: No cards on page {page_num}")
-                save_debug_info(driver, worker_id, page_num, "no_cards")
-                results['failed_pages'].append(page_num)
-                with retry_queue_lock:
-                    retry_queue.put((page_num, worker_id, 1))
-                continue
-            
-            cards = driver.find_elements(By.CSS_SELECTOR, SELECTORS['card'])
-            logger.info(f"Worker {worker_id}: Page {page_num} has {len(cards)} cards")
-            
-            listings = []
-            complete_count = 0
-            duplicate_count = 0
-            
-            for card in cards:
-                time.sleep(random.uniform(*DELAY_BETWEEN_LISTINGS))
-                data = parse_listing(card, page_num, worker_id)
-                
-                if is_duplicate_url(data.get('url')):
-                    duplicate_count += 1
-                    continue
-                
-                if validate_listing(data):
-                    complete_count += 1
-                
-                listings.append(data)
-            
-            write_listings_to_csv(listings, output_file)
-            
-            results['listings'] += len(listings)
-            results['complete'] += complete_count
-            results['successful_pages'].append(page_num)
-            results['pages_scraped'] += 1
-            
-            with stats_lock:
-                global_stats['total_listings'] += len(listings)
-                global_stats['complete_listings'] += complete_count
-                global_stats['successful_pages'].add(page_num)
-                if worker_id not in global_stats['pages_by_worker']:
-                    global_stats['pages_by_worker'][worker_id] = []
-                global_stats['pages_by_worker'][worker_id].append(page_num)
-            
-            status = "✓" if len(listings) >= MIN_LISTINGS_PER_PAGE else "⚠"
-            logger.info(f"Worker {worker_id}: Page {page_num} {status} - {len(listings)} listings ({complete_count} complete)")
-            
-            time.sleep(random.uniform(0.5, 1.5))
-            
+
+            logger.info(f"Worker {worker_id}: Loading page {task} "
+                        f"(attempt {attempt}, {scheduler.pending()} pending)")
+            page = scrape_page(driver, worker_id, task, writer)
+
         except Exception as e:
-            logger.error(f"Worker {worker_id}: Error on page {page_num}: {e}")
+            if is_browser_lost(e):
+                # Not the page's fault: hand it back untouched and try a fresh browser
+                logger.error(f"Worker {worker_id}: Browser lost on page {task}: {e}")
+                scheduler.release(task, attempt)
+                with account.wait('recycle'):
+                    driver = recycle_browser(driver, worker_id, "browser lost")
+                results['driver'] = driver
+                timings.record(worker_id, task, attempt, 'browser_lost', before, account.snapshot(),
+                               time.monotonic() - queued_at)
+                if driver is None:
+                    logger.error(f"Worker {worker_id}: No browser, stopping worker")
+                    results['driver_alive'] = False
+                    break
+                results['recycles'] += 1
+                health.reset()
+                continue
+
+            logger.error(f"Worker {worker_id}: Error on page {task}: {e}")
             logger.debug(traceback.format_exc())
-            save_debug_info(driver, worker_id, page_num, "error")
-            results['failed_pages'].append(page_num)
-            with retry_queue_lock:
-                retry_queue.put((page_num, worker_id, 1))
-    
+            save_debug_info(driver, worker_id, task.page, "error")
+            page = None
+
+        health.record(driver, time.monotonic() - page_start, ok=page is not None)
+
+        if page is None:
+            results['failed_pages'].append(task)
+            if not scheduler.retry(task, attempt):
+                logger.error(f"✗ Page {task} failed after {attempt} attempts")
+                with stats_lock:
+                    global_stats['failed_pages'].add(task)
+        else:
+            if SHARDED_SEARCH:
+                scheduler.add(follow_up_tasks(task, page))
+            scheduler.done(task)
+            results['listings'] += page['listings']
+            results['complete'] += page['complete']
+            results['successful_pages'].append(task)
+            results['pages_scraped'] += 1
+
+        reason = health.recycle_reason()
+        recycle = bool(reason and scheduler.pending())
+        if recycle:
+            with account.wait('recycle'):
+                driver = recycle_browser(driver, worker_id, reason)
+            results['driver'] = driver
+
+        timings.record(worker_id, task, attempt, 'ok' if page is not None else 'failed',
+                       before, account.snapshot(), time.monotonic() - queued_at, page)
+
+        if recycle:
+            if driver is None:
+                logger.error(f"Worker {worker_id}: No browser, stopping worker")
+                results['driver_alive'] = False
+                break
+            results['recycles'] += 1
+            health.reset()
+
     return results
 
 
-def retry_failed_pages(drivers: List[Tuple[int, webdriver]], output_file: str) -> Dict:
-    results = {'retried': 0, 'succeeded': 0, 'failed': []}
-    
-    if retry_queue.empty():
-        return results
-    
-    pages_to_retry = []
-    while not retry_queue.empty():
-        try:
-            page_num, original_worker, attempt = retry_queue.get_nowait()
-            if attempt <= MAX_RETRIES:
-                pages_to_retry.append((page_num, attempt))
-        except:
+def http_fetch_pages(fetcher_id: int, broker: SessionBroker, scheduler: PageScheduler, writer: ListingWriter,
+                     timings: PageTimings) -> Dict:
+    """
+    Hybrid-mode worker: pull pages from the shared scheduler and fetch them over HTTP with the
+    broker's session. Challenged pages, and pages without decodable state, go through the broker's
+    browser; failed pages are retried through the scheduler like in worker_scrape_pages.
+    """
+    results = {'listings': 0, 'complete': 0, 'failed_pages': [], 'successful_pages': [],
+               'pages_scraped': 0, 'browser_pages': 0}
+    account = get_time_account(fetcher_id)
+
+    while True:
+        before = account.snapshot()
+        queued_at = time.monotonic()
+        with account.wait('queue'):
+            item = scheduler.get()
+        if item is None:
             break
-    
-    if not pages_to_retry:
-        return results
-    
-    logger.info(f"\nRETRY PHASE: {len(pages_to_retry)} pages to retry")
-    time.sleep(random.uniform(*RETRY_DELAY))
-    
-    for page_num, attempt in pages_to_retry:
-        worker_id, driver = random.choice(drivers)
-        logger.info(f"Retrying page {page_num} (attempt {attempt + 1}/{MAX_RETRIES})")
-        
+        task, attempt = item
+
+        page = None
+        via_browser = not broker.http_enabled
         try:
-            url = f"{BASE_URL}&page={page_num}"
-            driver.get(url)
-            time.sleep(random.uniform(*PAGE_LOAD_WAIT))
-            
-            ensure_popups_dismissed(driver, worker_id)
-            card_count = scroll_to_load_all_cards(driver, worker_id, page_num)
-            
-            if card_count == 0:
-                if attempt < MAX_RETRIES:
-                    retry_queue.put((page_num, worker_id, attempt + 1))
+            if not via_browser:
+                parsed, total_results, challenged = fetch_page_http(broker, fetcher_id, task)
+                if challenged:
+                    broker.record_challenge()
+                    via_browser = True
+                elif parsed is None:
+                    via_browser = True
                 else:
-                    results['failed'].append(page_num)
-                continue
-            
-            cards = driver.find_elements(By.CSS_SELECTOR, SELECTORS['card'])
-            
-            listings = []
-            complete_count = 0
-            
-            for card in cards:
-                data = parse_listing(card, page_num, worker_id)
-                if not is_duplicate_url(data.get('url')):
-                    if validate_listing(data):
-                        complete_count += 1
-                    listings.append(data)
-            
-            write_listings_to_csv(listings, output_file)
-            results['retried'] += 1
-            results['succeeded'] += 1
-            
-            with stats_lock:
-                global_stats['total_listings'] += len(listings)
-                global_stats['complete_listings'] += complete_count
-                global_stats['successful_pages'].add(page_num)
-            
-            logger.info(f"✓ Page {page_num} RETRY SUCCESS: {len(listings)} listings")
-            
+                    broker.record_http_page()
+                    page = store_page(fetcher_id, task, parsed, writer, total_results)
+
+            if via_browser:
+                with account.wait('browser'):
+                    page = broker.scrape_in_browser(task, writer)
+                results['browser_pages'] += 1
+
         except Exception as e:
-            logger.error(f"✗ Page {page_num} retry failed: {e}")
-            if attempt < MAX_RETRIES:
-                retry_queue.put((page_num, worker_id, attempt + 1))
-            else:
-                results['failed'].append(page_num)
-    
+            logger.error(f"Worker {fetcher_id}: Error on page {task}: {e}")
+            logger.debug(traceback.format_exc())
+            page = None
+
+        if page is None:
+            results['failed_pages'].append(task)
+            if not scheduler.retry(task, attempt):
+                logger.error(f"✗ Page {task} failed after {attempt} attempts")
+                with stats_lock:
+                    global_stats['failed_pages'].add(task)
+        else:
+            if SHARDED_SEARCH:
+                scheduler.add(follow_up_tasks(task, page))
+            scheduler.done(task)
+            results['listings'] += page['listings']
+            results['complete'] += page['complete']
+            results['successful_pages'].append(task)
+            results['pages_scraped'] += 1
+
+        timings.record(fetcher_id, task, attempt, 'ok' if page is not None else 'failed', before, account.snapshot(),
+                       time.monotonic() - queued_at, page)
+
     return results
 
 
+def run_browser_workers(drivers: List[Tuple[int, webdriver]], scheduler: PageScheduler, writer: ListingWriter,
+                        timings: PageTimings, open_drivers: Dict):
+    """One worker_scrape_pages thread per browser; `open_drivers` gets the driver each worker ends on."""
+    with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
+        futures = []
+        for worker_id, driver in drivers:
+            future = executor.submit(
+                worker_scrape_pages,
+                worker_id, driver, scheduler, writer, timings
+            )
+            futures.append((future, worker_id))
+
+        for future, worker_id in futures:
+            try:
+                result = future.result()
+                logger.info(f"Worker {worker_id} finished: {result['listings']} listings "
+                            f"({result['pages_scraped']} pages, {result['recycles']} browser restarts, "
+                            f"browser {'alive' if result['driver_alive'] else 'lost'})")
+                # Recycled workers end on a different driver than the one they started with
+                open_drivers[worker_id] = result['driver']
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed: {e}")
+
+
+def run_http_fetchers(brokers: List[SessionBroker], scheduler: PageScheduler, writer: ListingWriter,
+                      timings: PageTimings, first_id: int):
+    """HTTP_FETCHERS_PER_BROWSER http_fetch_pages threads per broker, numbered from `first_id`."""
+    fetchers = [(first_id + i, broker) for i, broker in
+                enumerate(b for b in brokers for _ in range(HTTP_FETCHERS_PER_BROWSER))]
+    with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+        futures = [(executor.submit(http_fetch_pages, fetcher_id, broker, scheduler, writer, timings), fetcher_id)
+                   for fetcher_id, broker in fetchers]
+        for future, fetcher_id in futures:
+            try:
+                result = future.result()
+                logger.info(f"Fetcher {fetcher_id} finished: {result['listings']} listings "
+                            f"({result['pages_scraped']} pages, {result['browser_pages']} through the browser)")
+            except Exception as e:
+                logger.error(f"Fetcher {fetcher_id} failed: {e}")
+
+    for broker in brokers:
+        stats = broker.stats
+        logger.info(f"Browser {broker.worker_id} session: {stats['http_pages']} pages over HTTP, "
+                    f"{stats['browser_pages']} in the browser, {stats['challenges']} challenges, "
+                    f"{stats['refreshes']} session exports" + ("" if broker.http_enabled else " (HTTP given up)"))
+
+
 # ---------------------------------------------------------
 # Main
 # ---------------------------------------------------------
-def scrape_parallel(start_page: int, end_page: int, output_file: str, num_workers: int):
-    global scraped_urls
+def plan_tasks(start_page: int, end_page: int) -> List[PageTask]:
+    if SHARDED_SEARCH:
+        # Shards start at page 1; their other pages are scheduled once page 1 gives the result count
+        return [PageTask(query, 1) for query in plan_queries()]
+    return [PageTask(BASE_URL, p) for p in range(start_page, end_page + 1)]
+
+
+def scrape_parallel(start_page: int, end_page: int, output_file: str, num_workers: int, resume: bool = False,
+                    farm_db: Optional[str] = None, worker_offset: int = 0):
+    """
+    Scrape with `num_workers` browsers in this process. With `farm_db` the process is one member
+    of a farm (see scrape_farm): pages come from the shared FarmQueue and output goes to its part file.
+    """
+    global scraped_ids, seen_index, farm_queue
     
     logger.info("=" * 70)
     logger.info("SeLoger Scraper v12 - AUTO POPUP HANDLING")
     logger.info("=" * 70)
-    logger.info(f"Pages: {start_page} to {end_page}")
+    if farm_db is not None:
+        pages = []
+        logger.info(f"Farm process {os.getpid()}: pages from {farm_db}, output to {output_file}")
+    elif SHARDED_SEARCH:
+        pages = plan_tasks(start_page, end_page)
+        logger.info(f"Shards: {len(pages)} queries")
+    else:
+        pages = plan_tasks(start_page, end_page)
+        logger.info(f"Pages: {start_page} to {end_page}")
     logger.info(f"Workers: {num_workers}")
     logger.info("=" * 70)
-    
-    with scraped_urls_lock:
-        scraped_urls = set()
+
+    manifest = RunManifest(output_file)
+    done_pages: Set[PageTask] = set()
+    seen_urls: Set[str] = set()
+    resuming = farm_db is None and resume and os.path.exists(os.path.join(OUTPUT_DIR, output_file))
+    if resuming:
+        done_pages, seen_urls = manifest.load()
+        pages = resume_tasks(pages, done_pages, manifest.sizes)
+        logger.info(f"Resuming {output_file}: {len(done_pages)} pages and {len(seen_urls)} URLs already in the manifest, "
+                    f"{len(pages)} pages to schedule")
+
+    if not pages and farm_db is None:
+        print(f"\n✅ Nothing to do, pages {start_page}-{end_page} are all in {manifest.filepath}")
+        return
+    farm_queue = FarmQueue(farm_db) if farm_db is not None else None
+
+    with scraped_ids_lock:
+        scraped_ids = {listing_id(url) for url in seen_urls}
+
+    seen_index = None
+    if SEEN_INDEX_FILE:
+        seen_index = SeenIndex(os.path.join(OUTPUT_DIR, SEEN_INDEX_FILE))
+        logger.info(f"Seen index: {seen_index.load()} listings from previous runs will be skipped")
     
     with stats_lock:
         global_stats['total_listings'] = 0
@@ -870,14 +2680,16 @@ def scrape_parallel(start_page: int, end_page: int, output_file: str, num_worker
         global_stats['failed_pages'] = set()
         global_stats['successful_pages'] = set()
         global_stats['pages_by_worker'] = {}
-    
-    while not retry_queue.empty():
-        try:
-            retry_queue.get_nowait()
-        except:
-            break
-    
-    initialize_csv(output_file)
+
+    with time_accounts_lock:
+        time_accounts.clear()
+
+    if not resuming:
+        initialize_csv(output_file)
+        manifest.reset()
+        if os.path.exists(raw_archive_path(output_file)):
+            os.remove(raw_archive_path(output_file))
+    writer = ListingWriter(output_file, manifest)
     
     print(f"\n🌐 Opening {num_workers} browser windows...")
     
@@ -885,19 +2697,14 @@ def scrape_parallel(start_page: int, end_page: int, output_file: str, num_worker
     for i in range(num_workers):
         print(f"   Opening browser {i+1}/{num_workers}...")
         try:
-            driver = setup_chrome_driver(i)
-            driver.get(BASE_URL)
-            drivers.append((i, driver))
-            time.sleep(1)
-            
-            # Immediately try to dismiss popups
-            ensure_popups_dismissed(driver, i)
-            
+            drivers.append((worker_offset + i, open_worker_browser(worker_offset + i)))
         except Exception as e:
             logger.error(f"Failed to open browser {i+1}: {e}")
     
     if not drivers:
         logger.error("No browsers could be opened!")
+        if farm_queue is not None:
+            farm_queue.close()
         return
     
     print(f"✅ Opened {len(drivers)} browsers")
@@ -908,50 +2715,51 @@ def scrape_parallel(start_page: int, end_page: int, output_file: str, num_worker
     
     for worker_id, driver in drivers:
         ensure_popups_dismissed(driver, worker_id)
-    
+
     print(f"✅ Popup handling complete")
-    
-    # Distribute pages
-    pages = list(range(start_page, end_page + 1))
-    pages_per_worker = []
-    
-    for i in range(len(drivers)):
-        worker_pages = [p for j, p in enumerate(pages) if j % len(drivers) == i]
-        pages_per_worker.append(worker_pages)
-    
+
+    # Shared page scheduler: each driver pulls its next page, failed pages come back with a backoff
+    scheduler = farm_queue if farm_queue is not None else PageScheduler(pages, skip=done_pages)
+    open_drivers = dict(drivers)
+
+    writer.start()
+    timings = PageTimings(output_file, append=resuming)
+
+    brokers: List[SessionBroker] = []
+    if HYBRID_FETCH:
+        brokers = [SessionBroker(worker_id, driver, HTTP_FETCHERS_PER_BROWSER) for worker_id, driver in drivers]
+        print(f"\n🔀 Hybrid mode: {HTTP_FETCHERS_PER_BROWSER} HTTP fetchers per browser")
+
     print(f"\n🚀 Starting parallel scrape...")
-    
+
     phase1_start = time.time()
-    
-    with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
-        futures = []
-        for (worker_id, driver), worker_pages in zip(drivers, pages_per_worker):
-            if worker_pages:
-                future = executor.submit(
-                    worker_scrape_pages,
-                    worker_id, driver, worker_pages, output_file
-                )
-                futures.append((future, worker_id))
-        
-        for future, worker_id in futures:
-            try:
-                result = future.result()
-                logger.info(f"Worker {worker_id} finished: {result['listings']} listings")
-            except Exception as e:
-                logger.error(f"Worker {worker_id} failed: {e}")
-    
-    phase1_time = time.time() - phase1_start
-    
-    # Retries
-    retry_results = {'retried': 0, 'succeeded': 0, 'failed': []}
-    for retry_round in range(MAX_RETRY_ROUNDS):
-        if retry_queue.empty():
-            break
-        round_results = retry_failed_pages(drivers, output_file)
-        retry_results['retried'] += round_results['retried']
-        retry_results['succeeded'] += round_results['succeeded']
-        retry_results['failed'].extend(round_results['failed'])
-    
+
+    try:
+        if brokers:
+            run_http_fetchers(brokers, scheduler, writer, timings, first_id=worker_offset + num_workers)
+        else:
+            run_browser_workers(drivers, scheduler, writer, timings, open_drivers)
+    finally:
+        # Drain and flush everything the workers queued, even on Ctrl+C
+        try:
+            writer.close()
+        except Exception as e:
+            logger.error(f"Output may be incomplete: {e}")
+        if seen_index is not None:
+            seen_index.close()
+        timings.close()
+        for broker in brokers:
+            # Fallback loads may have replaced the browser
+            open_drivers[broker.worker_id] = broker.driver
+            broker.close()
+
+    # Pages still queued here were stranded by lost browsers (a farm's collector drains the shared queue)
+    stranded = scheduler.drain() if farm_queue is None else []
+    if stranded:
+        logger.error(f"{len(stranded)} pages stranded (all browsers lost): {[str(t) for t, _ in stranded]}")
+        with stats_lock:
+            global_stats['failed_pages'].update(t for t, _ in stranded)
+
     total_time = time.time() - phase1_start
     
     # Summary
@@ -959,22 +2767,35 @@ def scrape_parallel(start_page: int, end_page: int, output_file: str, num_worker
         total_listings = global_stats['total_listings']
         complete_listings = global_stats['complete_listings']
         successful_pages = global_stats['successful_pages']
-    
+        failed_pages = sorted(global_stats['failed_pages'] - successful_pages)
+
     print("\n" + "=" * 70)
     print("📊 SCRAPING COMPLETE")
     print("=" * 70)
     print(f"   Total listings: {total_listings}")
     if total_listings:
         print(f"   Complete data: {complete_listings} ({100*complete_listings/total_listings:.1f}%)")
-    print(f"   Pages successful: {len(successful_pages)}/{end_page - start_page + 1}")
+    print(f"   Pages successful: {len(successful_pages)}" + (f"/{scheduler.scheduled}" if farm_queue is None else " (this process)")
+          + (f" ({len(done_pages)} done in a previous run)" if resuming else ""))
+    if failed_pages:
+        print(f"   Pages failed: {len(failed_pages)} {[str(t) for t in failed_pages[:20]]}")
     print(f"   Time: {total_time:.1f}s ({total_time/60:.1f} min)")
     if successful_pages:
         print(f"   Speed: {len(successful_pages)/total_time*60:.1f} pages/min")
+    log_time_report()
+    timings.report()
     print(f"\n   Output: {OUTPUT_DIR}/{output_file}")
+    if failed_pages and farm_queue is None:
+        print(f"   Re-run with --resume --output {output_file} to retry the missing pages")
     print("=" * 70)
+    if farm_queue is not None:
+        farm_queue.close()
+        farm_queue = None
     
     print("\nClosing browsers...")
-    for worker_id, driver in drivers:
+    for driver in open_drivers.values():
+        if driver is None:
+            continue
         try:
             driver.quit()
         except:
@@ -983,20 +2804,189 @@ def scrape_parallel(start_page: int, end_page: int, output_file: str, num_worker
     print("Done!")
 
 
+def farm_process(index: int, farm_db: str, part_file: str, num_workers: int, settings: RunSettings, log_queue):
+    """Entry point of one farm process (spawned: the module is re-imported, so main()'s settings are re-applied)."""
+    setup_logging(log_queue)
+    settings.apply()
+    scrape_parallel(None, None, part_file, num_workers, farm_db=farm_db, worker_offset=index * 1000)
+
+
+def part_files(output_file: str, part: str) -> List[Tuple[str, str, bool]]:
+    """(part path, final path, is text) for the output and every side file of one farm part."""
+    stem = os.path.join(OUTPUT_DIR, os.path.splitext(output_file)[0])
+    part_stem = os.path.join(OUTPUT_DIR, os.path.splitext(part)[0])
+    return [
+        (os.path.join(OUTPUT_DIR, part), os.path.join(OUTPUT_DIR, output_file), True),
+        (part_stem + '.manifest.jsonl', stem + '.manifest.jsonl', True),
+        (part_stem + '.timings.jsonl', stem + '.timings.jsonl', True),
+        (raw_archive_path(part), raw_archive_path(output_file), False),
+    ]
+
+
+def merge_farm_parts(output_file: str, parts: List[str]):
+    """Append every process's output, manifest, timings and raw archive to the run's files, then delete the parts."""
+    if output_file.endswith('.parquet'):
+        tables = [pq.read_table(os.path.join(OUTPUT_DIR, part)) for part in parts
+                  if os.path.exists(os.path.join(OUTPUT_DIR, part))]
+        if tables:
+            pq.write_table(pa.concat_tables(tables), os.path.join(OUTPUT_DIR, output_file))
+
+    for part in parts:
+        for part_path, final_path, is_text in part_files(output_file, part):
+            if not os.path.exists(part_path):
+                continue
+            if part_path.endswith('.parquet'):
+                os.remove(part_path)
+                continue
+            with open(part_path, "rb") as src, open(final_path, "ab") as dst:
+                if part_path.endswith('.csv'):
+                    src.readline()  # Part header, the run's CSV already has one
+                shutil.copyfileobj(src, dst)
+            os.remove(part_path)
+
+
+def scrape_farm(start_page: int, end_page: int, output_file: str, processes: int, workers_per_process: int,
+                resume: bool = False):
+    """
+    Run `processes` worker processes with `workers_per_process` browsers each.
+    They share one FarmQueue (pages, retries, dedup) and write part files that are merged into
+    the run's output once every process has exited.
+    """
+    logger.info("=" * 70)
+    logger.info(f"SeLoger Scraper v12 - process farm: {processes} processes x {workers_per_process} workers")
+    logger.info("=" * 70)
+    tasks = plan_tasks(start_page, end_page)
+
+    manifest = RunManifest(output_file)
+    done_pages: Set[PageTask] = set()
+    seen_urls: Set[str] = set()
+    resuming = resume and os.path.exists(os.path.join(OUTPUT_DIR, output_file))
+    if resuming:
+        done_pages, seen_urls = manifest.load()
+        tasks = resume_tasks(tasks, done_pages, manifest.sizes)
+        logger.info(f"Resuming {output_file}: {len(done_pages)} pages already in the manifest, {len(tasks)} to schedule")
+    if not tasks:
+        print(f"\n✅ Nothing to do, every page is in {manifest.filepath}")
+        return
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    stem = os.path.splitext(output_file)[0]
+    farm_db = os.path.join(OUTPUT_DIR, stem + '.farm.sqlite')
+    for path in (farm_db, farm_db + '-wal', farm_db + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    queue = FarmQueue(farm_db)
+    with unsized_shards_lock:
+        unsized = set(unsized_shards)
+    queue.seed(tasks, done_pages, {listing_id(url) for url in seen_urls}, unsized)
+
+    if not resuming:
+        initialize_csv(output_file)
+        manifest.reset()
+        for path in (raw_archive_path(output_file), os.path.join(OUTPUT_DIR, stem + '.timings.jsonl')):
+            if os.path.exists(path):
+                os.remove(path)
+
+    ext = os.path.splitext(output_file)[1]
+    parts = [f"{stem}.part{i}{ext}" for i in range(processes)]
+    settings = RunSettings.current()
+    context = multiprocessing.get_context('spawn')
+    # The processes log through this queue, this process alone writes the log file
+    log_queue = context.Queue()
+    log_listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    workers = [context.Process(target=farm_process, args=(i, farm_db, parts[i], workers_per_process, settings, log_queue),
+                               name=f"farm-{i}") for i in range(processes)]
+
+    start = time.time()
+    log_listener.start()
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        # The processes got the interrupt too: let them flush their parts
+        logger.warning("Interrupted, waiting for the farm processes to flush their output...")
+        for process in workers:
+            process.join()
+    finally:
+        log_listener.stop()
+    total_time = time.time() - start
+
+    for i, process in enumerate(workers):
+        if process.exitcode != 0:
+            logger.error(f"Farm process {i} exited with code {process.exitcode}")
+
+    stranded = queue.drain()
+    if stranded:
+        logger.error(f"{len(stranded)} pages left open by the farm processes: {[str(t) for t, _ in stranded[:20]]}")
+    done = queue.pages('done', this_run=True)
+    failed = queue.pages('failed')
+    queue.close()
+
+    merge_farm_parts(output_file, parts)
+    for path in (farm_db, farm_db + '-wal', farm_db + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+    print("\n" + "=" * 70)
+    print("📊 FARM COMPLETE")
+    print("=" * 70)
+    print(f"   Pages successful: {len(done)} ({processes} processes x {workers_per_process} workers)")
+    if failed:
+        print(f"   Pages failed: {len(failed)} {[str(t) for t in failed[:20]]}")
+    print(f"   Time: {total_time:.1f}s ({total_time/60:.1f} min)")
+    if done:
+        print(f"   Speed: {len(done)/total_time*60:.1f} pages/min")
+    print(f"\n   Output: {OUTPUT_DIR}/{output_file}")
+    if failed:
+        print(f"   Re-run with --resume --output {output_file} --processes {processes} to retry the missing pages")
+    print("=" * 70)
+
+
 def main():
     parser = argparse.ArgumentParser(description="SeLoger Scraper v12 - Auto Popup Handling")
     parser.add_argument("--start", type=int, help="Start page")
     parser.add_argument("--end", type=int, help="End page")
+    parser.add_argument("--sharded", action="store_true", help="Split the search by location, property type and price band (ignores --start/--end)")
     parser.add_argument("--workers", type=int, default=PARALLEL_WORKERS)
-    parser.add_argument("--output", type=str)
+    parser.add_argument("--output", type=str, help="Output file name in output/ (.csv, or .parquet with pyarrow installed)")
+    parser.add_argument("--resume", action="store_true", help="Continue the run recorded in the --output manifest (only missing/failed pages)")
+    parser.add_argument("--skip-known", action="store_true", help="Don't parse cards already written by a previous run")
+    parser.add_argument("--no-seen-index", action="store_true", help="Ignore the cross-run dedup index (write every listing)")
     parser.add_argument("--debug", action="store_true")
-    
+    parser.add_argument("--dom-only", action="store_true", help="Skip the embedded page state and parse cards from the DOM")
+    parser.add_argument("--capture-api", action="store_true", help="Read listings from the search API responses (CDP performance log)")
+    parser.add_argument("--no-block", action="store_true", help="Load images, fonts, media and trackers")
+    parser.add_argument("--no-suppress", action="store_true", help="Don't inject the overlay suppression script")
+    parser.add_argument("--hybrid", action="store_true", help="Browsers only hold the session, pages are fetched over HTTP (browser fallback on challenge)")
+    parser.add_argument("--fetchers", type=int, help="HTTP fetchers per browser with --hybrid")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes, each with --workers browsers (shared on-disk queue)")
+    parser.add_argument("--max-workers", type=int, help="Cap on browsers across all processes")
+
     args = parser.parse_args()
-    
-    global DEBUG_MODE
-    DEBUG_MODE = args.debug
-    
-    if not args.start or not args.end:
+    if args.resume and not args.output:
+        parser.error("--resume needs the --output of the run to continue")
+    if args.resume and args.output.endswith('.parquet'):
+        parser.error("--resume only supports CSV output (a Parquet file can't be appended to)")
+
+    setup_logging()
+    RunSettings(
+        debug_mode=args.debug,
+        suppress_overlays=not args.no_suppress,
+        sharded_search=args.sharded,
+        use_embedded_json=not args.dom_only,
+        capture_api_responses=args.capture_api and not args.dom_only,
+        block_resources=not args.no_block,
+        skip_known_cards=args.skip_known,
+        seen_index_file=None if args.no_seen_index else SEEN_INDEX_FILE,
+        hybrid_fetch=args.hybrid,
+        http_fetchers_per_browser=max(1, args.fetchers) if args.fetchers else HTTP_FETCHERS_PER_BROWSER,
+        max_workers=max(1, args.max_workers) if args.max_workers else MAX_WORKERS,
+    ).apply()
+    processes = max(1, min(args.processes, MAX_WORKERS))
+    
+    if not args.sharded and (not args.start or not args.end):
         print("\n" + "=" * 70)
         print("SeLoger Scraper v12 - AUTO POPUP HANDLING")
         print("=" * 70)
@@ -1011,23 +3001,28 @@ def main():
             end = int(input("End page: ").strip())
             workers_input = input(f"Workers (default {PARALLEL_WORKERS}): ").strip()
             workers = int(workers_input) if workers_input else PARALLEL_WORKERS
-            workers = max(1, min(workers, MAX_WORKERS))
+            workers = max(1, min(workers, MAX_WORKERS // processes))
         except (ValueError, KeyboardInterrupt):
             print("\nCancelled.")
             return
     else:
         start = args.start
         end = args.end
-        workers = max(1, min(args.workers, MAX_WORKERS))
+        workers = max(1, min(args.workers, MAX_WORKERS // processes))
     
     output_file = args.output or f"seloger_v12_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
-    confirm = input(f"\nScrape pages {start}-{end} with {workers} workers? (y/n): ").strip().lower()
+    scope = f"{len(plan_queries())} search shards" if args.sharded else f"pages {start}-{end}"
+    crew = f"{processes} processes x {workers} workers" if processes > 1 else f"{workers} workers"
+    confirm = input(f"\nScrape {scope} with {crew}? (y/n): ").strip().lower()
     if confirm != 'y':
         print("Cancelled.")
         return
     
-    scrape_parallel(start, end, output_file, workers)
+    if processes > 1:
+        scrape_farm(start, end, output_file, processes, workers, resume=args.resume)
+    else:
+        scrape_parallel(start, end, output_file, workers, resume=args.resume)
 
 
 if __name__ == "__main__":
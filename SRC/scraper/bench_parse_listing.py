@@ -0,0 +1,155 @@
+"""
+Offline benchmark for the SeLoger card parser (seloger_cards.extract_listing).
+
+Runs the same field extraction the scraper does, but on saved card HTML through the lxml
+backend, so selector/regex changes can be timed and checked without a browser:
+
+    python bench_parse_listing.py                                   # fixtures/seloger_cards
+    python bench_parse_listing.py --repeat 200                      # steadier cards/s
+    python bench_parse_listing.py --archive output/seloger_v12_20250101_120000.raw.jsonl.gz
+    python bench_parse_listing.py --archive output/x.raw.jsonl.gz --export 20
+
+Fixtures are <name>.html files (one card's outer HTML) plus expected.json mapping each name
+to the fields it should parse to. Archive cards only carry the URL the crawl parsed, so their
+accuracy is URL-only; --export copies archive cards into the fixture folder with the current
+parser output as their expected values, to be reviewed by hand before committing.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from seloger_cards import LISTING_FIELDS, LXML_AVAILABLE, LxmlCard, empty_listing, extract_listing
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "seloger_cards")
+EXPECTED_FILE = "expected.json"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_fixtures(folder: str) -> List[Tuple[str, str, Optional[Dict]]]:
+    """(name, html, expected fields) for every <name>.html of the folder."""
+    expected_path = os.path.join(folder, EXPECTED_FILE)
+    expected = {}
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding="utf-8") as f:
+            expected = json.load(f)
+
+    cards = []
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith(".html"):
+            name = filename[:-len(".html")]
+            with open(os.path.join(folder, filename), encoding="utf-8") as f:
+                cards.append((name, f.read(), expected.get(name)))
+    return cards
+
+
+def load_archive(path: str) -> List[Tuple[str, str, Optional[Dict]]]:
+    """DOM cards of a raw archive; the crawl-time URL is the only known field."""
+    cards = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get('source') == 'dom' and record.get('html'):
+                cards.append((f"archive_{i:06d}", record['html'], {'url': record.get('url')}))
+    return cards
+
+
+def run(cards: List[Tuple[str, str, Optional[Dict]]], repeat: int) -> Dict:
+    """Parse every card `repeat` times; returns timings and the listings of the last pass."""
+    parse_seconds = extract_seconds = 0.0
+    listings = []
+    for _ in range(repeat):
+        listings = []
+        for name, html, _expected in cards:
+            start = time.perf_counter()
+            card = LxmlCard(html)
+            parsed = time.perf_counter()
+            listings.append(extract_listing(card, empty_listing(0)))
+            extract_seconds += time.perf_counter() - parsed
+            parse_seconds += parsed - start
+    return {'parse_seconds': parse_seconds, 'extract_seconds': extract_seconds,
+            'cards': len(cards) * repeat, 'listings': listings}
+
+
+def field_accuracy(cards: List[Tuple[str, str, Optional[Dict]]], listings: List[Dict]) -> Tuple[Dict, List[str]]:
+    """{field: (correct, checked)} over the cards that have expectations, plus mismatch lines."""
+    scores = {}
+    mismatches = []
+    for (name, _html, expected), listing in zip(cards, listings):
+        if not expected:
+            continue
+        for field, value in expected.items():
+            correct, checked = scores.get(field, (0, 0))
+            ok = listing.get(field) == value
+            scores[field] = (correct + ok, checked + 1)
+            if not ok:
+                mismatches.append(f"{name}.{field}: expected {value!r}, got {listing.get(field)!r}")
+    return scores, mismatches
+
+
+def export_fixtures(cards: List[Tuple[str, str, Optional[Dict]]], listings: List[Dict], folder: str, count: int):
+    expected_path = os.path.join(folder, EXPECTED_FILE)
+    expected = {}
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding="utf-8") as f:
+            expected = json.load(f)
+
+    for (name, html, _), listing in list(zip(cards, listings))[:count]:
+        with open(os.path.join(folder, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+        expected[name] = {field: listing[field] for field in LISTING_FIELDS}
+
+    with open(expected_path, "w", encoding="utf-8") as f:
+        json.dump(expected, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    logger.info(f"Exported {min(count, len(cards))} card(s) to {folder} (review {EXPECTED_FILE} before committing)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SeLoger card parser on saved HTML")
+    parser.add_argument("--fixtures", type=str, default=FIXTURES_DIR, help="Fixture folder (<name>.html + expected.json)")
+    parser.add_argument("--archive", type=str, help="Benchmark on the DOM cards of a <name>.raw.jsonl.gz instead")
+    parser.add_argument("--repeat", type=int, default=50, help="Passes over the corpus (default: 50)")
+    parser.add_argument("--export", type=int, default=0, help="With --archive: save the first N cards as fixtures")
+    args = parser.parse_args()
+
+    if not LXML_AVAILABLE:
+        parser.error("lxml and cssselect are required: pip install lxml cssselect")
+
+    cards = load_archive(args.archive) if args.archive else load_fixtures(args.fixtures)
+    if not cards:
+        parser.error("no card to benchmark")
+
+    result = run(cards, max(1, args.repeat))
+    total = result['parse_seconds'] + result['extract_seconds']
+    logger.info(f"{len(cards)} card(s) x {max(1, args.repeat)} pass(es): {result['cards'] / total:,.0f} cards/s "
+                f"(HTML parse {result['parse_seconds'] * 1000 / result['cards']:.3f} ms/card, "
+                f"extraction {result['extract_seconds'] * 1000 / result['cards']:.3f} ms/card)")
+
+    scores, mismatches = field_accuracy(cards, result['listings'])
+    if scores:
+        logger.info("Field accuracy:")
+        for field in sorted(scores, key=lambda f: LISTING_FIELDS.index(f) if f in LISTING_FIELDS else len(LISTING_FIELDS)):
+            correct, checked = scores[field]
+            logger.info(f"  {field:<14} {correct:>5}/{checked:<5} {correct / checked:6.1%}")
+        for line in mismatches[:50]:
+            logger.warning(f"  {line}")
+        if len(mismatches) > 50:
+            logger.warning(f"  ... {len(mismatches) - 50} more mismatch(es)")
+    else:
+        logger.info("No expected values: timing only")
+
+    if args.export and args.archive:
+        export_fixtures(cards, result['listings'], args.fixtures, args.export)
+
+
+if __name__ == "__main__":
+    main()
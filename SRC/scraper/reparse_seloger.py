@@ -0,0 +1,90 @@
+"""
+Offline re-parser for the SeLoger scraper archive.
+
+"Code scraper v12.py" stores what it parsed for every card in <name>.raw.jsonl.gz next to
+the CSV (card text + outer HTML for DOM cards, the classified object for page-state cards).
+This script runs the archive through the scraper's own parsers and writes the same CSV, so a
+parsing fix in seloger_cards.py only means re-running it on the archive instead of a new crawl:
+DOM records go through LxmlCard + extract_listing, page-state records through
+listing_from_classified.
+
+    python reparse_seloger.py output/seloger_v12_20250101_120000.raw.jsonl.gz
+    python reparse_seloger.py output/*.raw.jsonl.gz --output output/reparsed.csv
+
+Cards are parsed one at a time (the parsers read fields inside specific card elements, which
+whole-column regexes over the card text can't reproduce); bench_parse_listing.py times them.
+"""
+import argparse
+import glob
+import logging
+import time
+
+import pandas as pd
+
+from seloger_cards import (
+    CSV_HEADER, LxmlCard, empty_listing, extract_listing, listing_from_classified, listing_to_row,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_archive(paths) -> pd.DataFrame:
+    frames = [pd.read_json(path, lines=True, compression='gzip') for path in paths]
+    if not frames:
+        return pd.DataFrame(columns=['page_num', 'url', 'source', 'text', 'html', 'json'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def unusable(raw: pd.DataFrame) -> pd.Series:
+    """Records without the payload their source needs (HTML for DOM cards, the object for page state)."""
+    html = raw['html'].map(lambda value: isinstance(value, str) and bool(value))
+    state = raw['json'].map(lambda value: isinstance(value, dict))
+    return ~(raw['source'].eq('dom') & html | raw['source'].eq('page_state') & state)
+
+
+def reparse(raw: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild the scraper CSV rows for every archive record that kept its payload, in archive order."""
+    records = raw[~unusable(raw)]
+    rows = []
+    for page_num, url, source, html, item in zip(records['page_num'], records['url'], records['source'],
+                                                 records['html'], records['json']):
+        if source == 'dom':
+            listing = extract_listing(LxmlCard(html), empty_listing(int(page_num)))
+        else:
+            listing = listing_from_classified(item, int(page_num))
+        # The crawl-time URL covers cards whose link the parser no longer finds
+        if not listing['url'] and isinstance(url, str):
+            listing['url'] = url
+        rows.append(listing_to_row(listing))
+    return pd.DataFrame(rows, columns=CSV_HEADER)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild SeLoger listings from the raw card archive")
+    parser.add_argument("archives", nargs="+", help="<name>.raw.jsonl.gz files (globs accepted)")
+    parser.add_argument("--output", type=str, help="Output CSV (default: <name>.reparsed.csv next to the first archive)")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.archives for path in glob.glob(pattern)})
+    if not paths:
+        parser.error("no archive found")
+
+    start = time.time()
+    raw = load_archive(paths)
+    listings = reparse(raw)
+    elapsed = time.time() - start
+
+    skipped = unusable(raw)
+    by_source = raw.loc[~skipped, 'source'].value_counts()
+    output = args.output or paths[0].replace('.raw.jsonl.gz', '.reparsed.csv')
+    listings.to_csv(output, index=False, encoding="utf-8-sig")
+
+    logger.info(f"Re-parsed {len(listings)} cards from {len(paths)} archive(s) in {elapsed:.1f}s -> {output} "
+                f"({by_source.get('dom', 0)} DOM, {by_source.get('page_state', 0)} page state)")
+    if skipped.any():
+        logger.warning(f"{int(skipped.sum())} of {len(raw)} records skipped: no HTML or page-state object to parse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+"""
+SeLoger listing card extraction, independent of the browser.
+
+extract_listing() only talks to a Card: WebElementCard wraps a live Selenium element (what the
+scraper uses), LxmlCard wraps saved card HTML (fixtures, the raw archive), so the field regexes
+can be tested and benchmarked offline with bench_parse_listing.py. listing_from_classified() maps
+a page-state classified object onto the same record, for the crawl and the archive alike.
+"""
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+try:
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import NoSuchElementException
+    SELENIUM_AVAILABLE = True
+except ImportError:
+    SELENIUM_AVAILABLE = False
+
+try:
+    import lxml.html
+    from cssselect import GenericTranslator
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Stable selectors
+SELECTORS = {
+    'card': "div[data-testid='serp-core-classified-card-testid']",
+    'url': "a[data-testid='card-mfe-covering-link-testid']",
+    'price_container': "div[data-testid='cardmfe-price-testid']",
+    'keyfacts': "div[data-testid='cardmfe-keyfacts-testid']",
+    'address': "div[data-testid='cardmfe-description-box-address']",
+    'tags': "div[data-testid='cardmfe-tag-testid']",
+    'energy': "span[data-testid='card-mfe-energy-performance-class']",
+}
+
+MISSING_DATA_INDICATOR = "N/A"
+
+# Columns of the scraper CSV, filled by listing_to_row()
+CSV_HEADER = [
+    "Page_Number", "Type", "Price", "Price_Per_M2", "Surface_m2",
+    "Rooms", "Bedrooms", "Floor", "Address", "City",
+    "PostalCode", "Department", "Energy_Class", "Is_New",
+    "Agency", "URL", "Confidence_Score"
+]
+
+# Fields compared by the benchmark (everything extract_listing fills from the card)
+LISTING_FIELDS = [
+    'type', 'price', 'price_per_m2', 'surface', 'rooms', 'bedrooms', 'floor',
+    'address', 'city', 'postal_code', 'department', 'url', 'energy_class', 'is_new',
+]
+
+PROPERTY_TYPE_PATTERN = re.compile(r'(Appartement|Maison|Studio|Villa|Duplex|Loft|Terrain)', re.IGNORECASE)
+PROPERTY_TYPE_FOR_SALE_PATTERN = re.compile(r'(Appartement|Maison|Studio|Villa|Duplex|Loft|Terrain)\s+à\s+vendre',
+                                            re.IGNORECASE)
+PRICE_PER_M2_PATTERN = re.compile(r'([\d\s\u00a0\u202f,\.]+\s*€\s*/\s*m[²2])')
+PRICE_PATTERN = re.compile(r'([\d\s\u00a0\u202f]+)\s*€(?!\s*/)')
+PRICE_FALLBACK_PATTERN = re.compile(r'([\d\s\u00a0\u202f]{4,})\s*€(?!\s*/)')
+SURFACE_PATTERN = re.compile(r'(\d+(?:[,\.]\d+)?)\s*m[²2]')
+ROOMS_PATTERN = re.compile(r'(\d+)\s*pièces?', re.IGNORECASE)
+BEDROOMS_PATTERN = re.compile(r'(\d+)\s*chambres?', re.IGNORECASE)
+# "Étage 3", "3e étage", "3ème étage" or "RDC"; a bare number is the room count, not the floor
+FLOOR_PATTERN = re.compile(r'[ÉE]tage\s*(\d+)|(\d+)\s*(?:er|e|[eè]me)?\s*[ÉEée]tage|\b(RDC)\b', re.IGNORECASE)
+POSTAL_CODE_PATTERN = re.compile(r'\((\d{5})\)')
+CITY_AFTER_COMMA_PATTERN = re.compile(r',\s*([^,\(]+?)\s*\(\d{5}\)')
+CITY_PATTERN = re.compile(r'^([^,\(]+?)\s*\(\d{5}\)')
+ENERGY_PATTERN = re.compile(r'>([A-G])<')
+
+
+def _spaces(text: str) -> str:
+    return text.replace('\xa0', ' ').replace('\u202f', ' ')
+
+
+class Card(ABC):
+    """What extract_listing() reads from a card. Finders return None when the selector matches nothing."""
+
+    @abstractmethod
+    def text(self) -> str:
+        ...
+
+    @abstractmethod
+    def outer_html(self) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def find_text(self, selector: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def find_attr(self, selector: str, name: str) -> Optional[str]:
+        """Attribute of the first match; '' when the element exists without the attribute."""
+
+    @abstractmethod
+    def find_inner_html(self, selector: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def find_all_attr(self, selector: str, name: str) -> List[str]:
+        ...
+
+
+class WebElementCard(Card):
+    """Card backed by a live Selenium WebElement (each call is a WebDriver round-trip)."""
+
+    def __init__(self, element):
+        self.element = element
+
+    def _find(self, selector: str):
+        try:
+            return self.element.find_element(By.CSS_SELECTOR, selector)
+        except NoSuchElementException:
+            return None
+
+    def text(self) -> str:
+        return self.element.text
+
+    def outer_html(self) -> Optional[str]:
+        return self.element.get_attribute('outerHTML')
+
+    def find_text(self, selector: str) -> Optional[str]:
+        element = self._find(selector)
+        return element.text if element is not None else None
+
+    def find_attr(self, selector: str, name: str) -> Optional[str]:
+        element = self._find(selector)
+        return (element.get_attribute(name) or '') if element is not None else None
+
+    def find_inner_html(self, selector: str) -> Optional[str]:
+        element = self._find(selector)
+        return element.get_attribute('innerHTML') if element is not None else None
+
+    def find_all_attr(self, selector: str, name: str) -> List[str]:
+        return [e.get_attribute(name) or '' for e in self.element.find_elements(By.CSS_SELECTOR, selector)]
+
+
+_xpath_cache: Dict[str, str] = {}
+
+
+def _xpath(selector: str) -> str:
+    if selector not in _xpath_cache:
+        _xpath_cache[selector] = GenericTranslator().css_to_xpath(selector, prefix='descendant-or-self::')
+    return _xpath_cache[selector]
+
+
+class LxmlCard(Card):
+    """Card backed by saved HTML. text() approximates WebElement.text: one line per text node."""
+
+    def __init__(self, html: str):
+        self.html = html
+        self.root = lxml.html.fragment_fromstring(html, create_parent='div')
+
+    @staticmethod
+    def _text_of(element) -> str:
+        return "\n".join(t.strip() for t in element.itertext() if t.strip())
+
+    def _find(self, selector: str):
+        found = self.root.xpath(_xpath(selector))
+        return found[0] if found else None
+
+    def text(self) -> str:
+        return self._text_of(self.root)
+
+    def outer_html(self) -> Optional[str]:
+        return self.html
+
+    def find_text(self, selector: str) -> Optional[str]:
+        element = self._find(selector)
+        return self._text_of(element) if element is not None else None
+
+    def find_attr(self, selector: str, name: str) -> Optional[str]:
+        element = self._find(selector)
+        return element.get(name, '') if element is not None else None
+
+    def find_inner_html(self, selector: str) -> Optional[str]:
+        element = self._find(selector)
+        if element is None:
+            return None
+        return (element.text or '') + ''.join(
+            lxml.html.tostring(child, encoding='unicode') for child in element
+        )
+
+    def find_all_attr(self, selector: str, name: str) -> List[str]:
+        return [e.get(name, '') for e in self.root.xpath(_xpath(selector))]
+
+
+def empty_listing(page_num: int) -> Dict:
+    return {
+        'page_num': page_num,
+        'type': None, 'price': None, 'price_per_m2': None,
+        'surface': None, 'rooms': None, 'bedrooms': None,
+        'floor': None, 'address': None, 'city': None,
+        'postal_code': None, 'department': None,
+        'url': None, 'energy_class': None, 'is_new': False,
+        'agency': None, 'raw_card_text': None, 'raw_card_html': None, 'raw_json': None,
+        'confidence_score': 10,
+    }
+
+
+def confidence_score(data: Dict) -> int:
+    critical_fields = {'url', 'price', 'surface'}
+    found_critical = sum(1 for f in critical_fields if data.get(f))
+
+    if found_critical == 3:
+        return 10
+    elif found_critical == 2:
+        return 7
+    elif found_critical == 1:
+        return 4
+    return 1
+
+
+def extract_listing(card: Card, data: Dict, keep_html: bool = False) -> Dict:
+    """
+    Fill `data` (see empty_listing) from a card. Fields are set as they are found, so a caller
+    catching an exception midway still has everything extracted up to that point.
+    """
+    raw_text = card.text()
+    data['raw_card_text'] = raw_text
+    if keep_html:
+        data['raw_card_html'] = card.outer_html()
+
+    # 1. URL
+    url = card.find_attr(SELECTORS['url'], 'href')
+    if url is not None:
+        if url:
+            data['url'] = url if url.startswith('http') else f"https://www.seloger.com{url}"
+            title = card.find_attr(SELECTORS['url'], 'title')
+            if title:
+                type_match = PROPERTY_TYPE_PATTERN.search(title)
+                if type_match:
+                    data['type'] = type_match.group(1)
+    else:
+        for href in card.find_all_attr("a[href*='/annonces/']", 'href'):
+            if href and '/annonces/' in href:
+                data['url'] = href if href.startswith('http') else f"https://www.seloger.com{href}"
+                break
+
+    # 2. PRICE
+    price_text = card.find_text(SELECTORS['price_container'])
+    if price_text is not None:
+        price_m2_match = PRICE_PER_M2_PATTERN.search(price_text)
+        if price_m2_match:
+            data['price_per_m2'] = _spaces(price_m2_match.group(1)).strip()
+
+        main_price_match = PRICE_PATTERN.search(price_text)
+        if main_price_match:
+            data['price'] = f"{_spaces(main_price_match.group(1)).strip()} €"
+
+    # 3. KEY FACTS
+    facts_text = card.find_text(SELECTORS['keyfacts'])
+    if facts_text is not None:
+        surface_match = SURFACE_PATTERN.search(facts_text)
+        if surface_match:
+            data['surface'] = f"{surface_match.group(1)} m²"
+
+        rooms_match = ROOMS_PATTERN.search(facts_text)
+        if rooms_match:
+            data['rooms'] = f"{rooms_match.group(1)} pièce(s)"
+
+        bedrooms_match = BEDROOMS_PATTERN.search(facts_text)
+        if bedrooms_match:
+            data['bedrooms'] = f"{bedrooms_match.group(1)} chambre(s)"
+
+        floor_match = FLOOR_PATTERN.search(facts_text)
+        if floor_match:
+            floor = next(group for group in floor_match.groups() if group)
+            data['floor'] = floor.upper() if floor.isalpha() else floor
+
+    # 4. ADDRESS
+    address_text = card.find_text(SELECTORS['address'])
+    if address_text is not None:
+        address_text = address_text.strip()
+        data['address'] = address_text
+
+        postal_match = POSTAL_CODE_PATTERN.search(address_text)
+        if postal_match:
+            data['postal_code'] = postal_match.group(1)
+            data['department'] = postal_match.group(1)[:2]
+
+        city_match = CITY_AFTER_COMMA_PATTERN.search(address_text) or CITY_PATTERN.search(address_text)
+        if city_match:
+            data['city'] = city_match.group(1).strip()
+
+    # 5. PROPERTY TYPE (fallback)
+    if not data['type'] and raw_text:
+        type_match = PROPERTY_TYPE_FOR_SALE_PATTERN.search(raw_text)
+        if type_match:
+            data['type'] = type_match.group(1)
+
+    # 6. ENERGY CLASS
+    energy_html = card.find_inner_html(SELECTORS['energy'])
+    if energy_html:
+        energy_match = ENERGY_PATTERN.search(energy_html)
+        if energy_match:
+            data['energy_class'] = energy_match.group(1)
+
+    # 7. TAGS
+    tags_text = card.find_text(SELECTORS['tags'])
+    if tags_text and 'nouveau' in tags_text.lower():
+        data['is_new'] = True
+
+    # FALLBACKS from raw text
+    if not data['price'] and raw_text:
+        price_match = PRICE_FALLBACK_PATTERN.search(raw_text)
+        if price_match:
+            data['price'] = _spaces(price_match.group(1)).strip() + ' €'
+
+    if not data['surface'] and raw_text:
+        surface_match = SURFACE_PATTERN.search(raw_text)
+        if surface_match:
+            data['surface'] = f"{surface_match.group(1)} m²"
+
+    if not data['rooms'] and raw_text:
+        rooms_match = ROOMS_PATTERN.search(raw_text)
+        if rooms_match:
+            data['rooms'] = f"{rooms_match.group(1)} pièce(s)"
+
+    if not data['postal_code'] and raw_text:
+        postal_match = POSTAL_CODE_PATTERN.search(raw_text)
+        if postal_match:
+            data['postal_code'] = postal_match.group(1)
+            data['department'] = postal_match.group(1)[:2]
+
+    data['confidence_score'] = confidence_score(data)
+    return data
+
+
+# Page-state classifieds: the structured objects the search page hydrates from, mapped by
+# listing_from_classified() onto the same record as a card
+PROPERTY_TYPE_NAMES = {
+    'apartment': 'Appartement', 'appartement': 'Appartement', 'flat': 'Appartement',
+    'house': 'Maison', 'maison': 'Maison', 'villa': 'Villa', 'studio': 'Studio',
+    'duplex': 'Duplex', 'loft': 'Loft', 'land': 'Terrain', 'terrain': 'Terrain',
+}
+
+# Candidate key paths, most specific first (the payload layout differs between SeLoger releases)
+STATE_FIELD_PATHS = {
+    'url': ('url', 'classifiedURL', 'classifiedUrl', 'link', 'permalink'),
+    'type': ('rawData.propertyType', 'estateType', 'propertyType', 'realEstateType', 'type'),
+    'title': ('title', 'mainDescription.headline', 'description.title'),
+    'price': ('rawData.price', 'pricing.price', 'price.value', 'price.amount', 'hardFacts.price.value', 'price'),
+    'price_per_m2': ('pricing.squareMeterPrice', 'pricing.pricePerSquareMeter', 'price.perSquareMeter',
+                     'pricePerSquareMeter'),
+    'surface': ('rawData.surface', 'livingSpace', 'surface', 'livingArea', 'area'),
+    'rooms': ('rawData.nbroom', 'numberOfRooms', 'rooms', 'roomsQuantity', 'nbRooms'),
+    'bedrooms': ('rawData.nbbedroom', 'numberOfBedrooms', 'bedrooms', 'bedroomsQuantity', 'nbBedrooms'),
+    'floor': ('rawData.floor', 'floor', 'floorNumber'),
+    'street': ('location.address.street', 'address.street', 'location.street'),
+    'district': ('location.address.district', 'location.district', 'address.district'),
+    'city': ('location.address.city', 'location.city', 'address.city', 'city'),
+    'postal_code': ('location.address.zipCode', 'location.address.postalCode', 'location.zipCode',
+                    'address.zipCode', 'zipCode', 'postalCode'),
+    'energy_class': ('energyClass', 'energy.class', 'energyPerformance.class', 'epc.class', 'dpe'),
+    'is_new': ('isNew', 'tags.isNew', 'new'),
+    'agency': ('provider.name', 'agency.name', 'contactData.agency.name', 'publisher.name'),
+}
+
+# hardFacts.facts entries are keyed by a "type" discriminator rather than by field name
+# (numberOfFloors is the building's floor count, not the listing's floor)
+HARD_FACT_TYPES = {
+    'livingSpace': 'surface', 'numberOfRooms': 'rooms', 'numberOfBedrooms': 'bedrooms',
+}
+
+
+def _get_path(obj, path: str):
+    for key in path.split('.'):
+        if not isinstance(obj, dict) or key not in obj:
+            return None
+        obj = obj[key]
+    return obj
+
+
+def _pick(item: Dict, field: str):
+    for path in STATE_FIELD_PATHS[field]:
+        value = _get_path(item, path)
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+
+def _to_number(value) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, dict):
+        return _to_number(value.get('value', value.get('amount')))
+    match = re.search(r'\d[\d\s\u00a0\u202f]*(?:[,\.]\d+)?', str(value))
+    if not match:
+        return None
+    number = re.sub(r'[\s\u00a0\u202f]', '', match.group(0)).replace(',', '.')
+    try:
+        parsed = float(number)
+    except ValueError:
+        return None
+    return int(parsed) if parsed.is_integer() else parsed
+
+
+def _format_thousands(value: float) -> str:
+    return f"{int(round(value)):,}".replace(',', ' ')
+
+
+def _format_decimal(value: float) -> str:
+    return f"{value:g}".replace('.', ',')
+
+
+def listing_from_classified(item: Dict, page_num: int, keep_json: bool = False) -> Dict[str, Optional[str]]:
+    """Map one classified object from the page state onto the same record as extract_listing()."""
+    data = empty_listing(page_num)
+
+    if keep_json:
+        data['raw_json'] = item
+
+    fields = {field: _pick(item, field) for field in STATE_FIELD_PATHS}
+    for fact in _get_path(item, 'hardFacts.facts') or []:
+        if isinstance(fact, dict) and HARD_FACT_TYPES.get(fact.get('type')):
+            target = HARD_FACT_TYPES[fact['type']]
+            if fields.get(target) is None:
+                fields[target] = fact.get('splitValue', fact.get('value'))
+
+    url = fields['url']
+    if isinstance(url, str) and url:
+        data['url'] = url if url.startswith('http') else f"https://www.seloger.com{url}"
+
+    raw_type = fields['type']
+    if isinstance(raw_type, str):
+        data['type'] = PROPERTY_TYPE_NAMES.get(raw_type.lower())
+    if not data['type'] and isinstance(fields['title'], str):
+        type_match = PROPERTY_TYPE_PATTERN.search(fields['title'])
+        if type_match:
+            data['type'] = type_match.group(1)
+
+    price = _to_number(fields['price'])
+    surface = _to_number(fields['surface'])
+    if price:
+        data['price'] = f"{_format_thousands(price)} €"
+    price_m2 = _to_number(fields['price_per_m2'])
+    if not price_m2 and price and surface:
+        price_m2 = price / surface
+    if price_m2:
+        data['price_per_m2'] = f"{_format_thousands(price_m2)} €/m²"
+    if surface:
+        data['surface'] = f"{_format_decimal(surface)} m²"
+
+    rooms = _to_number(fields['rooms'])
+    if rooms:
+        data['rooms'] = f"{int(rooms)} pièce(s)"
+    bedrooms = _to_number(fields['bedrooms'])
+    if bedrooms:
+        data['bedrooms'] = f"{int(bedrooms)} chambre(s)"
+    if fields['floor'] is not None:
+        floor = _to_number(fields['floor'])
+        data['floor'] = 'RDC' if floor == 0 else str(floor if floor is not None else fields['floor'])
+
+    postal_code = fields['postal_code']
+    if postal_code is not None:
+        postal_match = re.search(r'\d{5}', str(postal_code))
+        if postal_match:
+            data['postal_code'] = postal_match.group(0)
+            data['department'] = data['postal_code'][:2]
+    if isinstance(fields['city'], str):
+        data['city'] = fields['city'].strip()
+    address_parts = [p for p in (fields['street'], fields['district'], data['city']) if isinstance(p, str) and p]
+    if address_parts:
+        data['address'] = ', '.join(address_parts)
+        if data['postal_code']:
+            data['address'] += f" ({data['postal_code']})"
+
+    energy = fields['energy_class']
+    if isinstance(energy, str) and re.fullmatch(r'[A-Ga-g]', energy.strip()):
+        data['energy_class'] = energy.strip().upper()
+    data['is_new'] = bool(fields['is_new'])
+    if isinstance(fields['agency'], str):
+        data['agency'] = fields['agency'].strip()
+
+    data['confidence_score'] = confidence_score(data)
+    return data
+
+
+def format_for_csv(value) -> str:
+    if value is None or (isinstance(value, str) and value.strip() == ''):
+        return MISSING_DATA_INDICATOR
+    if isinstance(value, bool):
+        return 'Oui' if value else 'Non'
+    return str(value)
+
+
+def listing_to_row(listing: Dict) -> list:
+    return [
+        format_for_csv(str(listing['page_num'])),
+        format_for_csv(listing['type']),
+        format_for_csv(listing['price']),
+        format_for_csv(listing['price_per_m2']),
+        format_for_csv(listing['surface']),
+        format_for_csv(listing['rooms']),
+        format_for_csv(listing['bedrooms']),
+        format_for_csv(listing['floor']),
+        format_for_csv(listing['address']),
+        format_for_csv(listing['city']),
+        format_for_csv(listing['postal_code']),
+        format_for_csv(listing['department']),
+        format_for_csv(listing['energy_class']),
+        format_for_csv(listing['is_new']),
+        format_for_csv(listing['agency']),
+        format_for_csv(listing['url']),
+        listing['confidence_score'],
+    ]
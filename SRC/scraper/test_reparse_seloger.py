@@ -0,0 +1,57 @@
+"""
+Re-parser tests on an archive built from the card fixtures.
+
+    python -m pytest SRC/scraper
+"""
+import gzip
+import json
+
+import pandas as pd
+
+import reparse_seloger
+from bench_parse_listing import FIXTURES_DIR, load_fixtures
+from seloger_cards import CSV_HEADER, MISSING_DATA_INDICATOR
+
+FIXTURES = load_fixtures(FIXTURES_DIR)
+
+CLASSIFIED = {
+    'id': 1234567, 'url': '/annonces/achat/maison/tours-37/1234567.htm',
+    'rawData': {'propertyType': 'house', 'price': 289000, 'surface': 110, 'nbroom': 5},
+    'location': {'address': {'city': 'Tours', 'zipCode': '37000'}},
+    'isNew': True,
+}
+
+
+def test_reparse_archive(tmp_path):
+    archive = tmp_path / "run.raw.jsonl.gz"
+    with gzip.open(archive, "wt", encoding="utf-8") as f:
+        for page_num, (_name, html, expected) in enumerate(FIXTURES, start=1):
+            f.write(json.dumps({'page_num': page_num, 'url': expected['url'], 'source': 'dom',
+                                'text': None, 'html': html, 'json': None}) + "\n")
+        f.write(json.dumps({'page_num': 9, 'url': 'https://www.seloger.com/annonces/1234567.htm',
+                            'source': 'page_state', 'text': None, 'html': None, 'json': CLASSIFIED}) + "\n")
+        # Nothing to parse: DOM card archived without its HTML
+        f.write(json.dumps({'page_num': 9, 'url': 'https://www.seloger.com/annonces/7654321.htm', 'source': 'dom',
+                            'text': '2 pièces', 'html': None, 'json': None}) + "\n")
+
+    raw = reparse_seloger.load_archive([str(archive)])
+    listings = reparse_seloger.reparse(raw)
+    assert list(listings.columns) == CSV_HEADER
+    assert len(listings) == len(FIXTURES) + 1
+    assert reparse_seloger.unusable(raw).tolist() == [False] * (len(FIXTURES) + 1) + [True]
+
+    # Page-state record rebuilt from the archived object
+    state = listings.iloc[-1]
+    assert state["URL"] == 'https://www.seloger.com/annonces/achat/maison/tours-37/1234567.htm'
+    assert (state["Type"], state["Price"], state["Surface_m2"], state["Rooms"]) == \
+        ('Maison', '289 000 €', '110 m²', '5 pièce(s)')
+    assert (state["City"], state["PostalCode"], state["Is_New"]) == ('Tours', '37000', 'Oui')
+
+    output = tmp_path / "run.reparsed.csv"
+    listings.to_csv(output, index=False, encoding="utf-8-sig")
+    relu = pd.read_csv(output, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    for (_name, _html, expected), (_, row) in zip(FIXTURES, relu.iterrows()):
+        assert row["URL"] == expected['url']
+        assert row["Floor"] == (expected['floor'] or MISSING_DATA_INDICATOR)
+        assert row["PostalCode"] == expected['postal_code']
+        assert row["Is_New"] == ('Oui' if expected['is_new'] else 'Non')
@@ -0,0 +1,263 @@
+"""
+Tests of the browser-free parts of "Code scraper v12.py" (page-state mapping, scheduling).
+Skipped when selenium/urllib3 are not installed, since the module imports them.
+
+    python -m pytest SRC/scraper
+"""
+import importlib.util
+import os
+from typing import NamedTuple
+
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("urllib3")
+
+SCRAPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Code scraper v12.py")
+spec = importlib.util.spec_from_file_location("seloger_scraper_v12", SCRAPER_PATH)
+scraper = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(scraper)
+
+
+def test_listing_from_classified():
+    item = {
+        'id': 1, 'url': '/annonces/achat/appartement/lyon-3eme-69/1.htm', 'title': 'Appartement 3 pièces',
+        'pricing': {'price': '315 000 €'},
+        'hardFacts': {'facts': [
+            {'type': 'livingSpace', 'splitValue': '63,5'},
+            {'type': 'numberOfRooms', 'value': '3'},
+            {'type': 'numberOfFloors', 'value': '6'},
+        ]},
+        'location': {'address': {'city': 'Lyon 3ème', 'zipCode': '69003'}},
+    }
+    listing = scraper.listing_from_classified(item, 4)
+
+    assert set(listing) == set(scraper.empty_listing(4))
+    assert listing['url'] == 'https://www.seloger.com/annonces/achat/appartement/lyon-3eme-69/1.htm'
+    assert listing['type'] == 'Appartement'
+    assert listing['price'] == '315 000 €'
+    assert listing['surface'] == '63,5 m²'
+    assert listing['price_per_m2'] == '4 961 €/m²'
+    assert listing['rooms'] == '3 pièce(s)'
+    # Building height, not the listing's floor
+    assert listing['floor'] is None
+    assert listing['address'] == 'Lyon 3ème (69003)'
+    assert listing['confidence_score'] == 10
+
+
+def test_listing_from_classified_ground_floor():
+    item = {'id': 2, 'url': 'https://www.seloger.com/annonces/2.htm', 'rawData': {'floor': 0, 'price': 99000}}
+    listing = scraper.listing_from_classified(item, 1)
+    assert listing['floor'] == 'RDC'
+    assert listing['confidence_score'] == 7
+
+
+def test_time_report_goes_through_the_logger(caplog, capsys, monkeypatch):
+    account = scraper.TimeAccount()
+    account.waiting['readiness'], account.working['parse'] = 3.0, 1.0
+    monkeypatch.setattr(scraper, 'time_accounts', {1: account})
+
+    with caplog.at_level("INFO", logger=scraper.logger.name):
+        scraper.log_time_report()
+
+    assert capsys.readouterr().out == ""
+    assert caplog.messages[-1] == "   Waiting: 3.0s (75%) | Working: 1.0s (all workers)"
+
+
+@pytest.fixture
+def sharded(monkeypatch, tmp_path):
+    monkeypatch.setattr(scraper, 'SHARDED_SEARCH', True)
+    monkeypatch.setattr(scraper, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(scraper, 'unsized_shards', set())
+    monkeypatch.setattr(scraper, 'farm_queue', None)
+
+
+def shard(price_min, price_max):
+    return scraper.build_search_url('AD09FR43', 'House', price_min, price_max)
+
+
+def test_follow_up_tasks(sharded):
+    query = shard(150000, 250000)
+    first = scraper.PageTask(query, 1)
+
+    # 25 cards per page (known listings included) -> 4 pages
+    assert scraper.follow_up_tasks(first, {'cards': 25, 'total_results': 90}) == [
+        scraper.PageTask(query, p) for p in (2, 3, 4)]
+
+    # Too many pages for one query: the price band is halved
+    children = scraper.follow_up_tasks(first, {'cards': 25, 'total_results': 25 * scraper.MAX_PAGES_PER_QUERY + 1})
+    assert children == [scraper.PageTask(shard(150000, 200000), 1), scraper.PageTask(shard(200000, 250000), 1)]
+
+    # No count: walked while pages come back full
+    assert scraper.follow_up_tasks(first, {'cards': 25, 'total_results': None}) == [scraper.PageTask(query, 2)]
+    assert scraper.follow_up_tasks(scraper.PageTask(query, 2), {'cards': 25}) == [scraper.PageTask(query, 3)]
+    assert scraper.follow_up_tasks(scraper.PageTask(query, 3), {'cards': 4}) == []
+
+
+def test_store_page_reports_cards_before_skip_known(sharded):
+    class Writer:
+        def submit(self, task, listings, size=None):
+            self.size = size
+
+    writer = Writer()
+    task = scraper.PageTask(shard(0, 150000), 2)
+    page = scraper.store_page(1, task, [], writer, card_count=25)
+    assert page['cards'] == 25
+    assert writer.size == {'cards': 25, 'total_results': None}
+
+
+def test_resume_rebuilds_follow_ups(sharded):
+    query, low, high = shard(150000, 250000), shard(150000, 200000), shard(200000, 250000)
+    unsized = shard(0, 150000)
+    task = scraper.PageTask
+
+    manifest = scraper.RunManifest("run.csv")
+    manifest.reset()
+    manifest.record([
+        # Split shard, whose lower half was paginated up to page 2 and whose upper half was not started
+        (task(query, 1), [], {'cards': 25, 'total_results': 25 * scraper.MAX_PAGES_PER_QUERY + 1}),
+        (task(low, 1), [], {'cards': 25, 'total_results': 90}),
+        (task(low, 2), [], {'cards': 25, 'total_results': None}),
+        # Walked shard, done up to page 2
+        (task(unsized, 1), [], {'cards': 25, 'total_results': None}),
+        (task(unsized, 2), [], {'cards': 25, 'total_results': None}),
+    ])
+    # Older manifest line, without the page size
+    with open(manifest.filepath, "a", encoding="utf-8") as f:
+        f.write('{"query": "%s", "page": 1, "urls": []}\n' % shard(700000, None))
+
+    reloaded = scraper.RunManifest("run.csv")
+    done, _urls = reloaded.load()
+    planned = [task(query, 1), task(unsized, 1), task(shard(700000, None), 1), task(shard(400000, 700000), 1)]
+
+    assert scraper.resume_tasks(planned, done, reloaded.sizes) == [
+        task(shard(400000, 700000), 1),
+        task(unsized, 3),
+        task(low, 3), task(low, 4),
+        task(high, 1),
+        task(shard(700000, None), 1),
+    ]
+    assert scraper.unsized_shards == {unsized}
+
+    # The farm queue keeps walking the shard found unsized by the resume
+    queue = scraper.FarmQueue(str(scraper.os.path.join(scraper.OUTPUT_DIR, "run.farm.sqlite")))
+    queue.seed([task(unsized, 3)], done, unsized=scraper.unsized_shards)
+    assert queue.is_unsized(unsized)
+    assert queue.add([task(unsized, 2), task(unsized, 4)]) == 1
+    queue.close()
+
+
+def test_page_scheduler_skips_done_follow_ups():
+    done = scraper.PageTask(scraper.BASE_URL, 2)
+    scheduler = scraper.PageScheduler([scraper.PageTask(scraper.BASE_URL, 1)], skip={done})
+    first, attempt = scheduler.get()
+    assert attempt == 1
+    assert scheduler.add([done, scraper.PageTask(scraper.BASE_URL, 3)]) == 1
+    scheduler.done(first)
+    assert scheduler.get()[0].page == 3
+
+
+def test_run_settings_round_trip(monkeypatch):
+    for name in ('DEBUG_MODE', 'SHARDED_SEARCH', 'SEEN_INDEX_FILE', 'MAX_WORKERS'):
+        monkeypatch.setattr(scraper, name, getattr(scraper, name))
+    settings = scraper.RunSettings.current()._replace(sharded_search=True, seen_index_file=None, max_workers=2)
+    settings.apply()
+    assert (scraper.SHARDED_SEARCH, scraper.SEEN_INDEX_FILE, scraper.MAX_WORKERS) == (True, None, 2)
+    assert scraper.RunSettings.current() == settings
+
+
+def test_duplicate_urls_claims_a_page_at_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(scraper, 'seen_index', None)
+    monkeypatch.setattr(scraper, 'scraped_ids', {1000001})
+    urls = ['https://www.seloger.com/annonces/1000001.htm', 'https://www.seloger.com/annonces/1000002.htm',
+            None, 'https://www.seloger.com/annonces/1000002.htm']
+    assert scraper.duplicate_urls(urls) == [True, False, False, True]
+    assert scraper.duplicate_urls(urls[1:2]) == [True]
+
+    # Farm: the IDs of the page are claimed in the shared database
+    queue = scraper.FarmQueue(str(tmp_path / "farm.sqlite"))
+    monkeypatch.setattr(scraper, 'farm_queue', queue)
+    assert scraper.duplicate_urls(urls) == [False, False, False, True]
+    assert queue.claim_listings([1000001, 1000003]) == {1000003}
+    queue.close()
+
+
+def test_farm_processes_log_through_the_parent():
+    import logging
+    import queue
+
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+    records = queue.Queue()
+    try:
+        scraper.setup_logging(records)
+        scraper.logger.info("from a farm process")
+    finally:
+        root.handlers, root.level = saved
+
+    record = records.get_nowait()
+    assert record.getMessage() == "from a farm process"
+    assert logging.Formatter(scraper.LOG_FORMAT).format(record).endswith(" - INFO - from a farm process")
+
+
+class FakeDriver:
+    def execute_script(self, script, *args):
+        return ["Mozilla/5.0 test", "fr-FR"]
+
+    def get_cookies(self):
+        return [{'name': 'consent', 'value': 'yes', 'domain': '.seloger.com', 'path': '/'},
+                {'name': 'host_only', 'value': '1', 'domain': 'www.seloger.com', 'path': '/'}]
+
+
+class FakeResponse(NamedTuple):
+    status: int
+    headers: object
+    data: bytes
+
+
+class FakePool:
+    """Serves canned responses by URL and records the Cookie header of every request."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.sent = []
+
+    def request(self, method, url, headers=None, redirect=True):
+        assert redirect is False
+        self.sent.append((url, headers.get('Cookie')))
+        status, response_headers, body = self.responses[url]
+        return FakeResponse(status, scraper.urllib3.HTTPHeaderDict(response_headers), body.encode())
+
+
+def test_fetch_follows_redirects_with_scoped_cookies():
+    search = "https://www.seloger.com/classified-search?locations=AD09FR43&page=2"
+    headers = scraper.urllib3.HTTPHeaderDict()
+    headers.add('Location', '/classified-search/?locations=AD09FR43&page=2')
+    headers.add('Set-Cookie', 'session=abc; Path=/; Domain=seloger.com')
+    headers.add('Set-Cookie', 'tracker=x; Domain=evil.example')
+    headers.add('Set-Cookie', 'host_only=; Max-Age=0; Path=/')
+    headers.add('Set-Cookie', 'scoped=1; Path=/annonces')
+    pool = FakePool({
+        search: (302, headers, ""),
+        "https://www.seloger.com/classified-search/?locations=AD09FR43&page=2": (200, {}, "<html>ok</html>"),
+    })
+    broker = scraper.SessionBroker(1, FakeDriver(), fetchers=1)
+    broker.pool = pool
+
+    assert broker.fetch(search) == (200, "<html>ok</html>")
+    assert pool.sent[0] == (search, "consent=yes; host_only=1")
+    # Second hop: the redirect's cookies are sent, except the foreign domain, the deleted and the out-of-path ones
+    assert pool.sent[1][1] == "consent=yes; session=abc"
+
+    assert broker.request_headers("https://www.seloger.com/annonces/achat/1.htm")['Cookie'] == \
+        "consent=yes; session=abc; scoped=1"
+    assert 'Cookie' not in broker.request_headers("https://evil.example/")
+
+
+def test_fetch_stops_after_too_many_redirects():
+    loop = "https://www.seloger.com/loop"
+    pool = FakePool({loop: (301, {'Location': loop}, "")})
+    broker = scraper.SessionBroker(1, FakeDriver(), fetchers=1)
+    broker.pool = pool
+    assert broker.fetch(loop)[0] == 301
+    assert len(pool.sent) == scraper.HTTP_MAX_REDIRECTS + 1
@@ -0,0 +1,43 @@
+"""
+Card parser tests on the saved fixtures (fixtures/seloger_cards), through the lxml backend.
+
+    python -m pytest SRC/scraper
+"""
+import json
+import os
+
+import pytest
+
+from bench_parse_listing import EXPECTED_FILE, FIXTURES_DIR, load_fixtures
+from seloger_cards import Card, LxmlCard, empty_listing, extract_listing
+
+FIXTURES = load_fixtures(FIXTURES_DIR)
+
+
+def test_every_fixture_has_expected_fields():
+    with open(os.path.join(FIXTURES_DIR, EXPECTED_FILE), encoding="utf-8") as f:
+        assert sorted(json.load(f)) == [name for name, _html, _expected in FIXTURES]
+
+
+@pytest.mark.parametrize("name, html, expected", FIXTURES, ids=[name for name, _, _ in FIXTURES])
+def test_extract_listing(name, html, expected):
+    listing = extract_listing(LxmlCard(html), empty_listing(3))
+    assert {field: listing[field] for field in expected} == expected
+    assert listing['page_num'] == 3
+
+
+@pytest.mark.parametrize("facts, floor", [
+    ("3 pièces · 64 m² · Étage 2", "2"),
+    ("2 pièces · 4ème étage", "4"),
+    ("1er étage · 5 pièces", "1"),
+    ("Studio · rdc", "RDC"),
+    ("5 pièces · 120 m²", None),
+])
+def test_floor_is_not_the_room_count(facts, floor):
+    html = f'<div><div data-testid="cardmfe-keyfacts-testid">{facts}</div></div>'
+    assert extract_listing(LxmlCard(html), empty_listing(1))['floor'] == floor
+
+
+def test_card_is_abstract():
+    with pytest.raises(TypeError):
+        Card()